@@ -0,0 +1,90 @@
+"""Builds the actor collaboration graph for random casts of IMDb-like scale and times colleague checks
+and shortest paths: bidirectional search over the compressed graph against a one-directional
+breadth-first search over sets of colleagues. Checks that both find paths of the same length.
+
+Usage: python -m benchmarks.bench_graph [--movies 200000] [--actors 300000] [--cast 8] [--queries 200]
+"""
+import argparse
+import random
+import time
+from collections import deque
+
+from movie.adapters.graph import CollaborationGraph
+
+
+def random_casts(movies, actors, cast_size, seed=0):
+    # A few actors appear in many movies and most in a handful, as in real casts.
+    rng = random.Random(seed)
+    return [(movie_id, [f"actor {int(actors * rng.random() ** 2)}" for _ in range(rng.randint(2, cast_size))])
+            for movie_id in range(1, movies + 1)]
+
+
+def colleague_sets(casts):
+    colleagues = dict()
+    for _, cast in casts:
+        for actor in cast:
+            colleagues.setdefault(actor, set()).update(cast)
+    for actor, others in colleagues.items():
+        others.discard(actor)
+    return colleagues
+
+
+def bfs_distance(colleagues, source, target):
+    if source == target:
+        return 0
+    seen = {source}
+    queue = deque([(source, 0)])
+    while queue:
+        actor, distance = queue.popleft()
+        for colleague in colleagues.get(actor, ()):
+            if colleague == target:
+                return distance + 1
+            if colleague not in seen:
+                seen.add(colleague)
+                queue.append((colleague, distance + 1))
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--movies', type=int, default=200000)
+    parser.add_argument('--actors', type=int, default=300000)
+    parser.add_argument('--cast', type=int, default=8)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    casts = random_casts(args.movies, args.actors, args.cast)
+    graph = CollaborationGraph()
+    start = time.perf_counter()
+    graph.build(casts)
+    print(f"built {len(graph)} actors, {graph.edge_count} colleague pairs in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    colleagues = colleague_sets(casts)
+    print(f"built colleague sets in {time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(1)
+    names = [cast[0] for _, cast in rng.sample(casts, args.queries)]
+    pairs = list(zip(names, reversed(names)))
+
+    start = time.perf_counter()
+    for actor, other in pairs:
+        graph.worked_together(actor, other)
+    check = (time.perf_counter() - start) / len(pairs) * 1e6
+
+    start = time.perf_counter()
+    paths = [graph.shortest_path(actor, other) for actor, other in pairs]
+    bidirectional = (time.perf_counter() - start) / len(pairs) * 1e3
+
+    start = time.perf_counter()
+    distances = [bfs_distance(colleagues, actor, other) for actor, other in pairs]
+    one_way = (time.perf_counter() - start) / len(pairs) * 1e3
+
+    for path, distance in zip(paths, distances):
+        assert (path is None and distance is None) or len(path[1]) == distance, (path, distance)
+    print(f"colleague check {check:.1f} us, shortest path {bidirectional:.2f} ms bidirectional "
+          f"vs {one_way:.2f} ms one-way ({one_way / bidirectional:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
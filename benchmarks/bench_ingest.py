@@ -0,0 +1,87 @@
+"""Streams a large synthetic catalogue, split over several CSV files in one directory and sprinkled with
+malformed rows, through the chunked ingest pipeline. Reports rows per second, the malformed rows
+counted, and how much the process grew while ingesting, which should not depend on the row count.
+By default the chunks are discarded, to measure the pipeline alone; --repository database loads them
+into a temporary sqlite database instead.
+
+Usage: python -m benchmarks.bench_ingest [--rows 5000000] [--files 4] [--repository none|database]
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import resource
+import tempfile
+
+from benchmarks.synthetic import FIELDNAMES, synthetic_rows
+from movie.adapters.database_repository import DatabaseRepository
+from movie.adapters.ingest import ingest
+
+
+class DiscardingRepository:
+    # Takes the place of a repository, counting the movies it is given and keeping none.
+
+    def __init__(self):
+        self.movies = 0
+
+    def add_movies(self, movies):
+        self.movies += len(movies)
+
+
+def write_files(directory: str, rows: int, files: int, malformed_every: int):
+    writers = []
+    for number in range(files):
+        outfile = open(os.path.join(directory, f"catalogue-{number:02d}.csv"), 'w', encoding='utf-8', newline='')
+        writer = csv.writer(outfile)
+        writer.writerow(FIELDNAMES)
+        writers.append((outfile, writer))
+    for count, row in enumerate(synthetic_rows(rows), start=1):
+        fields = [row[name] for name in FIELDNAMES]
+        if malformed_every and count % malformed_every == 0:
+            # Alternate between a truncated row and one with a year that is not a number.
+            if count // malformed_every % 2:
+                fields = fields[:5]
+            else:
+                fields[FIELDNAMES.index('Year')] = 'unknown'
+        writers[count % files][1].writerow(fields)
+    for outfile, _ in writers:
+        outfile.close()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5000000)
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--malformed-every', type=int, default=10000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--repository', choices=['none', 'database'], default='none')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Generate the files in another process, so that its memory does not count towards the peak here.
+        writer = multiprocessing.Process(target=write_files,
+                                         args=(directory, args.rows, args.files, args.malformed_every))
+        writer.start()
+        writer.join()
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"{args.rows} rows in {args.files} files, {size / 2 ** 20:.0f} MB")
+
+        if args.repository == 'database':
+            repository = DatabaseRepository(f"sqlite:///{os.path.join(directory, 'movies.db')}")
+        else:
+            repository = DiscardingRepository()
+        before = peak_rss_mb()
+        report = ingest(directory, repository, args.chunk_size)
+        growth = peak_rss_mb() - before
+
+    print(f"{report.loaded} movies loaded from {report}, in {report.seconds:.1f}s")
+    print(f"peak memory {before:.0f} MB before ingest, grew {growth:.0f} MB while ingesting")
+
+
+if __name__ == '__main__':
+    main()
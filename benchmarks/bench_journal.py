@@ -0,0 +1,60 @@
+"""Measures journaled review writes per second on the memory repository: one writer, where every
+review waits for its own fsync, against several concurrent writers sharing fsyncs. Then checks
+that a fresh repository replays every review from the journal and snapshot.
+
+Usage: python -m benchmarks.bench_journal [--reviews 2000] [--threads 1 4 16]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from movie.adapters.memory_repository import MemoryRepository, populate
+from movie.domain.model import Review
+
+DATA_PATH = os.path.join('movie', 'adapters', 'data')
+
+
+def write_reviews(repository, movies, reviews, threads):
+    def writer(first):
+        for i in range(first, reviews, threads):
+            repository.add_review(Review(movies[i % len(movies)], f"review {i}", i % 10 + 1))
+
+    workers = [threading.Thread(target=writer, args=(first,)) for first in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return reviews / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--reviews', type=int, default=2000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--compact-every', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'threads':>7} {'reviews/s':>10} {'replayed':>9} {'replay s':>9}")
+    for threads in args.threads:
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'reviews.journal')
+            repository = MemoryRepository()
+            populate(DATA_PATH, repository)
+            repository.open_journal(filename, args.compact_every)
+            movies = repository.get_movies_page(0, repository.count_movies())
+            rate = write_reviews(repository, movies, args.reviews, threads)
+
+            restored = MemoryRepository()
+            populate(DATA_PATH, restored)
+            start = time.perf_counter()
+            replayed = restored.open_journal(filename, args.compact_every)
+            elapsed = time.perf_counter() - start
+            assert replayed == args.reviews, (replayed, args.reviews)
+        print(f"{threads:>7} {rate:>10.0f} {replayed:>9} {elapsed:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
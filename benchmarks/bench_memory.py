@@ -0,0 +1,82 @@
+"""Measures the memory held by a loaded catalogue, comparing one entity object per CSV
+occurrence (the old loader) with interned entities shared by every movie, and the size
+of each domain object.
+
+Usage: python -m benchmarks.bench_memory [--movies 100000]
+"""
+import argparse
+import csv
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from movie.adapters.memory_repository import MemoryRepository, read_csv_file
+from movie.domain.model import Movie, Director, Actor, Genre, Review, User
+from benchmarks.synthetic import write_csv
+
+
+def read_csv_file_without_interning(filename, repo):
+    with open(filename, encoding='utf-8-sig') as infile:
+        for row in csv.DictReader(infile):
+            movie = Movie(row['Title'], int(row['Year']))
+            director = Director(row['Director'].strip())
+            movie.director = director
+            movie.description = row['Description']
+            for name in row['Genre'].split(','):
+                genre = Genre(name.strip())
+                repo.add_genre(genre)
+                movie.genres.append(genre)
+            repo.add_director(director)
+            for name in row['Actors'].split(','):
+                actor = Actor(name.strip())
+                repo.add_actor(actor)
+                movie.actors.append(actor)
+            movie.runtime_minutes = int(row['Runtime (Minutes)'])
+            movie.id = int(row['Rank'])
+            repo.add_movie(movie)
+
+
+def measure(loader, filename):
+    gc.collect()
+    tracemalloc.start()
+    repo = MemoryRepository()
+    loader(filename, repo)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    movies = repo.get_movies_page(0, repo.count_movies())
+    entities = {id(entity) for movie in movies for entity in [movie.director, *movie.actors, *movie.genres]}
+    return current, peak, len(entities)
+
+
+def object_size(obj):
+    # The object itself plus its attribute dict, for classes that still have one.
+    return sys.getsizeof(obj) + (sys.getsizeof(obj.__dict__) if hasattr(obj, '__dict__') else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--movies', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_path:
+        filename = os.path.join(data_path, 'Data1000Movies.csv')
+        write_csv(filename, args.movies)
+        print(f"{'loader':<12} {'retained MB':>12} {'peak MB':>10} {'entity objects':>15}")
+        for name, loader in [('per-row', read_csv_file_without_interning), ('interned', read_csv_file)]:
+            current, peak, entities = measure(loader, filename)
+            print(f"{name:<12} {current / 2 ** 20:>12.1f} {peak / 2 ** 20:>10.1f} {entities:>15,}")
+
+    movie = Movie('Prometheus', 2012)
+    samples = [movie, Actor('Noomi Rapace'), Director('Ridley Scott'), Genre('Sci-Fi'),
+               Review(movie, 'Great', 8), User('user', 'password')]
+    print()
+    print(f"{'class':<12} {'bytes per object':>17}")
+    for sample in samples:
+        print(f"{type(sample).__name__:<12} {object_size(sample):>17}")
+
+
+if __name__ == '__main__':
+    main()
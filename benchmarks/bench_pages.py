@@ -0,0 +1,56 @@
+"""Measures requests per second on the movie list and detail routes with the rendered fragment cache
+disabled and enabled, cycling through every page and movie of the catalogue.
+
+Usage: python -m benchmarks.bench_pages [--seconds 3]
+"""
+import argparse
+import os
+import time
+
+import movie.adapters.repository as repo
+from movie import create_app
+
+DATA_PATH = os.path.join('movie', 'adapters', 'data')
+
+
+def requests_per_second(client, urls, seconds):
+    # Warm up once so both configurations are measured in their steady state.
+    for url in urls:
+        client.get(url)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        response = client.get(urls[count % len(urls)])
+        assert response.status_code == 200, urls[count % len(urls)]
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args()
+
+    results = dict()
+    for label, size in (('uncached', 0), ('cached', 2048)):
+        app = create_app({'TESTING': True, 'TEST_DATA_PATH': DATA_PATH, 'WTF_CSRF_ENABLED': False,
+                          'FRAGMENT_CACHE_SIZE': size})
+        client = app.test_client()
+        # Built up front, so the detail pages show similar movies and no build runs in the background.
+        repo.repo_instance.refresh_similar_movies()
+        count = repo.repo_instance.count_movies()
+        routes = {
+            'list': [f"/movies/?cursor={cursor}" for cursor in range(0, count, 5)],
+            'detail': [f"/movie/{movie.id}" for movie in repo.repo_instance.get_movies_page(0, count)],
+        }
+        for route, urls in routes.items():
+            results[route, label] = requests_per_second(client, urls, args.seconds)
+
+    print(f"{'route':<8} {'uncached rps':>13} {'cached rps':>11} {'speedup':>8}")
+    for route in ('list', 'detail'):
+        uncached, cached = results[route, 'uncached'], results[route, 'cached']
+        print(f"{route:<8} {uncached:>13.0f} {cached:>11.0f} {cached / uncached:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Compares the old per-request scan against the indexed actor/director/genre search and the
+bitmap facet query, and times ranked title/description search.
+
+Usage: python -m benchmarks.bench_search [--movies 1000000] [--repeat 5]
+"""
+import argparse
+import time
+
+from movie.adapters.memory_repository import MemoryRepository
+from benchmarks.synthetic import synthetic_movies
+
+QUERIES = {
+    'actor': ['chris', 'pratt', 'zoe saldana1', 'x'],
+    'director': ['nolan', 'ridley sc', 'villeneuve12'],
+    'genre': ['sci', 'drama', 'romance'],
+}
+
+TEXT_QUERIES = ['robot', 'lost memory', 'desert jour', 'heist ocean escape', 'kingdom*', 'zzz']
+
+# (genres, actor, director, years) combinations for query_facets.
+FACET_QUERIES = [
+    (['Action'], None, None, None),
+    (['Action', 'Sci-Fi'], None, None, (2010, 2014)),
+    (['Drama', 'Romance', 'War'], None, None, (2006, None)),
+    (['Comedy'], 'pratt', None, None),
+    ([], 'chris', 'nolan', (None, 2012)),
+]
+
+
+def scan_by_actor(movies, actorname):
+    matching_movies = list()
+    for movie in movies:
+        for actor in movie.actors:
+            if actorname.lower() in actor.actor_full_name.lower():
+                matching_movies.append(movie)
+                break
+    return matching_movies
+
+
+def scan_by_director(movies, directorname):
+    return [movie for movie in movies if directorname.lower() in movie.director.director_full_name.lower()]
+
+
+def scan_by_genre(movies, genrename):
+    matching_movies = list()
+    for movie in movies:
+        for genre in movie.genres:
+            if genrename.lower() in genre.genre_name.lower():
+                matching_movies.append(movie)
+                break
+    return matching_movies
+
+
+def scan_facets(movies, genres, actor, director, years):
+    # What combining the single-field searches costs: one scan per facet, then an intersection.
+    selected = set(movies)
+    for genre in genres:
+        selected.intersection_update(movie for movie in scan_by_genre(movies, genre)
+                                     if any(g.genre_name.lower() == genre.lower() for g in movie.genres))
+    if actor is not None:
+        selected.intersection_update(scan_by_actor(movies, actor))
+    if director is not None:
+        selected.intersection_update(scan_by_director(movies, director))
+    if years is not None:
+        low, high = years
+        selected.intersection_update(movie for movie in movies
+                                     if (low is None or movie.year >= low) and (high is None or movie.year <= high))
+    return len(selected)
+
+
+def facet_label(genres, actor, director, years):
+    parts = list(genres)
+    if actor is not None:
+        parts.append(f"actor={actor}")
+    if director is not None:
+        parts.append(f"director={director}")
+    if years is not None:
+        parts.append(f"years={years[0] or ''}-{years[1] or ''}")
+    return ' '.join(parts)
+
+
+def timed(func, *args, repeat=1):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--movies', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    repo = MemoryRepository()
+    start = time.perf_counter()
+    for movie in synthetic_movies(args.movies):
+        repo.add_movie(movie)
+    print(f"loaded and indexed {args.movies} movies in {time.perf_counter() - start:.2f}s")
+
+    scans = {'actor': scan_by_actor, 'director': scan_by_director, 'genre': scan_by_genre}
+    lookups = {'actor': repo.get_movies_by_actor, 'director': repo.get_movies_by_director,
+               'genre': repo.get_movies_by_genre}
+    print(f"{'field':<9} {'query':<14} {'hits':>8} {'scan ms':>10} {'index ms':>10} {'speedup':>8}")
+    for field, queries in QUERIES.items():
+        for query in queries:
+            scan_time, expected = timed(scans[field], repo._movies, query, repeat=args.repeat)
+            index_time, actual = timed(lookups[field], query, repeat=args.repeat)
+            assert actual == expected, f"indexed {field} search for {query!r} differs from the scan"
+            print(f"{field:<9} {query:<14} {len(actual):>8} {scan_time * 1000:>10.2f} {index_time * 1000:>10.2f} "
+                  f"{scan_time / max(index_time, 1e-9):>7.1f}x")
+
+    print()
+    print(f"{'text query':<24} {'hits':>8} {'first ms':>10} {'repeat ms':>10}")
+    for query in TEXT_QUERIES:
+        first_time, hits = timed(repo.get_movies_by_text, query)
+        repeat_time, _ = timed(repo.get_movies_by_text, query, repeat=args.repeat)
+        print(f"{query:<24} {len(hits):>8} {first_time * 1000:>10.2f} {repeat_time * 1000:>10.2f}")
+
+    print()
+    print(f"{'facets':<44} {'hits':>8} {'scan ms':>10} {'bitmap ms':>10} {'speedup':>8}")
+    for genres, actor, director, years in FACET_QUERIES:
+        scan_time, expected = timed(scan_facets, repo._movies, genres, actor, director, years, repeat=args.repeat)
+        facet_time, result = timed(repo.query_facets, 0, 10, genres, actor, director, years, repeat=args.repeat)
+        assert result['total'] == expected, f"facet query {genres, actor, director, years} differs from the scan"
+        print(f"{facet_label(genres, actor, director, years):<44} {result['total']:>8} {scan_time * 1000:>10.2f} {facet_time * 1000:>10.2f} "
+              f"{scan_time / max(facet_time, 1e-9):>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Measures how long the similar movies table takes to build for synthetic catalogues of several sizes,
+and the latency of serving similar movies and recommendations from it against scoring the movie
+against the whole catalogue on each request.
+
+Usage: python -m benchmarks.bench_similar [--movies 1000 10000 100000] [--lookups 1000]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.synthetic import synthetic_movies
+from movie.adapters.similar import SimilarityIndex
+
+
+def scan_similar(vectors, position, limit):
+    # What a request would do without the table: score the movie against every other.
+    vector = vectors[position]
+    scores = [(sum(weight * other.get(feature, 0.0) for feature, weight in vector.items()), i)
+              for i, other in enumerate(vectors) if i != position]
+    scores.sort(reverse=True)
+    return scores[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--movies', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--lookups', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'movies':>8} {'build s':>8} {'similar us':>11} {'recommend us':>13} {'scan us':>10}")
+    for count in args.movies:
+        movies = list(synthetic_movies(count))
+        for movie_id, movie in enumerate(movies, 1):
+            movie.id = movie_id
+        index = SimilarityIndex()
+        start = time.perf_counter()
+        index.build(movies)
+        build = time.perf_counter() - start
+
+        rng = random.Random(0)
+        ids = [rng.randint(1, count) for _ in range(args.lookups)]
+        start = time.perf_counter()
+        for movie_id in ids:
+            index.similar(movie_id, 6)
+        similar = (time.perf_counter() - start) / len(ids) * 1e6
+        start = time.perf_counter()
+        for i in range(len(ids)):
+            index.recommend(ids[i:i + 20], 8)
+        recommend = (time.perf_counter() - start) / len(ids) * 1e6
+
+        _, vectors, _ = SimilarityIndex._weigh(movies)
+        scans = ids[:max(len(ids) // 100, 3)]
+        start = time.perf_counter()
+        for movie_id in scans:
+            scan_similar(vectors, movie_id - 1, 6)
+        scan = (time.perf_counter() - start) / len(scans) * 1e6
+        print(f"{count:>8} {build:>8.2f} {similar:>11.1f} {recommend:>13.1f} {scan:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Measures /search/suggest completion latency over a synthetic catalogue, replaying every prefix of
+a set of names as if they were being typed, then again with a movie added before every query.
+
+Usage: python -m benchmarks.bench_suggest [--movies 1000000] [--limit 10]
+"""
+import argparse
+import time
+
+from movie.adapters.memory_repository import MemoryRepository
+from benchmarks.synthetic import synthetic_movies
+
+TYPED = {
+    'actor': ['chris pratt', 'zoe saldana12', 'scarlett', 'denzel washington3'],
+    'director': ['ridley scott', 'nolan', 'greta gerwig7'],
+    'genre': ['sci-fi', 'romance', 'drama'],
+    'title': ['the lost kingdom', 'robot heist', 'desert'],
+}
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--movies', type=int, default=1000000)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    repo = MemoryRepository()
+    start = time.perf_counter()
+    for movie in synthetic_movies(args.movies):
+        repo.add_movie(movie)
+    print(f"loaded and indexed {args.movies} movies in {time.perf_counter() - start:.2f}s")
+
+    print(f"{'field':<9} {'build ms':>10} {'queries':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for field, names in TYPED.items():
+        start = time.perf_counter()
+        repo.get_suggestions(field, names[0][0], args.limit)
+        build_time = time.perf_counter() - start
+        samples = []
+        for name in names:
+            for end in range(1, len(name) + 1):
+                start = time.perf_counter()
+                repo.get_suggestions(field, name[:end], args.limit)
+                samples.append(time.perf_counter() - start)
+        print(f"{field:<9} {build_time * 1000:>10.1f} {len(samples):>8} {percentile(samples, 0.5) * 1000:>8.3f} "
+              f"{percentile(samples, 0.99) * 1000:>8.3f} {max(samples) * 1000:>8.3f}")
+
+    # Every query after a write: the added names must not make the next query rebuild the index.
+    print(f"\n{'field':<9} {'add ms':>10} {'queries':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    added = synthetic_movies(sum(len(name) for names in TYPED.values() for name in names), seed=1)
+    for field, names in TYPED.items():
+        adds, samples = [], []
+        for name in names:
+            for end in range(1, len(name) + 1):
+                start = time.perf_counter()
+                repo.add_movie(next(added))
+                adds.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                repo.get_suggestions(field, name[:end], args.limit)
+                samples.append(time.perf_counter() - start)
+        print(f"{field:<9} {percentile(adds, 0.5) * 1000:>10.3f} {len(samples):>8} "
+              f"{percentile(samples, 0.5) * 1000:>8.3f} {percentile(samples, 0.99) * 1000:>8.3f} "
+              f"{max(samples) * 1000:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Load test for the user store: registrations and logins against 100k users, plus a
+registration race that must never create duplicate users.
+
+Usage: python -m benchmarks.bench_users [--users 100000] [--threads 8]
+"""
+import argparse
+import random
+import threading
+import time
+
+from werkzeug.security import generate_password_hash
+
+from movie.adapters.memory_repository import MemoryRepository
+from movie.adapters.repository import RepositoryException
+from movie.domain.model import User
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    # Hashing dominates a real registration, so hash once and measure the store itself.
+    password_hash = generate_password_hash('Password1')
+    repo = MemoryRepository()
+    names = [f"User{i:07d}" for i in range(args.users)]
+
+    start = time.perf_counter()
+    for name in names:
+        repo.add_user(User(name, password_hash))
+    elapsed = time.perf_counter() - start
+    print(f"registered {args.users} users in {elapsed:.2f}s ({args.users / elapsed:,.0f}/s)")
+
+    samples = []
+    rng = random.Random(0)
+    for _ in range(args.users):
+        name = rng.choice(names)
+        start = time.perf_counter()
+        user = repo.get_user(f"  {name.upper()} ")
+        samples.append(time.perf_counter() - start)
+        assert user is not None and user.user_name == name.lower()
+    print(f"login lookups: p50 {percentile(samples, 0.5) * 1e6:.2f}us p99 {percentile(samples, 0.99) * 1e6:.2f}us")
+
+    # Every thread races to register the same names; exactly one registration per name may win.
+    contested = [f"Contested{i:06d}" for i in range(args.users // 10)]
+    wins = [0] * args.threads
+
+    def register(slot):
+        for name in contested:
+            try:
+                repo.add_user(User(name, password_hash))
+                wins[slot] += 1
+            except RepositoryException:
+                pass
+
+    threads = [threading.Thread(target=register, args=(slot,)) for slot in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    assert sum(wins) == len(contested), f"{sum(wins)} registrations succeeded for {len(contested)} names"
+    print(f"{args.threads} threads raced on {len(contested)} names in {elapsed:.2f}s: no duplicates")
+
+
+if __name__ == '__main__':
+    main()
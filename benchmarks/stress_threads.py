@@ -0,0 +1,118 @@
+"""Stress test for threaded serving: many threads search, list, complete names and post reviews through
+the app at the same time, while another adds movies to the catalogue. Fails if any request errors or
+if the review counts and catalogue indexes disagree with what was written once every thread is done.
+
+Usage: python -m benchmarks.stress_threads [--threads 16] [--seconds 5]
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+import movie.adapters.repository as repo
+import movie.movies.services as services
+from benchmarks.synthetic import synthetic_movies
+from movie import create_app
+
+DATA_PATH = os.path.join('movie', 'adapters', 'data')
+
+READ_URLS = [
+    '/api/v1/search?option=Actor&q=chris',
+    '/api/v1/search?option=Director&q=scott',
+    '/api/v1/search?option=Genre&q=drama',
+    '/api/v1/search?option=Title/Description&q=space+war',
+    '/api/v1/movies?sort=rating&order=desc',
+    '/api/v1/movies?sort=title&year_min=2010',
+    '/search/?genre=Action&genre=Sci-Fi&year_min=2012',
+    '/search/suggest?option=Actor&q=ch',
+    '/search/suggest?option=Title/Description&q=the',
+    '/movies/?cursor=40',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--added-movies', type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app({'TESTING': True, 'TEST_DATA_PATH': DATA_PATH, 'WTF_CSRF_ENABLED': False,
+                      'REPOSITORY': 'memory', 'WARM_UP': False})
+    repository = repo.repo_instance
+    movies = repository.get_movies_page(0, repository.count_movies())
+    deadline = time.perf_counter() + args.seconds
+    errors = []
+    posted = Counter()
+    requests = Counter()
+    counts_lock = threading.Lock()
+
+    def reader_and_writer(seed):
+        rng = random.Random(seed)
+        client = app.test_client()
+        mine = Counter()
+        served = 0
+        try:
+            while time.perf_counter() < deadline:
+                if rng.random() < 0.2:
+                    target = rng.choice(movies)
+                    services.add_review_to_movie(target, f"stress review {seed}", repository)
+                    mine[target.id] += 1
+                else:
+                    url = rng.choice(READ_URLS)
+                    response = client.get(url)
+                    if response.status_code != 200:
+                        errors.append(f"{url}: {response.status_code}")
+                served += 1
+        except Exception as error:
+            errors.append(repr(error))
+        with counts_lock:
+            posted.update(mine)
+            requests[seed] = served
+
+    def catalogue_writer():
+        try:
+            for movie in synthetic_movies(args.added_movies, seed=1):
+                if time.perf_counter() >= deadline:
+                    break
+                movie.id = None
+                repository.add_movie(movie)
+                time.sleep(0.001)
+        except Exception as error:
+            errors.append(repr(error))
+
+    threads = [threading.Thread(target=reader_and_writer, args=(seed,)) for seed in range(args.threads)]
+    threads.append(threading.Thread(target=catalogue_writer))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    for movie_id, count in posted.items():
+        stats = repository.get_review_stats(repository.get_movie(movie_id))
+        reviews = repository.get_reviews_by_movie(repository.get_movie(movie_id))
+        if stats['count'] != count or len(reviews) != count:
+            errors.append(f"movie {movie_id}: {count} reviews posted, {stats['count']} counted, {len(reviews)} stored")
+    total = repository.count_movies()
+    for actor in ('chris', 'scott'):
+        expected = [m.id for m in repository.get_movies_page(0, total)
+                    if any(actor in a.actor_full_name.lower() for a in m.actors)]
+        found = [m.id for m in repository.get_movies_by_actor(actor)]
+        if found != expected:
+            errors.append(f"actor index for {actor!r} disagrees with the catalogue")
+
+    print(f"{args.threads} threads, {sum(requests.values())} operations in {elapsed:.1f}s "
+          f"({sum(requests.values()) / elapsed:.0f}/s), {sum(posted.values())} reviews posted, "
+          f"{total - len(movies)} movies added")
+    if errors:
+        print(f"{len(errors)} errors, first: {errors[0]}")
+        raise SystemExit(1)
+    print("no errors; review counts and indexes consistent")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+"""Benchmark suite: loads synthetic catalogues in the Data1000Movies.csv schema through create_app, runs
+every AbstractRepository method and every route through the test client, and records throughput and
+p50/p99 latency of each as JSON. With a baseline, exits non-zero when an operation's p50 latency grew
+by more than the tolerance, so scaling work can be proven and kept. Every run also times a fixed
+calibration workload, and the baseline's latencies are scaled by how much slower or faster it ran
+here, so a baseline recorded on one machine can be checked on another.
+
+Usage: python -m benchmarks.suite [--movies 1000 100000] [--repository memory|database]
+                                  [--seconds 0.5] [--output results.json]
+                                  [--baseline benchmarks/baseline.json] [--tolerance 0.5]
+                                  [--update-baseline] [--data-dir DIR]
+
+Catalogues are written with a fixed seed, so every run measures the same data. --data-dir keeps them,
+with their snapshots, between runs; the million-movie catalogue takes minutes to generate and load.
+"""
+import argparse
+import concurrent.futures
+import inspect
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import movie.adapters.repository as repo
+import movie.movies.services as services
+from benchmarks.synthetic import synthetic_movies, write_csv
+from movie import create_app
+from movie.adapters.memory_repository import build_snapshot
+from movie.adapters.repository import AbstractRepository
+from movie.domain.model import Actor, Director, Genre, Review, User
+
+SEED = 0
+BASELINE = os.path.join('benchmarks', 'baseline.json')
+# Changes in latency below this many milliseconds are timer noise, whatever the ratio.
+NOISE_MS = 0.05
+# Catalogue sizes measured by default, and recorded in the baseline. A million movies does not fit the
+# memory of the reference machine alongside the similar movies table; pass --movies 1000000 to measure it.
+CATALOGUES = [1000, 100000]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(operation, seconds, max_calls=100000):
+    """ Calls operation(i) for i = 0, 1, ... for about seconds, after a few untimed calls, and summarises the latencies. """
+    for i in range(3):
+        operation(i)
+    latencies = []
+    start = time.perf_counter()
+    for i in itertools.count(3):
+        began = time.perf_counter()
+        operation(i)
+        latencies.append(time.perf_counter() - began)
+        if began - start >= seconds or len(latencies) >= max_calls:
+            break
+    elapsed = time.perf_counter() - start
+    return {
+        'calls': len(latencies),
+        'ops_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1e3, 6),
+        'p99_ms': round(percentile(latencies, 0.99) * 1e3, 6),
+    }
+
+
+def calibrate(seconds):
+    """ Returns the p50 latency in ms of a fixed workload of common interpreter operations on this machine. """
+    def workload(i):
+        words = [f"movie {j} {j * 7919 % 1000}" for j in range(2000)]
+        counts = dict()
+        for word in sorted(words, key=str.split):
+            counts[word[-3:]] = counts.get(word[-3:], 0) + 1
+    return measure(workload, seconds)['p50_ms']
+
+
+def catalogue_dir(base, movies):
+    directory = os.path.join(base, f"movies-{movies}")
+    filename = os.path.join(directory, 'Data1000Movies.csv')
+    if not os.path.exists(filename):
+        os.makedirs(directory, exist_ok=True)
+        write_csv(filename, movies, SEED)
+        build_snapshot(directory)
+    return directory
+
+
+def repository_operations(repository, rng):
+    """ Returns name -> operation(i) for every AbstractRepository method, reads first and writes last. """
+    total = repository.count_movies()
+    movies = [repository.get_movies_page(rng.randrange(total), 1)[0] for _ in range(50)]
+    actors = [movie.actors[0].actor_full_name for movie in movies]
+    directors = [movie.director.director_full_name for movie in movies]
+    genres = [movie.genres[0].genre_name for movie in movies]
+    words = [movie.title.split()[0].lower() for movie in movies]
+
+    def pick(values, i):
+        return values[i % len(values)]
+
+    new_movies = iter(synthetic_movies(10 ** 6, seed=SEED + 1))
+
+    def add_movie(i):
+        movie = next(new_movies)
+        movie.id = None
+        repository.add_movie(movie)
+
+    def add_movies(i):
+        batch = [next(new_movies) for _ in range(10)]
+        for movie in batch:
+            movie.id = None
+        repository.add_movies(batch)
+
+    return {
+        'count_movies': lambda i: repository.count_movies(),
+        'get_catalogue_size': lambda i: repository.get_catalogue_size(),
+        'get_version': lambda i: repository.get_version(),
+        'get_genres': lambda i: repository.get_genres(),
+        'get_movie': lambda i: repository.get_movie(pick(movies, i).id),
+        'get_movie_by_name': lambda i: repository.get_movie_by_name(pick(movies, i).title),
+        'get_movies_page': lambda i: repository.get_movies_page((i * 997) % total, 20),
+        'query_movies': lambda i: repository.query_movies((i * 7) % 100, 20, 'rating', i % 2 == 0,
+                                                          {'year': (1990, 2010)}),
+        'query_facets': lambda i: repository.query_facets(0, 20, [pick(genres, i)], None, None, (2000, None)),
+        'get_movies_by_actor': lambda i: repository.get_movies_by_actor(pick(actors, i)),
+        'get_movies_by_director': lambda i: repository.get_movies_by_director(pick(directors, i)),
+        'get_movies_by_genre': lambda i: repository.get_movies_by_genre(pick(genres, i)),
+        'get_movies_by_text': lambda i: repository.get_movies_by_text(pick(words, i)),
+        'get_suggestions': lambda i: repository.get_suggestions('actor', pick(actors, i)[:3], 10),
+        'get_reviews_by_movie': lambda i: repository.get_reviews_by_movie(pick(movies, i)),
+        'get_review_stats': lambda i: repository.get_review_stats(pick(movies, i)),
+        'get_similar_movies': lambda i: repository.get_similar_movies(pick(movies, i), 6),
+        'get_recommended_movies': lambda i: repository.get_recommended_movies(movies[i % 40:i % 40 + 10], 8),
+        'similar_movies_ready': lambda i: repository.similar_movies_ready(),
+        'refresh_similar_movies': lambda i: repository.refresh_similar_movies(),
+        'refresh_collaborations': lambda i: repository.refresh_collaborations(),
+        'actors_worked_together': lambda i: repository.actors_worked_together(pick(actors, i), pick(actors, i + 1)),
+        'get_actor_path': lambda i: repository.get_actor_path(pick(actors, i), pick(actors, i + 7)),
+        'get_user': lambda i: repository.get_user(f"bench user {i % 100}"),
+        'add_user': lambda i: repository.add_user(User(f"bench user {i}", 'not a real hash')),
+        'watch_movie': lambda i: repository.watch_movie('bench user 0', pick(movies, i)),
+        'get_watched_movies': lambda i: repository.get_watched_movies('bench user 0', 20),
+        'add_review': lambda i: repository.add_review(Review(pick(movies, i), 'A benchmark review.', i % 10 + 1)),
+        'add_actor': lambda i: repository.add_actor(Actor(pick(actors, i))),
+        'add_director': lambda i: repository.add_director(Director(pick(directors, i))),
+        'add_genre': lambda i: repository.add_genre(Genre(pick(genres, i))),
+        # Last: a new movie makes the lazily built indexes rebuild on their next use.
+        'add_movie': add_movie,
+        'add_movies': add_movies,
+    }
+
+
+def route_requests(app, repository, rng):
+    """ Returns 'METHOD rule[?variant]' -> operation(i) covering every route of app. """
+    client = app.test_client()
+    total = repository.count_movies()
+    movies = [repository.get_movies_page(rng.randrange(total), 1)[0] for _ in range(50)]
+    actor = movies[0].actors[0].actor_full_name
+    other = movies[1].actors[0].actor_full_name
+    genre = movies[0].genres[0].genre_name
+    client.post('/authentication/register', data={'username': 'bench', 'password': 'Bench12345678'})
+    review_ticket = services.submit_review(movies[0], 'A benchmark review.')
+
+    def get(url):
+        def operation(i):
+            response = client.get(url(i) if callable(url) else url)
+            assert response.status_code < 500, (url, response.status_code)
+        return operation
+
+    def post(url, data):
+        def operation(i):
+            response = client.post(url(i) if callable(url) else url, data=data(i) if callable(data) else data)
+            assert response.status_code < 500, (url, response.status_code)
+        return operation
+
+    def movie_id(i):
+        return movies[i % len(movies)].id
+
+    return {
+        'GET /': get('/'),
+        'GET /movies/': get(lambda i: f'/movies/?cursor={(i * 5) % total}'),
+        'GET /movies/?sort': get(lambda i: f'/movies/?cursor={i % 100}&sort=rating&order=desc&year_min=1990'),
+        'GET /movie/<int:movie_id>': get(lambda i: f'/movie/{movie_id(i)}'),
+        'GET /movie/': get(lambda i: f'/movie/?moviename={movies[i % len(movies)].title}'),
+        'POST /movie/<int:movie_id>': post(lambda i: f'/movie/{movie_id(i)}', {'comment': 'A benchmark review.'}),
+        'POST /movie/': post('/movie/', lambda i: {'moviename': movies[i % len(movies)].title}),
+        'GET /search/': get(lambda i: f'/search/?genre={genre}&year_min=2000&cursor={i % 50}'),
+        'POST /search/': post('/search/', lambda i: {'option': 'Actor', 'keyword': actor[:4 + i % 3]}),
+        'GET /search/suggest': get(lambda i: f'/search/suggest?option=Actor&q={actor[:1 + i % 4]}'),
+        'GET /search/cache': get('/search/cache'),
+        'GET /review/<ticket>': get(f'/review/{review_ticket}'),
+        'GET /api/v1/movies': get(lambda i: f'/api/v1/movies?cursor={(i * 20) % total}'),
+        'GET /api/v1/movies/<int:movie_id>': get(lambda i: f'/api/v1/movies/{movie_id(i)}'),
+        'GET /api/v1/movies/<int:movie_id>/reviews': get(lambda i: f'/api/v1/movies/{movie_id(i)}/reviews'),
+        'GET /api/v1/movies/<int:movie_id>/similar': get(lambda i: f'/api/v1/movies/{movie_id(i)}/similar'),
+        'GET /api/v1/search': get(lambda i: f'/api/v1/search?option=Actor&q={actor[:4 + i % 3]}'),
+        'GET /api/v1/actors/path': get(f'/api/v1/actors/path?from={actor}&to={other}'),
+        'GET /authentication/register': get('/authentication/register'),
+        'POST /authentication/register': post('/authentication/register',
+                                              lambda i: {'username': f'bench{i}', 'password': 'Bench12345678'}),
+        'GET /authentication/login': get('/authentication/login'),
+        'POST /authentication/login': post('/authentication/login',
+                                           {'username': 'bench', 'password': 'Bench12345678'}),
+        'GET /authentication/logout': get('/authentication/logout'),
+        'GET /static/<path:filename>': get('/static/css/main.css'),
+    }
+
+
+def uncovered_routes(app, requests):
+    covered = {name.split('?')[0] for name in requests}
+    return sorted(f"{method} {rule.rule}" for rule in app.url_map.iter_rules()
+                  for method in rule.methods - {'HEAD', 'OPTIONS'} if f"{method} {rule.rule}" not in covered)
+
+
+def uncovered_methods(operations):
+    abstract = {name for name, _ in inspect.getmembers(AbstractRepository, inspect.isfunction)
+                if getattr(getattr(AbstractRepository, name), '__isabstractmethod__', False)}
+    return sorted(abstract - set(operations))
+
+
+def run(movies, args):
+    directory = catalogue_dir(args.data_dir, movies)
+    config = {'TESTING': True, 'TEST_DATA_PATH': directory, 'WTF_CSRF_ENABLED': False,
+              'REPOSITORY': args.repository, 'REVIEW_WORKERS': 0, 'SIMILAR_MOVIES_AT_STARTUP': False,
+              'JOURNAL_PATH': '', 'METRICS_ENABLED': False, 'WARM_UP': False}
+    if args.repository == 'database':
+        config['DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'movies.db')}"
+    start = time.perf_counter()
+    app = create_app(config)
+    results = {'load_seconds': round(time.perf_counter() - start, 3), 'operations': dict()}
+    repository = repo.repo_instance
+    # Built up front, so the pages measured show similar movies and no build runs in the background.
+    start = time.perf_counter()
+    repository.refresh_similar_movies()
+    results['similar_movies_seconds'] = round(time.perf_counter() - start, 3)
+
+    # Routes first: the repository writes below change what the pages show.
+    requests = route_requests(app, repository, random.Random(SEED))
+    for missing in uncovered_routes(app, requests):
+        print(f"warning: route {missing} is not benchmarked", file=sys.stderr)
+    for name, operation in requests.items():
+        results['operations'][f"route {name}"] = measure(operation, args.seconds)
+
+    operations = repository_operations(repository, random.Random(SEED))
+    for missing in uncovered_methods(operations):
+        print(f"warning: repository method {missing} is not benchmarked", file=sys.stderr)
+    for name, operation in operations.items():
+        results['operations'][f"repository {name}"] = measure(operation, args.seconds)
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    # The baseline's latencies as they would be on this machine.
+    scale = results['meta']['calibration_ms'] / baseline['meta']['calibration_ms']
+    found = []
+    for size, entry in results['catalogues'].items():
+        previous = baseline.get('catalogues', {}).get(size)
+        if previous is None:
+            continue
+        for name, current in entry['operations'].items():
+            before = previous['operations'].get(name)
+            if before is None:
+                continue
+            expected = before['p50_ms'] * scale
+            if current['p50_ms'] > expected * (1 + tolerance) and current['p50_ms'] - expected > NOISE_MS:
+                found.append(f"{size} movies, {name}: p50 {expected:.3f} ms (scaled baseline) -> "
+                             f"{current['p50_ms']:.3f} ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--movies', type=int, nargs='+', default=CATALOGUES)
+    parser.add_argument('--repository', choices=('memory', 'database'), default='memory')
+    parser.add_argument('--seconds', type=float, default=0.5)
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--data-dir')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        args.data_dir = args.data_dir or scratch
+        results = {
+            'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                     'repository': args.repository, 'seed': SEED, 'seconds': args.seconds,
+                     'calibration_ms': calibrate(args.seconds)},
+            'catalogues': dict(),
+        }
+        for movies in args.movies:
+            print(f"benchmarking {movies} movies ...", file=sys.stderr)
+            # Each catalogue in a process of its own, so its memory is returned before the next one loads.
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1) as pool:
+                results['catalogues'][str(movies)] = pool.submit(run, movies, args).result()
+
+    with open(args.output, 'w') as outfile:
+        json.dump(results, outfile, indent=2, sort_keys=True)
+    for size, entry in results['catalogues'].items():
+        print(f"\n{size} movies (loaded in {entry['load_seconds']:.1f}s)")
+        print(f"{'operation':<52} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+        for name, summary in entry['operations'].items():
+            print(f"{name:<52} {summary['ops_per_sec']:>10.0f} {summary['p50_ms']:>9.3f} {summary['p99_ms']:>9.3f}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as outfile:
+            json.dump(results, outfile, indent=2, sort_keys=True)
+        print(f"\nwrote baseline {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nno baseline at {args.baseline}; run with --update-baseline to record one")
+        return
+    with open(args.baseline) as infile:
+        baseline = json.load(infile)
+    if baseline['meta'].get('repository') != args.repository:
+        print(f"\nbaseline {args.baseline} is for the {baseline['meta'].get('repository')} repository; not compared")
+        return
+    if not baseline['meta'].get('calibration_ms'):
+        # Its latencies cannot be scaled to this machine, so any comparison would only measure the hardware.
+        raise SystemExit(f"\nbaseline {args.baseline} has no calibration; record it again with --update-baseline")
+    print(f"\nthis machine ran the calibration in {results['meta']['calibration_ms']:.3f} ms, "
+          f"the baseline's in {baseline['meta']['calibration_ms']:.3f} ms")
+    for size in results['catalogues']:
+        if size not in baseline['catalogues']:
+            print(f"warning: baseline {args.baseline} has no {size} movie catalogue; it is not compared",
+                  file=sys.stderr)
+    found = regressions(results, baseline, args.tolerance)
+    if found:
+        print(f"\n{len(found)} regressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+        for line in found:
+            print(f"  {line}")
+        raise SystemExit(1)
+    print(f"\nno regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Synthetic catalogues in the Data1000Movies.csv schema, used by the benchmarks."""
+import csv
+import random
+
+from movie.domain.model import Movie, Director, Actor, Genre
+
+FIELDNAMES = ['Rank', 'Title', 'Genre', 'Description', 'Director', 'Actors', 'Year', 'Runtime (Minutes)',
+              'Rating', 'Votes', 'Revenue (Millions)', 'Metascore']
+
+GENRES = ['Action', 'Adventure', 'Animation', 'Biography', 'Comedy', 'Crime', 'Drama', 'Family', 'Fantasy',
+          'History', 'Horror', 'Music', 'Musical', 'Mystery', 'Romance', 'Sci-Fi', 'Sport', 'Thriller',
+          'War', 'Western']
+
+FIRST_NAMES = ['James', 'Mary', 'Chris', 'Emma', 'Ridley', 'Zoe', 'Noomi', 'Michael', 'Charlize', 'Vin',
+               'Bradley', 'Logan', 'Anna', 'David', 'Sofia', 'Hugh', 'Jennifer', 'Tom', 'Scarlett', 'Ryan',
+               'Natalie', 'Denzel', 'Kate', 'Samuel', 'Viola', 'Keanu', 'Meryl', 'Idris', 'Cate', 'Matt']
+
+LAST_NAMES = ['Gunn', 'Pratt', 'Diesel', 'Cooper', 'Saldana', 'Rapace', 'Marshall', 'Fassbender', 'Theron',
+              'Scott', 'Nolan', 'Jackman', 'Lawrence', 'Hanks', 'Johansson', 'Gosling', 'Portman',
+              'Washington', 'Winslet', 'Jackson', 'Davis', 'Reeves', 'Streep', 'Elba', 'Blanchett', 'Damon',
+              'Stone', 'Hardy', 'Murphy', 'Coppola', 'Lee', 'Bigelow', 'Villeneuve', 'Gerwig', 'Zhao']
+
+WORDS = ['a', 'group', 'of', 'intergalactic', 'criminals', 'team', 'finds', 'structure', 'distant', 'moon',
+         'soon', 'realize', 'they', 'are', 'not', 'alone', 'young', 'detective', 'city', 'family', 'war',
+         'secret', 'love', 'journey', 'across', 'the', 'desert', 'must', 'stop', 'fanatical', 'warrior',
+         'heist', 'ocean', 'robot', 'kingdom', 'lost', 'memory', 'future', 'past', 'dream', 'escape']
+
+
+def _names(rng: random.Random, count: int):
+    names = set()
+    while len(names) < count:
+        names.add(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{rng.randrange(count) or ''}")
+    return sorted(names)
+
+
+def synthetic_rows(count: int, seed: int = 0):
+    """ Yields count rows shaped like csv.DictReader rows of Data1000Movies.csv. """
+    rng = random.Random(seed)
+    actors = _names(rng, max(count // 2, 50))
+    directors = _names(rng, max(count // 8, 20))
+    for rank in range(1, count + 1):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+        revenue = "" if rng.random() < 0.1 else f"{rng.uniform(0, 900):.2f}"
+        metascore = "" if rng.random() < 0.05 else str(rng.randint(10, 100))
+        yield {
+            'Rank': str(rank),
+            'Title': f"{title} {rank}",
+            'Genre': ",".join(rng.sample(GENRES, rng.randint(1, 3))),
+            'Description': " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 30))).capitalize() + ".",
+            'Director': rng.choice(directors),
+            'Actors': ", ".join(rng.sample(actors, 4)),
+            'Year': str(rng.randint(1950, 2020)),
+            'Runtime (Minutes)': str(rng.randint(70, 200)),
+            'Rating': f"{rng.uniform(1, 10):.1f}",
+            'Votes': str(rng.randint(10, 2000000)),
+            'Revenue (Millions)': revenue,
+            'Metascore': metascore,
+        }
+
+
+def write_csv(path: str, count: int, seed: int = 0):
+    with open(path, 'w', encoding='utf-8', newline='') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(synthetic_rows(count, seed))
+
+
+def synthetic_movies(count: int, seed: int = 0):
+    """ Yields Movie objects sharing one instance per distinct actor, director and genre. """
+    entities = dict()
+
+    def intern(cls, name):
+        key = (cls, name)
+        entity = entities.get(key)
+        if entity is None:
+            entity = entities[key] = cls(name)
+        return entity
+
+    for row in synthetic_rows(count, seed):
+        movie = Movie(row['Title'], int(row['Year']))
+        movie.description = row['Description']
+        movie.director = intern(Director, row['Director'])
+        movie.genres = [intern(Genre, name) for name in row['Genre'].split(',')]
+        movie.actors = [intern(Actor, name.strip()) for name in row['Actors'].split(',')]
+        movie.runtime_minutes = int(row['Runtime (Minutes)'])
+        yield movie
@@ -1,11 +1,23 @@
 """Initialize Flask app."""
 
+import atexit
 import os
+import time
 
+import click
 from flask import Flask
 
 import movie.adapters.repository as repo
-from movie.adapters.memory_repository import MemoryRepository, populate
+import movie.adapters.database_repository as database_repository
+import movie.movies.services as movie_services
+from movie.adapters.database_repository import DatabaseRepository
+from movie.adapters.memory_repository import MemoryRepository, populate, build_snapshot
+from movie.domain.model import Actor
+from movie.movies.moderation import ReviewQueue
+from movie.utilities.cache import LRUCache
+from movie.utilities.metrics import InstrumentedRepository, Metrics, enable_metrics, enable_profiling, instrument_function
+from movie.utilities.metrics import restore_functions
+from movie.utilities.warmup import use_bytecode_cache, warm_up
 
 
 def create_app(test_config=None):
@@ -23,9 +35,75 @@ def create_app(test_config=None):
         app.config.from_mapping(test_config)
         data_path = app.config['TEST_DATA_PATH']
 
-    # Create the MemoryRepository implementation for a memory-based repository.
-    repo.repo_instance = MemoryRepository()
-    populate(data_path, repo.repo_instance)
+    start = time.perf_counter()
+    if app.config['REPOSITORY'] == 'database':
+        # Create the DatabaseRepository implementation, bulk loading the catalogue into an empty database.
+        repo.repo_instance = DatabaseRepository(app.config['DATABASE_URI'], app.config['DATABASE_POOL_SIZE'])
+        source = 'database'
+        if repo.repo_instance.count_movies() == 0:
+            # Movies another worker loads first are skipped as already stored.
+            source = database_repository.populate(data_path, repo.repo_instance, sources=app.config['CATALOGUE_PATH'])
+        # Read the casts into this process's actor collaboration graph now, rather than on the first query.
+        repo.repo_instance.refresh_collaborations()
+    else:
+        # Create the MemoryRepository implementation for a memory-based repository.
+        repo.repo_instance = MemoryRepository()
+        source = populate(data_path, repo.repo_instance, sources=app.config['CATALOGUE_PATH'])
+        if app.config['JOURNAL_PATH']:
+            # Restore the users and reviews added before the last shutdown, and journal new ones.
+            restored = repo.repo_instance.open_journal(app.config['JOURNAL_PATH'], app.config['JOURNAL_COMPACT_EVERY'])
+            app.logger.info('Restored %d users and reviews from %s', restored, app.config['JOURNAL_PATH'])
+    app.config['CATALOGUE_LOAD_SECONDS'] = time.perf_counter() - start
+    app.logger.info('Loaded %d movies from %s in %.3fs', repo.repo_instance.count_movies(), source,
+                    app.config['CATALOGUE_LOAD_SECONDS'])
+
+    if app.config['METRICS_ENABLED']:
+        # Instrument the repository before anything keeps a reference to it.
+        metrics = app.extensions['metrics'] = Metrics()
+        repo.repo_instance = InstrumentedRepository(repo.repo_instance, metrics)
+
+    # Answer colleague checks on actors from the repository's collaboration graph.
+    Actor.colleague_check = repo.repo_instance.actors_worked_together
+
+    if app.config['SIMILAR_MOVIES_AT_STARTUP']:
+        # Start building the similar movies table in the background; pages list none until it is ready.
+        repo.repo_instance.similar_movies_ready()
+
+    # Create the search result cache, sized from configuration.
+    movie_services.search_cache = LRUCache(app.config['SEARCH_CACHE_SIZE'], app.config['SEARCH_CACHE_TTL'])
+    # Create the serialised movie cache; its entries are only valid for this app's repository.
+    movie_services.movie_dict_cache = LRUCache(movie_services.MOVIE_DICT_CACHE_SIZE)
+    # Create the rendered movie fragment cache.
+    movie_services.fragment_cache = LRUCache(app.config['FRAGMENT_CACHE_SIZE'], app.config['FRAGMENT_CACHE_TTL'])
+    if movie_services.review_queue is not None:
+        # Stop the queue of an app created earlier in this process, and drop its exit handler.
+        atexit.unregister(movie_services.review_queue.close)
+        movie_services.review_queue.close()
+    # Create the review screening queue; its workers start with the first submission in each process.
+    movie_services.review_queue = ReviewQueue(repo.repo_instance, movie_services.add_review_to_movie,
+                                              workers=app.config['REVIEW_WORKERS'],
+                                              batch_size=app.config['REVIEW_BATCH_SIZE'],
+                                              batch_wait=app.config['REVIEW_BATCH_WAIT'])
+    atexit.register(movie_services.review_queue.close)
+
+    @app.cli.command('build-snapshot')
+    def build_snapshot_command():
+        """Compile the catalogue CSV into a snapshot that workers load at startup."""
+        click.echo(f'Wrote {build_snapshot(data_path)}')
+
+    @app.cli.command('ingest')
+    @click.argument('sources', nargs=-1, required=True)
+    @click.option('--batch-size', default=5000, show_default=True, help='Movies per transaction.')
+    def ingest_command(sources, batch_size):
+        """Append catalogue CSV files, directories or glob patterns to the database."""
+        if app.config['REPOSITORY'] != 'database':
+            raise click.UsageError("ingest loads the 'database' repository; set REPOSITORY=database")
+        try:
+            source = database_repository.populate(data_path, repo.repo_instance, batch_size, sources)
+        except (repo.RepositoryException, OSError, ValueError) as error:
+            # A missing file or column stops the load; the movies of earlier chunks stay.
+            raise click.ClickException(str(error))
+        click.echo(f'Loaded {source}')
 
     # Build the application - these steps require an application context.
     with app.app_context():
@@ -39,7 +117,36 @@ def create_app(test_config=None):
         from .authentication import authentication
         app.register_blueprint(authentication.authentication_blueprint)
 
+        from .api import api
+        app.register_blueprint(api.api_blueprint)
+
         # from .utilities import utilities
         # app.register_blueprint(utilities.utilities_blueprint)
 
+    # Undo the instrumentation of an app created earlier in this process, then apply this app's.
+    restore_functions()
+    if app.config['METRICS_ENABLED']:
+        # The hot paths inside the handlers: serialising movies, rendering templates and password hashing.
+        from .authentication import services as authentication_services
+        hot_paths = [(movie_services, 'movie_to_dict'),
+                     (authentication_services, 'generate_password_hash'),
+                     (authentication_services, 'check_password_hash')]
+        hot_paths += [(blueprint, 'render_template') for blueprint in (home, movies, authentication)]
+        for module, name in hot_paths:
+            instrument_function(module, name, metrics)
+        enable_metrics(app, metrics)
+    if app.config['PROFILE_HEADER']:
+        enable_profiling(app, app.config['PROFILE_HEADER'])
+
+    if app.config['TEMPLATE_CACHE_DIR']:
+        use_bytecode_cache(app, app.config['TEMPLATE_CACHE_DIR'])
+
+    # Compile the templates and exercise the hot routes before the worker takes traffic.
+    if app.config['WARM_UP']:
+        urls = list(app.config['WARM_UP_URLS'])
+        first_movies = repo.repo_instance.get_movies_page(0, 1)
+        if first_movies:
+            urls.append(f'/movie/{first_movies[0].id}')
+        app.config['WARM_UP_SECONDS'] = warm_up(app, urls)
+
     return app
@@ -0,0 +1,144 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from movie.adapters.facets import bitmap_count, bitmap_of, bitmap_positions
+from movie.domain.model import Movie
+from movie.utilities.cache import LRUCache
+
+# Sortable and filterable fields, mapped to the Movie attribute that feeds each column.
+NUMERIC_FIELDS = {
+    'year': 'year',
+    'runtime': 'runtime_minutes',
+    'rating': 'rating',
+    'votes': 'votes',
+    'revenue': 'revenue_millions',
+    'metascore': 'metascore',
+}
+SORT_FIELDS = ('title',) + tuple(NUMERIC_FIELDS)
+
+MISSING = math.nan
+
+
+class MovieColumns:
+    # Numeric movie fields stored column-wise in typed arrays indexed by catalogue position, with a
+    # pre-sorted position array per field. Orderings read the pre-sorted positions and range filters
+    # bisect the sorted values, so no request sorts the catalogue. Filtered queries are answered with
+    # bitmaps over the requested ordering (catalogue positions when unsorted): a range on the sort field
+    # is a run of consecutive bits, a range on another field is built once from its slice of that
+    # field's order and cached, and the page is read from the combined bitmap in order. Unknown values
+    # are stored as NaN; they never match a range and sort last in either direction.
+
+    def __init__(self, cache_size: int = 64):
+        self._columns = {field: array('d') for field in NUMERIC_FIELDS}
+        self._titles = []
+        self._orders = dict()
+        self._ranks = dict()
+        self._sorted_values = dict()
+        self._range_bitmaps = LRUCache(cache_size)
+
+    def __len__(self):
+        return len(self._titles)
+
+    def append(self, movie: Movie):
+        for field, attribute in NUMERIC_FIELDS.items():
+            value = getattr(movie, attribute)
+            self._columns[field].append(MISSING if value is None else value)
+        self._titles.append(movie.title.lower())
+        # Orders are rebuilt on the next query; loading appends in bulk, so this happens once.
+        self._orders.clear()
+        self._ranks.clear()
+        self._sorted_values.clear()
+        self._range_bitmaps.clear()
+
+    def query(self, offset: int, limit: int, sort: str = None, descending: bool = False,
+              ranges: Dict[str, Tuple[Optional[float], Optional[float]]] = None) -> Tuple[int, List[int]]:
+        """
+        Returns how many movies have fields within every (low, high) range, either bound being optional,
+        and the positions of limit of them from offset, ordered by the sort field or by position when
+        sort is None.
+        """
+        size = len(self._titles)
+        offset = max(offset, 0)
+        limit = max(limit, 0)
+        order = None if sort is None else self._order(sort, descending)[0]
+        if not ranges:
+            end = min(offset + limit, size)
+            if end <= offset:
+                return size, []
+            return size, list(range(offset, end)) if order is None else list(order[offset:end])
+
+        space = None if sort is None else (sort, descending)
+        selection = None
+        for field, (low, high) in ranges.items():
+            start, end = self._range(field, low, high)
+            if start >= end:
+                return 0, []
+            if field == sort:
+                if descending:
+                    # The known values appear in reverse, so the run is mirrored within them.
+                    known = self._order(field)[1]
+                    start, end = known - end, known - start
+                bitmap = (1 << end) - (1 << start)
+            else:
+                bitmap = self._range_bitmap(field, start, end, space)
+            selection = bitmap if selection is None else selection & bitmap
+            if not selection:
+                return 0, []
+
+        total = bitmap_count(selection)
+        window = bitmap_positions(selection, offset, limit)
+        if order is not None:
+            window = [order[rank] for rank in window]
+        return total, window
+
+    def _range(self, field: str, low, high) -> Tuple[int, int]:
+        # Returns the slice of the field's ascending order whose values are within low and high.
+        _, known = self._order(field)
+        values = self._sorted_values[field]
+        start = 0 if low is None else bisect_left(values, low)
+        end = known if high is None else bisect_right(values, high)
+        return start, end
+
+    def _range_bitmap(self, field: str, start: int, end: int, space) -> int:
+        # Returns the bitmap of the movies in the slice of the field's ascending order, with bits set
+        # at their positions, or at their ranks in the sort order space.
+        key = (field, start, end, space)
+        bitmap = self._range_bitmaps.get(key)
+        if bitmap is None:
+            positions = self._order(field)[0][start:end]
+            if space is not None:
+                positions = map(self._rank(*space).__getitem__, positions)
+            bitmap = bitmap_of(positions)
+            self._range_bitmaps.put(key, bitmap)
+        return bitmap
+
+    def _rank(self, field: str, descending: bool) -> array:
+        # Returns each position's index in the order of field.
+        if (field, descending) not in self._ranks:
+            order, _ = self._order(field, descending)
+            ranks = array('l', bytes(order.itemsize * len(order)))
+            for rank, position in enumerate(order):
+                ranks[position] = rank
+            self._ranks[field, descending] = ranks
+        return self._ranks[field, descending]
+
+    def _order(self, field: str, descending: bool = False):
+        # Returns the positions sorted by field, ties in catalogue order and unknown values last,
+        # and how many of them have a known value.
+        if (field, descending) not in self._orders:
+            if field == 'title':
+                keys = self._titles
+                order = sorted(range(len(keys)), key=keys.__getitem__, reverse=descending)
+                known = len(order)
+            else:
+                column = self._columns[field]
+                order = sorted((i for i in range(len(column)) if column[i] == column[i]),
+                               key=column.__getitem__, reverse=descending)
+                known = len(order)
+                order += [i for i in range(len(column)) if column[i] != column[i]]
+                if not descending:
+                    self._sorted_values[field] = array('d', (column[i] for i in order[:known]))
+            self._orders[field, descending] = (array('l', order), known)
+        return self._orders[field, descending]
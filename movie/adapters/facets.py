@@ -0,0 +1,113 @@
+from typing import Dict, Hashable, Iterable, List
+
+# The positions of the set bits of every byte value, for walking a bitmap a byte at a time.
+_BYTE_POSITIONS = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
+# Bytes counted at a time when skipping to an offset.
+_SKIP_BLOCK = 512
+
+
+def bitmap_of(positions: Iterable[int]) -> int:
+    """ Returns the bitmap, a Python int, with the bit of every position set. """
+    positions = list(positions)
+    if not positions:
+        return 0
+    bits = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+if hasattr(int, 'bit_count'):
+    bitmap_count = int.bit_count
+else:
+    # Before Python 3.10.
+    def bitmap_count(bitmap: int) -> int:
+        return bin(bitmap).count('1')
+
+
+def bitmap_positions(bitmap: int, offset: int = 0, limit: int = None) -> List[int]:
+    """ Returns the ascending positions of the set bits of bitmap, limit of them from offset. """
+    positions = []
+    if bitmap <= 0 or (limit is not None and limit <= 0):
+        return positions
+    skip = max(offset, 0)
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    start = 0
+    # Whole blocks before offset are skipped by counting their bits, so a late page doesn't walk every byte.
+    while skip:
+        block = data[start:start + _SKIP_BLOCK]
+        if not block:
+            return positions
+        count = bitmap_count(int.from_bytes(block, 'little'))
+        if count > skip:
+            break
+        skip -= count
+        start += _SKIP_BLOCK
+    for index in range(start, len(data)):
+        byte = data[index]
+        if not byte:
+            continue
+        bits = _BYTE_POSITIONS[byte]
+        if skip >= len(bits):
+            skip -= len(bits)
+            continue
+        base = index << 3
+        for bit in bits[skip:]:
+            positions.append(base + bit)
+            if limit is not None and len(positions) == limit:
+                return positions
+        skip = 0
+    return positions
+
+
+def facet_order(counts: Dict[Hashable, int]) -> Dict[Hashable, int]:
+    """ Returns counts ordered from the most common value down, ties by value. """
+    return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+
+class FacetIndex:
+    # One bitmap per facet value (a genre, a year, ...) with a bit set for every movie position
+    # that has it, so combined filters are a few integer ANDs. Positions are collected as lists
+    # while the catalogue loads and turned into bitmaps on first use; adding a movie drops them.
+
+    def __init__(self):
+        self._postings = dict()
+        self._labels = dict()
+        self._bitmaps = dict()
+
+    def __len__(self):
+        return len(self._postings)
+
+    def add(self, value: Hashable, position: int, label=None):
+        """ Records that the movie at position has value, shown as label (value by default) in counts. """
+        positions = self._postings.get(value)
+        if positions is None:
+            positions = self._postings[value] = []
+            self._labels[value] = value if label is None else label
+        if not positions or positions[-1] != position:
+            positions.append(position)
+        self._bitmaps.clear()
+
+    def values(self) -> List[Hashable]:
+        return list(self._postings)
+
+    def bitmap(self, value: Hashable) -> int:
+        bitmap = self._bitmaps.get(value)
+        if bitmap is None:
+            bitmap = self._bitmaps[value] = bitmap_of(self._postings.get(value, ()))
+        return bitmap
+
+    def union(self, values: Iterable[Hashable]) -> int:
+        bitmap = 0
+        for value in values:
+            bitmap |= self.bitmap(value)
+        return bitmap
+
+    def counts(self, selection: int) -> Dict[Hashable, int]:
+        """ Returns how many of the selected movies have each value, by label, leaving out values none have. """
+        counts = dict()
+        for value in self._postings:
+            count = bitmap_count(selection & self.bitmap(value))
+            if count:
+                counts[self._labels[value]] = count
+        return counts
@@ -0,0 +1,117 @@
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+from typing import List
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# Words too common to tell movies apart; skipping them keeps the largest postings out of every query.
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has he her his in into is it its of on or she that the their
+them they this to was were when who with
+""".split())
+
+# A title word counts as this many description words.
+TITLE_WEIGHT = 3
+
+
+def tokenize(text: str) -> List[str]:
+    if not text:
+        return []
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class FullTextIndex:
+    # An inverted index over movie titles and descriptions, ranked with BM25. The last word of a
+    # query, and any word ending in '*', also matches the indexed words it is a prefix of, so
+    # results appear while the user is still typing.
+
+    K1 = 1.2
+    B = 0.75
+    MAX_PREFIX_EXPANSIONS = 50
+    # Ranking further than this is wasted work for a search page; lower-scoring matches are dropped.
+    MAX_RESULTS = 1000
+
+    def __init__(self):
+        self._postings = dict()
+        self._lengths = dict()
+        self._total_length = 0
+        # The indexed words, sorted on the first prefix query; after that, new words are inserted in place.
+        self._terms = []
+        self._terms_dirty = True
+        # term -> (position -> BM25 weight, positions by descending weight); cleared when a movie is added.
+        self._impacts = dict()
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, position: int, title: str, description: str):
+        frequencies = dict()
+        for token in tokenize(title):
+            frequencies[token] = frequencies.get(token, 0) + TITLE_WEIGHT
+        for token in tokenize(description):
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for token, frequency in frequencies.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = dict()
+                if not self._terms_dirty:
+                    insort(self._terms, token)
+            postings[position] = frequency
+        length = sum(frequencies.values())
+        self._lengths[position] = length
+        self._total_length += length
+        self._impacts.clear()
+
+    def search(self, query: str, limit: int = MAX_RESULTS) -> List[int]:
+        """ Returns the positions of the best limit matching movies, best match first. """
+        words = query.lower().split()
+        if not words or not self._lengths:
+            return []
+        terms = []
+        for index, word in enumerate(words):
+            prefix = word.endswith('*') or index == len(words) - 1
+            for token in tokenize(word):
+                terms.extend(self._expand(token) if prefix else [token])
+        weights = [self._impact(term) for term in dict.fromkeys(terms)]
+        weights = [weight for weight in weights if weight is not None]
+        if not weights:
+            return []
+        if len(weights) == 1:
+            return list(weights[0][1][:limit])
+        scores = dict(weights[0][0])
+        for impacts, _ in weights[1:]:
+            for position, impact in impacts.items():
+                scores[position] = scores.get(position, 0.0) + impact
+        return heapq.nsmallest(limit, scores, key=lambda position: (-scores[position], position))
+
+    def _impact(self, term: str):
+        # A term's BM25 contribution to each movie only changes when the index does, so it is computed once.
+        cached = self._impacts.get(term)
+        if cached is not None:
+            return cached
+        postings = self._postings.get(term)
+        if not postings:
+            return None
+        count = len(self._lengths)
+        average_length = self._total_length / count
+        idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+        k1, b, lengths = self.K1, self.B, self._lengths
+        impacts = {position: idf * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * lengths[position] / average_length))
+                   for position, frequency in postings.items()}
+        ranked = tuple(sorted(impacts, key=lambda position: (-impacts[position], position)))
+        cached = self._impacts[term] = (impacts, ranked)
+        return cached
+
+    def _expand(self, prefix: str) -> List[str]:
+        if self._terms_dirty:
+            self._terms = sorted(self._postings)
+            self._terms_dirty = False
+        start = bisect_left(self._terms, prefix)
+        terms = []
+        for term in self._terms[start:start + self.MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
@@ -0,0 +1,305 @@
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Casts added since the last merge are merged into the rows once they hold this many edges, or as
+# many as the rows already do if that is more, so merges get rarer as the graph grows.
+MERGE_MIN_EDGES = 50000
+
+
+class CollaborationGraph:
+    # Actors who appeared in the same movie, in compressed sparse row form: the colleagues of the
+    # actor numbered i are targets[offsets[i]:offsets[i + 1]], sorted, and via holds the first
+    # movie each pair shared. Three flat arrays take a few bytes per edge where sets of Actor
+    # objects take around a hundred, so casts with millions of edges stay in memory. Checking two
+    # actors is a bisection of one row; the shortest path between two searches from both ends.
+    #
+    # Casts added after the graph is built go into a side buffer, a flat array of (colleague, movie id)
+    # pairs per actor, read alongside the rows. Once the buffer has grown it is merged into new
+    # rows on a background thread, which swaps them in with a fresh buffer in one assignment:
+    # queries never wait for a merge, and additions only wait for the swap.
+
+    def __init__(self):
+        self._ids = dict()
+        self._names = []
+        # The offsets, targets and via arrays of the rows, and the buffer, replaced together.
+        self._state = (array('q', [0]), array('l'), array('q'), dict())
+        # The casts in the buffer as (movie id, actor numbers), in the order they were added.
+        self._pending = []
+        self._pending_edges = 0
+        self._built = False
+        # The process whose background merge is running, if any.
+        self._merging = None
+        self._merge_thread = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    @property
+    def edge_count(self) -> int:
+        """ Returns the number of colleague pairs merged into the rows. """
+        return len(self._state[1]) // 2
+
+    @property
+    def built(self) -> bool:
+        """ Returns whether the graph has been built, after which casts are added to it one at a time. """
+        return self._built
+
+    @property
+    def pending_count(self) -> int:
+        """ Returns the number of casts added since the last merge. """
+        return len(self._pending)
+
+    def build(self, casts: Iterable[Tuple[int, Sequence[str]]]):
+        """ Replaces the graph with one built from (movie id, actor names) pairs, in catalogue order. """
+        with self._lock:
+            self._ids, self._names = dict(), []
+            numbered = []
+            for movie_id, cast in casts:
+                members = self._number(cast)
+                if len(members) > 1:
+                    numbered.append((movie_id, members))
+            empty = (array('q', [0]), array('l'), array('q'), dict())
+            self._state = self._compact(len(self._names), empty, numbered) + (dict(),)
+            self._pending, self._pending_edges = [], 0
+            self._built = True
+
+    def add(self, movie_id: int, cast: Sequence[str]):
+        """
+        Adds the cast of a movie after those already in the graph. Its colleague pairs are answered
+        at once, from the buffer, and merged into the rows in the background once enough have built up.
+        """
+        with self._lock:
+            self._add_locked(movie_id, cast)
+            start = (self._pending_edges >= max(MERGE_MIN_EDGES, len(self._state[1]))
+                     and self._merging != os.getpid())
+            if start:
+                self._merging = os.getpid()
+                self._merge_thread = threading.Thread(target=self._merge_in_background,
+                                                      name='collaboration-merge', daemon=True)
+        if start:
+            self._merge_thread.start()
+
+    def _add_locked(self, movie_id: int, cast: Sequence[str]):
+        members = self._number(cast)
+        if len(members) > 1:
+            self._buffer(self._state[3], movie_id, members)
+            self._pending.append((movie_id, members))
+            self._pending_edges += len(members) * (len(members) - 1)
+
+    def _number(self, cast: Sequence[str]) -> List[int]:
+        # The numbers of the actors in a cast, each once, numbering those new to the graph.
+        members = []
+        for name in cast:
+            if not name:
+                continue
+            key = name.lower()
+            actor = self._ids.get(key)
+            if actor is None:
+                # Named before it is numbered, so a reader that finds the number finds the name.
+                self._names.append(name)
+                actor = self._ids[key] = len(self._names) - 1
+            if actor not in members:
+                members.append(actor)
+        return members
+
+    @staticmethod
+    def _buffer(buffer: Dict[int, array], movie_id: int, members: List[int]):
+        for actor in members:
+            edges = buffer.get(actor)
+            if edges is None:
+                edges = buffer[actor] = array('q')
+            for colleague in members:
+                if colleague != actor:
+                    edges.append(colleague)
+                    edges.append(movie_id)
+
+    def merge(self):
+        """ Merges the casts added since the last merge into the rows before returning. """
+        thread = self._merge_thread
+        if thread is not None and self._merging == os.getpid() and thread is not threading.current_thread():
+            # Let the background merge finish first rather than repeat its work.
+            thread.join()
+        while not self._merge_once():
+            pass
+
+    def _merge_in_background(self):
+        try:
+            self.merge()
+        finally:
+            self._merging = None
+
+    def _merge_once(self) -> bool:
+        # Returns False if another merge swapped its rows in first, leaving this one stale.
+        with self._lock:
+            state, pending, actors = self._state, list(self._pending), len(self._names)
+        if not pending:
+            return True
+        rows = self._compact(actors, state, pending)
+        with self._lock:
+            if self._state is not state:
+                return False
+            remaining = self._pending[len(pending):]
+            buffer = dict()
+            for movie_id, members in remaining:
+                self._buffer(buffer, movie_id, members)
+            self._pending = remaining
+            self._pending_edges = sum(len(members) * (len(members) - 1) for _, members in remaining)
+            self._state = rows + (buffer,)
+        return True
+
+    @staticmethod
+    def _compact(actors: int, state, casts: List[Tuple[int, List[int]]]):
+        # Builds rows for the actors numbered below actors from the rows of state and the casts after
+        # them. Count every actor's edges, then drop each edge into its row, the old ones first: no
+        # per-actor containers. Rows no cast touches are copied as they were.
+        offsets, targets, via, _ = state
+        rows = len(offsets) - 1
+        touched = bytearray(actors)
+        degrees = array('q', bytes(8 * (actors + 1)))
+        for actor in range(rows):
+            degrees[actor + 1] = offsets[actor + 1] - offsets[actor]
+        for _, members in casts:
+            for actor in members:
+                degrees[actor + 1] += len(members) - 1
+                touched[actor] = 1
+        for actor in range(actors):
+            degrees[actor + 1] += degrees[actor]
+        fill = array('q', degrees)
+        scratch_targets = array('l', bytes(array('l').itemsize * degrees[-1]))
+        scratch_via = array('q', bytes(8 * degrees[-1]))
+        for actor in range(rows):
+            start, end = offsets[actor], offsets[actor + 1]
+            if touched[actor] and end > start:
+                position = fill[actor]
+                scratch_targets[position:position + end - start] = targets[start:end]
+                scratch_via[position:position + end - start] = via[start:end]
+                fill[actor] = position + end - start
+        for movie_id, members in casts:
+            for actor in members:
+                position = fill[actor]
+                for colleague in members:
+                    if colleague != actor:
+                        scratch_targets[position] = colleague
+                        scratch_via[position] = movie_id
+                        position += 1
+                fill[actor] = position
+
+        # Sort each touched row and keep one edge per colleague. The sort is stable and the edges
+        # were added in catalogue order, so the movie kept is the first the two actors shared.
+        merged_offsets = array('q', [0])
+        merged_targets, merged_via = array('l'), array('q')
+        for actor in range(actors):
+            if not touched[actor]:
+                if actor < rows:
+                    merged_targets.extend(targets[offsets[actor]:offsets[actor + 1]])
+                    merged_via.extend(via[offsets[actor]:offsets[actor + 1]])
+            else:
+                previous = -1
+                for position in sorted(range(degrees[actor], degrees[actor + 1]), key=scratch_targets.__getitem__):
+                    colleague = scratch_targets[position]
+                    if colleague != previous:
+                        merged_targets.append(colleague)
+                        merged_via.append(scratch_via[position])
+                        previous = colleague
+            merged_offsets.append(len(merged_targets))
+        return merged_offsets, merged_targets, merged_via
+
+    def actor_name(self, name: str) -> Optional[str]:
+        """ Returns the name as first loaded of the actor called name, ignoring case, or None if there is none. """
+        actor = self._ids.get(name.strip().lower()) if name else None
+        return None if actor is None else self._names[actor]
+
+    def colleagues(self, name: str) -> List[str]:
+        """ Returns the names of everyone who appeared in a movie with the actor called name. """
+        actor = self._ids.get(name.strip().lower()) if name else None
+        if actor is None:
+            return []
+        return [self._names[colleague] for colleague in self._neighbours(self._state, actor)]
+
+    def worked_together(self, name: str, other: str) -> bool:
+        """ Returns whether the actors called name and other appeared in a movie together. """
+        return self._shared_movie(name, other) is not None
+
+    def shortest_path(self, name: str, other: str) -> Optional[Tuple[List[str], List[int]]]:
+        """
+        Returns the actors on a shortest chain of colleagues from name to other, both included, and
+        the ids of the movies linking each actor to the next; None if either is unknown or no chain exists.
+        """
+        source = self._ids.get(name.strip().lower()) if name else None
+        target = self._ids.get(other.strip().lower()) if other else None
+        if source is None or target is None:
+            return None
+        if source == target:
+            return [self._names[source]], []
+        # One search sees one set of rows and buffer, whatever a merge swaps in meanwhile.
+        state = self._state
+        # Search a level at a time from whichever end has the smaller frontier. Once the two meet,
+        # every meeting point of that level gives a chain of the same, shortest, length.
+        forward, backward = {source: -1}, {target: -1}
+        forward_frontier, backward_frontier = [source], [target]
+        meeting = None
+        while forward_frontier and backward_frontier and meeting is None:
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier, meeting = self._expand(state, forward_frontier, forward, backward)
+            else:
+                backward_frontier, meeting = self._expand(state, backward_frontier, backward, forward)
+        if meeting is None:
+            return None
+        chain = self._chain(meeting, forward)[::-1] + self._chain(backward[meeting], backward)
+        movies = [self._edge(state, actor, colleague) for actor, colleague in zip(chain, chain[1:])]
+        return [self._names[actor] for actor in chain], movies
+
+    def _shared_movie(self, name: str, other: str) -> Optional[int]:
+        actor = self._ids.get(name.strip().lower()) if name else None
+        colleague = self._ids.get(other.strip().lower()) if other else None
+        if actor is None or colleague is None:
+            return None
+        return self._edge(self._state, actor, colleague)
+
+    @staticmethod
+    def _edge(state, actor: int, colleague: int) -> Optional[int]:
+        # The first movie the two shared: the rows hold earlier movies than the buffer.
+        offsets, targets, via, buffer = state
+        if actor < len(offsets) - 1:
+            start, end = offsets[actor], offsets[actor + 1]
+            position = bisect_left(targets, colleague, start, end)
+            if position < end and targets[position] == colleague:
+                return via[position]
+        edges = buffer.get(actor)
+        if edges is not None:
+            for position in range(0, len(edges), 2):
+                if edges[position] == colleague:
+                    return edges[position + 1]
+        return None
+
+    @staticmethod
+    def _neighbours(state, actor: int) -> Sequence[int]:
+        # In order, as the row would be after a merge, so that searches tie-break the same either way.
+        offsets, targets, _, buffer = state
+        row = targets[offsets[actor]:offsets[actor + 1]] if actor < len(offsets) - 1 else ()
+        edges = buffer.get(actor)
+        return row if edges is None else sorted(set(row).union(edges[::2]))
+
+    def _expand(self, state, frontier: List[int], parents: Dict[int, int], others: Dict[int, int]):
+        following = []
+        for actor in frontier:
+            for colleague in self._neighbours(state, actor):
+                if colleague in parents:
+                    continue
+                parents[colleague] = actor
+                if colleague in others:
+                    return following, colleague
+                following.append(colleague)
+        return following, None
+
+    @staticmethod
+    def _chain(actor: int, parents: Dict[int, int]) -> List[int]:
+        chain = []
+        while actor != -1:
+            chain.append(actor)
+            actor = parents[actor]
+        return chain
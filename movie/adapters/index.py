@@ -0,0 +1,59 @@
+from typing import Iterable, List, Set
+
+
+class SubstringIndex:
+    # Maps each lowercase name to the positions of the movies that reference it, plus an
+    # n-gram index over the names so that substring queries never have to walk the movies.
+
+    def __init__(self, gram_size: int = 3):
+        self._gram_size = gram_size
+        self._postings = dict()
+        self._grams = dict()
+
+    def __len__(self):
+        return len(self._postings)
+
+    def add(self, name: str, position: int):
+        """ Records that the movie at position references name. Positions must be added in ascending order. """
+        if name is None:
+            return
+        key = name.lower()
+        positions = self._postings.get(key)
+        if positions is None:
+            positions = self._postings[key] = []
+            for gram in self._grams_of(key):
+                self._grams.setdefault(gram, set()).add(key)
+        if not positions or positions[-1] != position:
+            positions.append(position)
+
+    def matching_names(self, query: str) -> Set[str]:
+        """ Returns the lowercase names that contain query as a substring. """
+        query = query.lower()
+        if query == "":
+            return set(self._postings)
+        if len(query) < self._gram_size:
+            # Too short to have a gram; the distinct names are still far fewer than the movies.
+            return {name for name in self._postings if query in name}
+        if len(query) == self._gram_size:
+            return self._grams.get(query, set())
+        grams = sorted((self._grams.get(query[i:i + self._gram_size], set())
+                        for i in range(len(query) - self._gram_size + 1)), key=len)
+        candidates = set(grams[0])
+        for names in grams[1:]:
+            if not candidates:
+                break
+            candidates &= names
+        return {name for name in candidates if query in name}
+
+    def search(self, query: str) -> List[int]:
+        """ Returns the ascending movie positions of every name containing query. """
+        names = self.matching_names(query)
+        if len(names) == 1:
+            return list(self._postings[next(iter(names))])
+        positions = set()
+        for name in names:
+            positions.update(self._postings[name])
+        return sorted(positions)
+
+    def _grams_of(self, key: str) -> Iterable[str]:
+        return {key[i:i + self._gram_size] for i in range(len(key) - self._gram_size + 1)}
@@ -0,0 +1,208 @@
+import csv
+import glob
+import logging
+import os
+import time
+from typing import Iterator, List, Optional, Sequence, Union
+
+from movie.adapters.repository import RepositoryException
+from movie.domain.model import Movie, EntityRegistry, optional_number
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_FILENAME = 'Data1000Movies.csv'
+
+# Movies parsed and handed to the repository at a time. Only one chunk is held by the pipeline, so
+# memory stays bounded however many rows the files have.
+CHUNK_SIZE = 5000
+
+REQUIRED_COLUMNS = ('Title', 'Genre', 'Description', 'Director', 'Actors', 'Year', 'Runtime (Minutes)')
+OPTIONAL_COLUMNS = ('Rank', 'Rating', 'Votes', 'Revenue (Millions)', 'Metascore')
+
+# Malformed rows logged individually per ingest; the rest are only counted.
+LOGGED_MALFORMED = 10
+
+# Ranks up to this are remembered in a bitmap, an eighth of a byte each; larger ones, rare in a
+# catalogue ranking its rows, in a set.
+MAX_BITMAP_RANK = 1 << 27
+
+
+class _SeenRanks:
+    # The ranks read so far, to catch repeats without a set entry per row.
+
+    def __init__(self):
+        self._bitmap = bytearray()
+        self._large = set()
+
+    def add(self, rank: int) -> bool:
+        """ Records rank and returns whether it had been recorded before. """
+        if not 0 <= rank < MAX_BITMAP_RANK:
+            seen = rank in self._large
+            self._large.add(rank)
+            return seen
+        byte, bit = rank >> 3, 1 << (rank & 7)
+        if byte >= len(self._bitmap):
+            self._bitmap.extend(bytes(max(byte + 1 - len(self._bitmap), len(self._bitmap))))
+        seen = bool(self._bitmap[byte] & bit)
+        self._bitmap[byte] |= bit
+        return seen
+
+
+class IngestReport:
+    # What an ingest read: files, rows, the movies loaded and the rows skipped as malformed.
+
+    def __init__(self):
+        self.files = 0
+        self.rows = 0
+        self.loaded = 0
+        self.malformed = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"{self.files} CSV file{'' if self.files == 1 else 's'} ({self.rows} rows, {self.malformed} malformed, "
+                f"{self.rows_per_second:.0f} rows/s)")
+
+
+def catalogue_files(sources: Union[str, Sequence[str]]) -> List[str]:
+    """
+    Expands sources, each a CSV file, a directory (meaning every .csv file in it) or a glob pattern,
+    into the CSV files they name, in order and without repeats. A string may hold several sources
+    separated by os.pathsep.
+    """
+    if isinstance(sources, str):
+        sources = [source for source in sources.split(os.pathsep) if source]
+    filenames = []
+    for source in sources:
+        if os.path.isdir(source):
+            matches = sorted(glob.glob(os.path.join(glob.escape(source), '*.csv')))
+        elif glob.has_magic(source):
+            matches = sorted(glob.glob(source))
+        else:
+            matches = [source]
+        if not matches:
+            raise FileNotFoundError(f"No catalogue CSV files match {source}")
+        for filename in matches:
+            if filename not in filenames:
+                filenames.append(filename)
+    return filenames
+
+
+def read_chunks(filename: str, report: IngestReport, chunk_size: int = CHUNK_SIZE, registry: EntityRegistry = None,
+                use_ranks: bool = True) -> Iterator[List[Movie]]:
+    """
+    Yields the movies of a catalogue CSV file as it reads it, chunk_size at a time, counting its rows
+    and skipping, as malformed, those with the wrong number of fields or a missing or invalid value.
+    Columns are found by name in the header, so they may come in any order. Directors, actors and
+    genres are interned through registry when one is given, and otherwise per chunk, so that nothing
+    outlives its chunk. The Rank column becomes the movie id when use_ranks is set, and a rank
+    repeated in the file makes its row malformed; otherwise the repository numbers the movies.
+    """
+    # The C reader's rows are plain lists: fields are picked out by position, with no dict per row.
+    with open(filename, encoding='utf-8-sig', newline='') as infile:
+        rows = csv.reader(infile)
+        header = next(rows, None)
+        report.files += 1
+        if header is None:
+            return
+        columns = {name.strip(): position for position, name in enumerate(header)}
+        missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+        if missing:
+            raise ValueError(f"{filename} has no {', '.join(missing)} column")
+        title, genre, description, director, actors, year, runtime = (columns[name] for name in REQUIRED_COLUMNS)
+        rank, rating, votes, revenue, metascore = (columns.get(name) for name in OPTIONAL_COLUMNS)
+        if not use_ranks:
+            rank = None
+        width = len(header)
+        ranks = _SeenRanks()
+
+        chunk, entities = [], registry if registry is not None else EntityRegistry()
+        for row in rows:
+            report.rows += 1
+            if len(row) != width:
+                _malformed(report, f"{filename}:{rows.line_num}", f"{len(row)} fields, expected {width}")
+                continue
+            try:
+                movie_title = row[title].strip()
+                if not movie_title:
+                    raise ValueError("no title")
+                movie_year = int(row[year])
+                if movie_year < 1900:
+                    raise ValueError(f"year {movie_year} is before 1900")
+                movie = Movie(movie_title, movie_year)
+                movie.runtime_minutes = int(row[runtime])
+                movie.rating = _optional(row, rating, float)
+                movie.votes = _optional(row, votes, int)
+                movie.revenue_millions = _optional(row, revenue, float)
+                movie.metascore = _optional(row, metascore, int)
+                if rank is not None and row[rank].strip():
+                    movie.id = int(row[rank])
+                    if ranks.add(movie.id):
+                        raise ValueError(f"rank {movie.id} repeated")
+            except ValueError as error:
+                _malformed(report, f"{filename}:{rows.line_num}", str(error))
+                continue
+            movie.description = row[description]
+            movie.director = entities.director(row[director].strip())
+            for name in row[genre].split(','):
+                movie.genres.append(entities.genre(name.strip()))
+            for name in row[actors].split(','):
+                movie.actors.append(entities.actor(name.strip()))
+            chunk.append(movie)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk, entities = [], registry if registry is not None else EntityRegistry()
+        if chunk:
+            yield chunk
+
+
+def ingest(sources: Union[str, Sequence[str]], repo, chunk_size: int = CHUNK_SIZE,
+           registry: EntityRegistry = None) -> IngestReport:
+    """
+    Streams the catalogue CSV files named by sources (see catalogue_files) into repo, a chunk of
+    movies per repo.add_movies call, and returns what was read. Ranks are only used as ids when there
+    is a single file, since every file numbers its rows from 1. A movie whose rank is already the id
+    of a stored movie is skipped as malformed, and the rest of its chunk is still added.
+    """
+    filenames = catalogue_files(sources)
+    report = IngestReport()
+    start = time.perf_counter()
+    for filename in filenames:
+        for chunk in read_chunks(filename, report, chunk_size, registry, use_ranks=len(filenames) == 1):
+            _add_chunk(repo, chunk, report, filename)
+    report.seconds = time.perf_counter() - start
+    if report.malformed:
+        logger.warning('Skipped %d malformed rows of %d', report.malformed, report.rows)
+    return report
+
+
+def _add_chunk(repo, chunk: List[Movie], report: IngestReport, filename: str):
+    unnumbered = [movie for movie in chunk if movie.id is None]
+    try:
+        repo.add_movies(chunk)
+        report.loaded += len(chunk)
+        return
+    except RepositoryException:
+        # An id is taken, and nothing of the chunk was added. Add the movies one at a time instead,
+        # numbering afresh those the repository numbered for the failed attempt.
+        for movie in unnumbered:
+            movie.id = None
+    for movie in chunk:
+        try:
+            repo.add_movies([movie])
+            report.loaded += 1
+        except RepositoryException:
+            _malformed(report, filename, f"movie id {movie.id} is already stored")
+
+
+def _optional(row: List[str], position: Optional[int], kind):
+    return None if position is None else optional_number(row[position], kind)
+
+
+def _malformed(report: IngestReport, where: str, reason: str):
+    report.malformed += 1
+    if report.malformed <= LOGGED_MALFORMED:
+        logger.warning('Skipping malformed row at %s: %s', where, reason)
@@ -0,0 +1,134 @@
+import json
+import marshal
+import os
+import threading
+from typing import Iterable, Iterator
+
+# The journal is a file of JSON lines, one per user or review, appended as they are added. Appends
+# are fsynced in groups: whoever syncs covers every line written before it, so concurrent writers
+# share one fsync. Compaction writes all current records into a marshal snapshot beside the journal
+# and starts a new, empty journal. Both carry a generation number; a journal older than the
+# snapshot was already folded into it, which covers a crash between the two steps.
+JOURNAL_SNAPSHOT_MAGIC = b'FLMJRNL\n'
+JOURNAL_FORMAT = 1
+
+
+class Journal:
+
+    def __init__(self, filename: str):
+        self._filename = filename
+        self._snapshot_filename = filename + '.snapshot'
+        self._generation = 0
+        self._file = None
+        # Lines written, and lines known to be on disk.
+        self._written = 0
+        self._synced = 0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.records_since_compaction = 0
+
+    def replay(self) -> Iterator[dict]:
+        """ Yields the records of the snapshot, then those of the journal, then opens the journal for appending. """
+        snapshot_generation = 0
+        if os.path.exists(self._snapshot_filename):
+            with open(self._snapshot_filename, 'rb') as infile:
+                if infile.read(len(JOURNAL_SNAPSHOT_MAGIC)) == JOURNAL_SNAPSHOT_MAGIC:
+                    header = marshal.load(infile)
+                    if header['format'] == JOURNAL_FORMAT:
+                        snapshot_generation = header['generation']
+                        yield from marshal.load(infile)
+        self._generation = snapshot_generation
+
+        valid_length = 0
+        if os.path.exists(self._filename):
+            with open(self._filename, 'rb') as infile:
+                header = self._read_record(infile.readline())
+                if header is not None and header.get('generation', -1) >= snapshot_generation:
+                    self._generation = header['generation']
+                    valid_length = infile.tell()
+                    for line in infile:
+                        record = self._read_record(line)
+                        if record is None:
+                            # A write torn by a crash; nothing after it was acknowledged.
+                            break
+                        self.records_since_compaction += 1
+                        valid_length += len(line)
+                        yield record
+        if valid_length == 0:
+            self._start_journal(self._generation)
+        else:
+            self._file = open(self._filename, 'r+b')
+            self._file.truncate(valid_length)
+            self._file.seek(valid_length)
+
+    def append(self, record: dict) -> int:
+        """ Writes record without waiting for the disk and returns its sequence number for sync. """
+        line = json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+        with self._lock:
+            self._file.write(line)
+            self._written += 1
+            self.records_since_compaction += 1
+            return self._written
+
+    def sync(self, sequence: int):
+        """ Returns once the record numbered sequence, and every one before it, is on disk. """
+        if self._synced >= sequence:
+            return
+        with self._sync_lock:
+            # Another writer's fsync may have covered this record while we waited.
+            if self._synced >= sequence:
+                return
+            with self._lock:
+                self._file.flush()
+                written = self._written
+                fileno = self._file.fileno()
+            os.fsync(fileno)
+            self._synced = max(self._synced, written)
+
+    def compact(self, records: Iterable[dict]):
+        """
+        Replaces the snapshot with records, which must hold everything appended so far, and empties
+        the journal. Callers must keep other threads from appending until it returns.
+        """
+        with self._sync_lock, self._lock:
+            generation = self._generation + 1
+            partial = self._snapshot_filename + '.partial'
+            with open(partial, 'wb') as outfile:
+                outfile.write(JOURNAL_SNAPSHOT_MAGIC)
+                marshal.dump({'format': JOURNAL_FORMAT, 'generation': generation}, outfile)
+                marshal.dump(list(records), outfile)
+                outfile.flush()
+                os.fsync(outfile.fileno())
+            os.replace(partial, self._snapshot_filename)
+            self._file.close()
+            self._start_journal(generation)
+            # The snapshot holds every record written so far, so those writers need not wait.
+            self._synced = self._written
+            self.records_since_compaction = 0
+
+    def close(self):
+        with self._sync_lock, self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+    def _start_journal(self, generation: int):
+        partial = self._filename + '.partial'
+        with open(partial, 'wb') as outfile:
+            outfile.write(json.dumps({'format': JOURNAL_FORMAT, 'generation': generation}).encode('utf-8') + b'\n')
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        os.replace(partial, self._filename)
+        self._generation = generation
+        self._file = open(self._filename, 'ab')
+
+    @staticmethod
+    def _read_record(line: bytes):
+        if not line.endswith(b'\n'):
+            return None
+        try:
+            return json.loads(line.decode('utf-8'))
+        except ValueError:
+            return None
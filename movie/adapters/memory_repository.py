@@ -1,121 +1,440 @@
 from abc import ABC
 
-import csv
 import os
+import threading
 from datetime import date, datetime
-from typing import List, Set
+from typing import Dict, List, Optional, Set, Tuple
 
 from bisect import bisect, bisect_left, insort_left
 
 from werkzeug.security import generate_password_hash
+from movie.adapters.columns import MovieColumns
+from movie.adapters.facets import FacetIndex, bitmap_count, bitmap_of, bitmap_positions, facet_order
+from movie.adapters.fulltext import FullTextIndex
+from movie.adapters.graph import CollaborationGraph
+from movie.adapters.index import SubstringIndex
+from movie.adapters.ingest import CATALOGUE_FILENAME, IngestReport, ingest
+from movie.adapters.journal import Journal
 from movie.adapters.repository import AbstractRepository, RepositoryException
-from movie.domain.model import Movie, Director, Actor, Genre, Review, User
+from movie.adapters.similar import SimilarityIndex
+from movie.adapters.snapshot import load_snapshot, write_snapshot
+from movie.adapters.suggest import SUGGESTION_FIELDS, SuggestionIndex
+from movie.utilities.background import BackgroundTask
+from movie.utilities.locks import ReadWriteLock
+from movie.domain.model import Movie, Director, Actor, Genre, Review, User, EntityRegistry
 
 
 class MemoryRepository(AbstractRepository):
     # Articles ordered by date, not id. id is assumed unique.
 
     def __init__(self):
-        self._users = list()
+        # Users keyed by the normalised user name that User.__init__ computes.
+        self._users = dict()
+        self._users_lock = threading.Lock()
+        # Requests run on several threads. The catalogue (movies and every index over them) and the
+        # reviews each have a reader/writer lock, so searches and page views proceed together and only
+        # wait while a movie or review is being added. Lookups that are a single dict operation need no lock.
+        self._catalogue_lock = ReadWriteLock()
+        self._reviews_lock = ReadWriteLock()
+        # Write-ahead journal of users and reviews, once open_journal has been called.
+        self._journal = None
+        self._compact_every = 0
         self._movies = list()
         self._actors = set()
         self._genres = set()
         self._directors = set()
         self._reviews = list()
-
+        self._movies_by_id = dict()
+        self._movies_by_title = dict()
+        self._next_movie_id = 1
+        # Bumped by every change to the movies or reviews; see get_version. Movies and reviews are
+        # written under different locks, so the version has its own.
+        self._version = 0
+        self._version_lock = threading.Lock()
+        # Reviews bucketed per movie, with running [count, sum] of their ratings.
+        self._reviews_by_movie = dict()
+        self._review_totals = dict()
+        # Lowercase name -> movie position indexes, kept current by add_movie.
+        self._actor_index = SubstringIndex()
+        self._director_index = SubstringIndex()
+        self._genre_index = SubstringIndex()
+        self._text_index = FullTextIndex()
+        # Numeric fields by catalogue position, for sorted and filtered listings.
+        self._columns = MovieColumns()
+        # Genre and year bitmaps by catalogue position, for combined facet queries.
+        self._genre_facets = FacetIndex()
+        self._year_facets = FacetIndex()
+        # Typeahead completions per name set.
+        self._suggestions = {field: SuggestionIndex() for field in SUGGESTION_FIELDS}
+        # Nearest neighbours of every movie, built once in the background and then kept current by add_movie.
+        self._similar = SimilarityIndex()
+        self._similar_build = BackgroundTask('similar-movies-build')
+        # Actors who appeared together, built once the catalogue is loaded and then kept current by add_movie.
+        self._collaborations = CollaborationGraph()
+        self._collaborations_lock = threading.Lock()
+        self._collaborations_build = BackgroundTask('collaboration-graph-build')
 
     def add_user(self, user: User):
-        self._users.append(user)
+        # Check and insert under one lock so concurrent registrations cannot both succeed.
+        with self._users_lock:
+            if user.user_name in self._users:
+                raise RepositoryException(f"User {user.user_name} already exists")
+            self._users[user.user_name] = user
+            sequence = self._journal_append(self._user_record(user))
+        self._journal_commit(sequence)
 
     def get_user(self, username) -> User:
-        return next((user for user in self._users if user.user_name == username), None)
+        if username is None:
+            return None
+        return self._users.get(username.strip().lower())
+
+    def watch_movie(self, username, movie: Movie):
+        user = self.get_user(username)
+        if user is not None:
+            with self._users_lock:
+                user.watch_movie(movie)
+
+    def get_watched_movies(self, username, limit: int) -> List[Movie]:
+        user = self.get_user(username)
+        if user is None:
+            return []
+        with self._users_lock:
+            return user.last_watched_movies(limit)
 
     def add_movie(self, movie: Movie):
+        with self._catalogue_lock.write():
+            self._add_movie(movie)
+            # Bumped last, so a reader that sees the new version also sees the movie in every index.
+            self._bump_version()
+
+    def add_movies(self, movies: List[Movie]):
+        with self._catalogue_lock.write():
+            # Check every id first, so that a duplicate leaves the catalogue as it was.
+            ids = set()
+            for movie in movies:
+                if movie.id is not None and (movie.id in self._movies_by_id or movie.id in ids):
+                    raise RepositoryException(f"Duplicate movie id {movie.id}")
+                ids.add(movie.id)
+            for movie in movies:
+                self._add_movie(movie)
+            if movies:
+                self._bump_version()
+
+    def _add_movie(self, movie: Movie):
         # insort_left(self._movies, movie)
+        if movie.id is None:
+            movie.id = self._next_movie_id
+        elif movie.id in self._movies_by_id:
+            raise RepositoryException(f"Duplicate movie id {movie.id}")
+        self._next_movie_id = max(self._next_movie_id, movie.id + 1)
+        self._movies_by_id[movie.id] = movie
+        # Remakes share a title; the first movie added keeps it, as the old linear scan did.
+        self._movies_by_title.setdefault(movie.title, movie)
+
+        position = len(self._movies)
         self._movies.append(movie)
+        for actor in movie.actors:
+            self._actor_index.add(actor.actor_full_name, position)
+            self._suggestions['actor'].add(actor.actor_full_name)
+        if movie.director is not None:
+            self._director_index.add(movie.director.director_full_name, position)
+            self._suggestions['director'].add(movie.director.director_full_name)
+        for genre in movie.genres:
+            self._genre_index.add(genre.genre_name, position)
+            self._suggestions['genre'].add(genre.genre_name)
+            if genre.genre_name is not None:
+                self._genre_facets.add(genre.genre_name.lower(), position, genre.genre_name)
+        if movie.year is not None:
+            self._year_facets.add(movie.year, position)
+        self._text_index.add(position, movie.title, movie.description)
+        self._suggestions['title'].add(movie.title)
+        self._columns.append(movie)
+        if self._similar.built:
+            self._similar.add(movie)
+        if self._collaborations.built:
+            # Buffered, and merged into the graph's rows in the background once enough casts build up.
+            self._collaborations.add(movie.id, self._cast(movie))
 
     def add_actor(self, actor: Actor):
-        self._actors.add(actor)
+        with self._catalogue_lock.write():
+            self._actors.add(actor)
 
     def add_genre(self, genre: Genre):
-        self._genres.add(genre)
+        with self._catalogue_lock.write():
+            self._genres.add(genre)
 
     def add_director(self, director: Director):
-        self._directors.add(director)
+        with self._catalogue_lock.write():
+            self._directors.add(director)
 
     def add_review(self, review: Review):
+        with self._reviews_lock.write():
+            self._store_review(review)
+            sequence = self._journal_append(self._review_record(review))
+        self._journal_commit(sequence)
+
+    def open_journal(self, filename: str, compact_every: int = 10000) -> int:
+        """
+        Restores the users and reviews recorded in the journal at filename, then records every user
+        and review added afterwards there, compacting it into its snapshot every compact_every
+        records (never when 0). Call once the catalogue is loaded. Returns the number of records restored.
+        """
+        journal = Journal(filename)
+        count = 0
+        for record in journal.replay():
+            if 'user' in record:
+                self._users[record['user']] = User(record['user'], record['password'])
+            else:
+                movie = record['review']
+                if isinstance(movie, int):
+                    movie = self._movies_by_id.get(movie, movie)
+                self._store_review(Review(movie, record['text'], record['rating'], record['timestamp']))
+            count += 1
+        self._journal = journal
+        self._compact_every = compact_every
+        self._journal_commit(None)
+        return count
+
+    def compact_journal(self):
+        """ Folds the journal into its snapshot, so that the next start replays one compact file. """
+        with self._users_lock, self._reviews_lock.write():
+            self._compact_journal_locked()
+
+    def _journal_append(self, record: dict):
+        # Called with the lock guarding the change held, so journal order matches memory order.
+        return self._journal.append(record) if self._journal is not None else None
+
+    def _journal_commit(self, sequence):
+        # Waits for the record to reach disk outside any lock, so concurrent writers share an fsync.
+        if self._journal is None:
+            return
+        if sequence is not None:
+            self._journal.sync(sequence)
+        if self._compact_every and self._journal.records_since_compaction >= self._compact_every:
+            with self._users_lock, self._reviews_lock.write():
+                if self._journal.records_since_compaction >= self._compact_every:
+                    self._compact_journal_locked()
+
+    def _compact_journal_locked(self):
+        records = [self._user_record(user) for user in self._users.values()]
+        records.extend(self._review_record(review) for review in self._reviews)
+        self._journal.compact(records)
+
+    @staticmethod
+    def _user_record(user: User) -> dict:
+        return {'user': user.user_name, 'password': user.password}
+
+    @staticmethod
+    def _review_record(review: Review) -> dict:
+        movie = review.movie.id if isinstance(review.movie, Movie) else review.movie
+        return {'review': movie, 'text': review.review_text, 'rating': review.rating, 'timestamp': review.timestamp}
+
+    def _store_review(self, review: Review):
         self._reviews.append(review)
+        key = self._review_key(review.movie)
+        self._reviews_by_movie.setdefault(key, []).append(review)
+        if review.rating is not None:
+            totals = self._review_totals.setdefault(key, [0, 0])
+            totals[0] += 1
+            totals[1] += review.rating
+        self._bump_version()
+
+    def _bump_version(self):
+        with self._version_lock:
+            self._version += 1
 
     def get_genres(self) -> Set[Genre]:
-        return self._genres
+        with self._catalogue_lock.read():
+            return set(self._genres)
 
     def get_movies_by_genre(self, genrename: str) -> List[Movie]:
-        matching_movies = list()
-        for movie in self._movies:
-            for genre in movie.genres:
-                if genrename.lower() in genre.genre_name.lower():
-                    matching_movies.append(movie)
-                    break
-        return matching_movies
+        with self._catalogue_lock.read():
+            return [self._movies[i] for i in self._genre_index.search(genrename)]
 
     def get_movies_by_actor(self, actorname: str) -> List[Movie]:
-        matching_movies = list()
-        for movie in self._movies:
-            for actor in movie.actors:
-                if actorname.lower() in actor.actor_full_name.lower():
-                    matching_movies.append(movie)
-                    break
-        return matching_movies
+        with self._catalogue_lock.read():
+            return [self._movies[i] for i in self._actor_index.search(actorname)]
 
     def get_movies_by_director(self, directorname: str) -> List[Movie]:
-        matching_movies = list()
-        for movie in self._movies:
-            if directorname.lower() in movie.director.director_full_name.lower():
-                matching_movies.append(movie)
-        return matching_movies
+        with self._catalogue_lock.read():
+            return [self._movies[i] for i in self._director_index.search(directorname)]
+
+    def get_movies_by_text(self, query: str) -> List[Movie]:
+        with self._catalogue_lock.read():
+            return [self._movies[i] for i in self._text_index.search(query)]
+
+    def get_movies_page(self, offset: int, limit: int) -> List[Movie]:
+        offset = max(offset, 0)
+        with self._catalogue_lock.read():
+            return self._movies[offset:offset + max(limit, 0)]
+
+    def query_movies(self, offset: int, limit: int, sort: str = None, descending: bool = False,
+                     ranges: Dict[str, Tuple[Optional[float], Optional[float]]] = None) -> Tuple[int, List[Movie]]:
+        with self._catalogue_lock.read():
+            total, positions = self._columns.query(offset, limit, sort, descending, ranges)
+            return total, [self._movies[i] for i in positions]
+
+    def query_facets(self, offset: int, limit: int, genres: List[str] = None, actor: str = None,
+                     director: str = None, years: Tuple[Optional[int], Optional[int]] = None) -> dict:
+        with self._catalogue_lock.read():
+            return self._query_facets(offset, limit, genres, actor, director, years)
+
+    def _query_facets(self, offset, limit, genres, actor, director, years) -> dict:
+        selection = (1 << len(self._movies)) - 1
+        for genre in genres or ():
+            selection &= self._genre_facets.bitmap(genre.strip().lower())
+        if actor is not None:
+            selection &= bitmap_of(self._actor_index.search(actor))
+        if director is not None:
+            selection &= bitmap_of(self._director_index.search(director))
+        if years is not None:
+            low, high = years
+            selection &= self._year_facets.union(year for year in self._year_facets.values()
+                                                 if (low is None or year >= low) and (high is None or year <= high))
+        return {
+            'total': bitmap_count(selection),
+            'movies': [self._movies[i] for i in bitmap_positions(selection, offset, limit)],
+            'genres': facet_order(self._genre_facets.counts(selection)),
+            'years': dict(sorted(self._year_facets.counts(selection).items())),
+        }
+
+    def get_suggestions(self, field: str, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        with self._catalogue_lock.read():
+            return self._suggestions[field].suggest(prefix, limit)
+
+    def get_similar_movies(self, movie: Movie, limit: int = 10) -> List[Movie]:
+        if not self.similar_movies_ready():
+            return []
+        with self._catalogue_lock.read():
+            return [self._movies_by_id[movie_id] for movie_id, _ in self._similar.similar(movie.id, limit)]
+
+    def get_recommended_movies(self, movies: List[Movie], limit: int = 10) -> List[Movie]:
+        if not self.similar_movies_ready():
+            return []
+        with self._catalogue_lock.read():
+            return [self._movies_by_id[movie_id]
+                    for movie_id, _ in self._similar.recommend((movie.id for movie in movies), limit)]
+
+    def similar_movies_ready(self) -> bool:
+        if self._similar.built:
+            return True
+        self._similar_build.start(self.refresh_similar_movies)
+        return False
+
+    def refresh_similar_movies(self):
+        # Once built, the table is kept current by _add_movie, so only the first call builds it. The
+        # build runs outside the catalogue lock, so movies can be added meanwhile; they are caught up after.
+        if self._similar.built:
+            return
+        with self._catalogue_lock.read():
+            movies = list(self._movies)
+        self._similar.extend(movies)
+        with self._catalogue_lock.read():
+            self._similar.extend(self._movies[len(movies):])
+
+    def actors_worked_together(self, actor: str, other: str) -> bool:
+        # Once built, the graph is kept current by _add_movie and guards itself, so queries need no
+        # catalogue lock.
+        self._collaborations_ready()
+        return self._collaborations.worked_together(actor, other)
+
+    def get_actor_path(self, actor: str, other: str) -> Optional[Tuple[List[str], List[Movie]]]:
+        self._collaborations_ready()
+        path = self._collaborations.shortest_path(actor, other)
+        if path is None:
+            return None
+        names, movie_ids = path
+        with self._catalogue_lock.read():
+            return names, [self._movies_by_id[movie_id] for movie_id in movie_ids]
+
+    def refresh_collaborations(self):
+        # Built once, from the whole catalogue and outside the catalogue lock; movies added meanwhile
+        # are caught up after. A movie added just as the build finishes may be added twice, which
+        # the merge makes no difference to.
+        with self._collaborations_lock:
+            if not self._collaborations.built:
+                with self._catalogue_lock.read():
+                    movies = list(self._movies)
+                self._collaborations.build((movie.id, self._cast(movie)) for movie in movies)
+                with self._catalogue_lock.read():
+                    for movie in self._movies[len(movies):]:
+                        self._collaborations.add(movie.id, self._cast(movie))
+        self._collaborations.merge()
+
+    def _collaborations_ready(self):
+        # populate builds the graph; a repository filled otherwise has it built in the background.
+        if not self._collaborations.built:
+            self._collaborations_build.start(self.refresh_collaborations)
+
+    @staticmethod
+    def _cast(movie: Movie) -> List[str]:
+        return [actor.actor_full_name for actor in movie.actors]
+
+    def get_version(self) -> int:
+        return self._version
+
+    def get_catalogue_size(self) -> int:
+        # Movies are only ever appended, so reading the length needs no lock.
+        return len(self._movies)
+
+    def count_movies(self) -> int:
+        with self._catalogue_lock.read():
+            return len(self._movies)
+
+    def get_movie(self, movie_id: int) -> Movie:
+        return self._movies_by_id.get(movie_id)
 
     def get_movie_by_name(self, name: str) -> Movie:
-        for movie in self._movies:
-            if movie.title == name:
-                return movie
-        return None
-
-    def get_reviews_by_movie(self, moviename: str) -> List[Review]:
-        matching_reviews = list()
-        for review in self._reviews:
-            if review.movie == moviename:
-                matching_reviews.append(review)
-        return matching_reviews
-
-
-def read_csv_file(filename: str, repo: MemoryRepository):
-    with open(filename, encoding='utf-8-sig') as infile:
-        rows = csv.DictReader(infile)
-        for row in rows:
-            title = row['Title']
-            description = row['Description']
-            year = int(row['Year'])
-            director = row['Director']
-            D = Director(director.strip())
-            genres = row['Genre'].split(',')
-            movie = Movie(title, year)
-            movie.director = D
-            movie.description = description
-            for genre in genres:
-                G = Genre(genre.strip())
-                repo.add_genre(G)
-                movie.genres.append(G)
-            repo.add_director(D)
-            actors = row['Actors'].split(',')
-            for actor in actors:
-                A = Actor(actor.strip())
-                repo.add_actor(A)
-                movie.actors.append(A)
-            # 
-            runtime = int(row['Runtime (Minutes)'])
-            movie.runtime_minutes = runtime
-            repo.add_movie(movie)
-
-def populate(data_path: str, repo: MemoryRepository):
-    filename = os.path.join(data_path, "Data1000Movies.csv")
-    read_csv_file(filename,repo)
+        return self._movies_by_title.get(name)
+
+    def get_reviews_by_movie(self, movie) -> List[Review]:
+        with self._reviews_lock.read():
+            return list(self._reviews_by_movie.get(self._review_key(movie), []))
+
+    def get_review_stats(self, movie) -> dict:
+        with self._reviews_lock.read():
+            count, total = self._review_totals.get(self._review_key(movie), (0, 0))
+        return {'count': count, 'sum': total, 'mean': total / count if count else None}
+
+    def _review_key(self, movie):
+        # Reviews may name their movie by title; resolve it so both forms share one bucket.
+        if not isinstance(movie, Movie):
+            movie = self._movies_by_title.get(movie, movie)
+        return movie.id if isinstance(movie, Movie) else movie
+
+
+def read_csv_file(filename: str, repo: MemoryRepository, registry: EntityRegistry = None) -> IngestReport:
+    """ Streams one or more catalogue CSV files (see catalogue_files) into repo and returns what was read. """
+    # Entities are interned so that each name exists once, however many movies share it.
+    registry = registry or EntityRegistry()
+    report = ingest(filename, repo, registry=registry)
+    for director in registry.directors:
+        repo.add_director(director)
+    for actor in registry.actors:
+        repo.add_actor(actor)
+    for genre in registry.genres:
+        repo.add_genre(genre)
+    return report
+
+def populate(data_path: str, repo: MemoryRepository, use_snapshot: bool = True, sources=None) -> str:
+    """
+    Loads the catalogue into repo, preferring an up-to-date snapshot, and returns the source used.
+    sources names the CSV files to load instead of the one in data_path; they are never snapshotted.
+    """
+    if sources:
+        return str(read_csv_file(sources, repo))
+    filename = os.path.join(data_path, CATALOGUE_FILENAME)
+    if use_snapshot and load_snapshot(filename, repo):
+        source = 'snapshot'
+    else:
+        source = str(read_csv_file(filename, repo))
+    # Built now rather than on the first query.
+    repo.refresh_collaborations()
+    return source
+
+def build_snapshot(data_path: str) -> str:
+    """ Compiles the catalogue CSV into a snapshot beside it and returns the snapshot's file name. """
+    filename = os.path.join(data_path, CATALOGUE_FILENAME)
+    staging = MemoryRepository()
+    read_csv_file(filename, staging)
+    return write_snapshot(staging.get_movies_page(0, staging.count_movies()), filename)
@@ -1,5 +1,5 @@
 import abc
-from typing import List, Set
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import date
 
 from movie.domain.model import Movie, Director, Actor, Genre, Review, User
@@ -11,24 +11,42 @@ repo_instance = None
 class RepositoryException(Exception):
 
     def __init__(self, message=None):
-        pass
+        super().__init__(*(() if message is None else (message,)))
 
 
 class AbstractRepository(abc.ABC):
 
     @abc.abstractmethod
     def add_user(self, user: User):
-        """" Adds a User to the repository. """
+        """"
+        Adds a User to the repository.
+        Raises RepositoryException if a User with the same user name already exists.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
     def get_user(self, username) -> User:
         """
-        Returns the User named username from the repository.
+        Returns the User named username from the repository, ignoring case and surrounding whitespace.
         If there is no User with the given username, this method returns None.
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def watch_movie(self, username, movie: Movie):
+        """
+        Records that the User named username watched movie, unless they already had.
+        Does nothing if there is no such User.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_watched_movies(self, username, limit: int) -> List[Movie]:
+        """
+        Returns up to limit of the movies the User named username watched, latest first.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_movie(self, movie: Movie):
         """
@@ -36,6 +54,14 @@ class AbstractRepository(abc.ABC):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def add_movies(self, movies: List[Movie]):
+        """
+        Adds Movies to the repository together, numbering those without an id.
+        Nothing is added if one of them has the id of a movie already stored.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_actor(self, actor: Actor):
         """
@@ -92,16 +118,161 @@ class AbstractRepository(abc.ABC):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_movies_by_text(self, query: str) -> List[Movie]:
+        """
+        Returns the movies whose title or description contain any of the words in query, not
+        necessarily all of them, best match first; how matches are scored is up to the implementation.
+        The last word of the query, and any ending in '*', also matches words it is a prefix of.
+        Implementations may return only the best-ranked matches.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_movies_page(self, offset: int, limit: int) -> List[Movie]:
+        """
+        Returns at most limit movies in catalogue order, starting at position offset.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query_movies(self, offset: int, limit: int, sort: str = None, descending: bool = False,
+                     ranges: Dict[str, Tuple[Optional[float], Optional[float]]] = None) -> Tuple[int, List[Movie]]:
+        """
+        Returns the number of movies whose fields fall within every (low, high) range and at most limit
+        of them starting at position offset. Ranges and sort name fields of movie.adapters.columns:
+        year, runtime, rating, votes, revenue and metascore, plus title for sort. Either bound may be None.
+        Movies are ordered by the sort field, unknown values last, or in catalogue order when sort is None.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query_facets(self, offset: int, limit: int, genres: List[str] = None, actor: str = None,
+                     director: str = None, years: Tuple[Optional[int], Optional[int]] = None) -> dict:
+        """
+        Returns the movies that have every one of genres (matched ignoring case), an actor and a director
+        whose names contain actor and director, and a year within the (low, high) years range, either
+        bound being optional. Facets left as None are not filtered on. The result is a dict with the
+        number of matching movies ('total'), at most limit of them from position offset in catalogue
+        order ('movies'), and how many matching movies have each genre ('genres') and year ('years').
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_suggestions(self, field: str, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        Returns up to limit (name, movie count) pairs for the actor, director, genre or title names,
+        as field says, that have a word starting with prefix (ignoring case), most movies first.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_similar_movies(self, movie: Movie, limit: int = 10) -> List[Movie]:
+        """
+        Returns up to limit movies most like movie by genres, director, actors and description,
+        most similar first, from a table precomputed for the whole catalogue. Returns no movies
+        until similar_movies_ready does.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_recommended_movies(self, movies: List[Movie], limit: int = 10) -> List[Movie]:
+        """
+        Returns up to limit movies, other than those given, most like the given movies taken together.
+        Returns no movies until similar_movies_ready does.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def similar_movies_ready(self) -> bool:
+        """
+        Returns whether the similar movies table has been built. If it has not, starts building it on
+        a background thread, once per process, so that no request waits for it.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def refresh_similar_movies(self):
+        """
+        Builds the similar movies table, or brings it up to date with the catalogue, before returning.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def actors_worked_together(self, actor: str, other: str) -> bool:
+        """
+        Returns whether the actors named actor and other (ignoring case) appeared in a movie together.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_actor_path(self, actor: str, other: str) -> Optional[Tuple[List[str], List[Movie]]]:
+        """
+        Returns a shortest chain of actors who appeared in a movie together, from the actor named actor
+        to the one named other (ignoring case), as the actors' names, both ends included, and the movies
+        linking each actor to the next. Returns None if either actor is unknown or no chain exists.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def refresh_collaborations(self):
+        """
+        Brings the actor collaboration graph up to date with the catalogue, in its compact form, before
+        returning. Called once the catalogue is loaded, so that no query has to; until then, queries
+        answer as if no two actors had worked together.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_version(self) -> int:
+        """
+        Returns a number that changes whenever a movie or review is added, so that anything derived
+        from the catalogue and its reviews can be recognised as current while it stays the same.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_catalogue_size(self) -> int:
+        """
+        Returns the number of movies as this process last saw it, cheaply enough to call on every
+        request: movies added by another process may take a moment to be counted.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def count_movies(self) -> int:
+        """
+        Returns the number of movies in the repository.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_movie(self, movie_id: int) -> Movie:
+        """
+        Returns the Movie with the given id, or None if there is no such Movie.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_movie_by_name(self, name: str) -> Movie:
         """
-        return a movie using a id"""
+        Returns the first Movie added with the given title, or None if there is no such Movie.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_reviews_by_movie(self, moviename: str) -> List[Review]:
+    def get_reviews_by_movie(self, movie) -> List[Review]:
         """ 
-        Returns all review using a movie
+        Returns all reviews of a movie, given as a Movie or its title, in the order they were added.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_review_stats(self, movie) -> dict:
+        """
+        Returns the rating aggregates of a movie, given as a Movie or its title, as a dict with
+        the number of rated reviews ('count'), the sum of their ratings ('sum') and their mean
+        ('mean', None when the movie has no rated reviews).
         """
         raise NotImplementedError
 
@@ -0,0 +1,187 @@
+import heapq
+import math
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from movie.adapters.fulltext import tokenize
+
+# How much a shared feature of each kind counts, before it is weighted by how rare it is. Sharing a
+# director says more about two movies than sharing a description word.
+FEATURE_WEIGHTS = {'g': 1.0, 'd': 2.0, 'a': 1.5, 't': 1.0}
+
+
+def movie_features(movie) -> Dict[str, float]:
+    """ Returns the genres, director, actors and description terms of movie as feature -> count. """
+    features = dict()
+    for genre in movie.genres:
+        if genre.genre_name is not None:
+            features['g:' + genre.genre_name.lower()] = 1.0
+    if movie.director is not None and movie.director.director_full_name is not None:
+        features['d:' + movie.director.director_full_name.lower()] = 1.0
+    for actor in movie.actors:
+        if actor.actor_full_name is not None:
+            features['a:' + actor.actor_full_name.lower()] = 1.0
+    for term in tokenize(movie.description):
+        features['t:' + term] = features.get('t:' + term, 0.0) + 1.0
+    return features
+
+
+class SimilarityIndex:
+    # The NEIGHBOURS most similar movies of every movie, precomputed so that a request only looks
+    # them up. Movies are sparse TF-IDF vectors over their features, normalised so that the dot
+    # product of two is their cosine similarity. The table is built for the whole catalogue in one
+    # pass over an inverted index: each movie's scores are accumulated from the postings of its
+    # features, so only movies sharing a feature are ever scored. Features with more than MAX_POSTING
+    # movies (common genres or words, in a large catalogue) weigh little and would have every movie
+    # scored against thousands of others, so they are left out of the scores unless a movie has
+    # nothing rarer. The default catalogue has no feature that common, so its table is exact.
+    #
+    # Once built, movies are added one at a time: a new movie is weighted by the feature frequencies
+    # of the moment, scored through the same postings, and takes its place among the neighbours of the
+    # movies it scored against. Older vectors keep the weights they were built with, so after much
+    # growth the table is only approximately the one build would compute; build it again to refresh.
+
+    NEIGHBOURS = 10
+    MAX_POSTING = 1000
+
+    def __init__(self, neighbours: int = NEIGHBOURS):
+        self._neighbours_per_movie = neighbours
+        self._neighbours = dict()
+        # By position, the score a movie must beat to become one of its neighbours.
+        self._floors = []
+        self._ids = []
+        self._positions = dict()
+        self._postings = dict()
+        self._frequencies = Counter()
+        self._built = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._neighbours)
+
+    def __contains__(self, movie_id):
+        return movie_id in self._neighbours
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def extend(self, movies: Iterable):
+        """ Builds the table from movies when it has not been built yet, otherwise adds those it lacks. """
+        with self._lock:
+            if not self._built:
+                self._build(movies)
+            else:
+                for movie in movies:
+                    self._add(movie)
+
+    def add(self, movie):
+        """ Adds movie to the table, unless it is already there. """
+        with self._lock:
+            self._add(movie)
+
+    def build(self, movies: Iterable):
+        with self._lock:
+            self._build(movies)
+
+    def _build(self, movies: Iterable):
+        ids, vectors, frequencies = self._weigh(movies)
+        postings = dict()
+        for index, vector in enumerate(vectors):
+            for feature, weight in vector.items():
+                postings.setdefault(feature, []).append((index, weight))
+
+        neighbours = dict()
+        for index, vector in enumerate(vectors):
+            scores = self._scores(vector, postings)
+            scores.pop(index, None)
+            neighbours[ids[index]] = tuple((ids[other], score) for other, score in self._best(scores.items()))
+        self._ids, self._postings, self._frequencies, self._neighbours = ids, postings, frequencies, neighbours
+        self._positions = {movie_id: index for index, movie_id in enumerate(ids)}
+        self._floors = [self._floor(neighbours[movie_id]) for movie_id in ids]
+        self._built = True
+
+    def _add(self, movie):
+        if movie.id in self._neighbours:
+            return
+        counts = movie_features(movie)
+        self._frequencies.update(counts.keys())
+        index = len(self._ids)
+        vector = self._vector(counts, self._frequencies, index + 1)
+        scores = self._scores(vector, self._postings)
+        self._ids.append(movie.id)
+        self._positions[movie.id] = index
+        for feature, weight in vector.items():
+            self._postings.setdefault(feature, []).append((index, weight))
+        self._neighbours[movie.id] = tuple((self._ids[other], score) for other, score in self._best(scores.items()))
+        self._floors.append(self._floor(self._neighbours[movie.id]))
+        # The new movie may now be closer to the movies it scored against than their furthest neighbour;
+        # it was added last, so it loses ties.
+        floors = self._floors
+        for other, score in scores.items():
+            if score <= floors[other]:
+                continue
+            other_id = self._ids[other]
+            merged = [(self._positions[neighbour], neighbour_score)
+                      for neighbour, neighbour_score in self._neighbours[other_id]]
+            merged.append((index, score))
+            neighbours = self._neighbours[other_id] = tuple((self._ids[position], neighbour_score)
+                                                            for position, neighbour_score in self._best(merged))
+            floors[other] = self._floor(neighbours)
+
+    def _scores(self, vector: Dict[str, float], postings: Dict[str, list]) -> Dict[int, float]:
+        scores = dict()
+        for feature, weight in sorted(vector.items(), key=lambda item: len(postings.get(item[0], ()))):
+            posting = postings.get(feature, ())
+            # Rarest first, so every feature after the first too common one is as common.
+            if len(posting) > self.MAX_POSTING and len(scores) > 1:
+                break
+            for other, other_weight in posting[:self.MAX_POSTING]:
+                scores[other] = scores.get(other, 0.0) + weight * other_weight
+        return scores
+
+    def _floor(self, neighbours: tuple) -> float:
+        return neighbours[-1][1] if len(neighbours) == self._neighbours_per_movie else 0.0
+
+    def _best(self, scores: Iterable[Tuple[int, float]]) -> List[Tuple[int, float]]:
+        # The highest positive scores, ties to the movie added first.
+        best = heapq.nlargest(self._neighbours_per_movie, scores, key=lambda item: (item[1], -item[0]))
+        return [(other, score) for other, score in best if score > 0]
+
+    def similar(self, movie_id, limit: int) -> List[Tuple[int, float]]:
+        """ Returns up to limit (movie id, similarity) pairs for the movies most like movie_id, most similar first. """
+        return list(self._neighbours.get(movie_id, ())[:max(limit, 0)])
+
+    def recommend(self, movie_ids: Iterable, limit: int) -> List[Tuple[int, float]]:
+        """
+        Returns up to limit (movie id, score) pairs for the movies most like those of movie_ids taken
+        together, leaving those out. A movie scores the sum of its similarity to each of them.
+        """
+        movie_ids = set(movie_ids)
+        scores = dict()
+        for movie_id in movie_ids:
+            for other, score in self._neighbours.get(movie_id, ()):
+                if other not in movie_ids:
+                    scores[other] = scores.get(other, 0.0) + score
+        return heapq.nlargest(max(limit, 0), scores.items(), key=lambda item: (item[1], -item[0]))
+
+    @staticmethod
+    def _vector(counts: Dict[str, float], frequencies: Counter, count: int) -> Dict[str, float]:
+        # The TF-IDF vector of a movie's feature counts, among count movies with the given feature frequencies.
+        vector = {feature: FEATURE_WEIGHTS[feature[0]] * (1 + math.log(frequency))
+                  * math.log(1 + count / frequencies[feature]) for feature, frequency in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        return {feature: weight / norm for feature, weight in vector.items()}
+
+    @classmethod
+    def _weigh(cls, movies: Iterable) -> Tuple[list, List[Dict[str, float]], Counter]:
+        # The ids and vectors of movies, and how many of them have each feature.
+        ids, features = [], []
+        for movie in movies:
+            ids.append(movie.id)
+            features.append(movie_features(movie))
+        frequencies = Counter()
+        for counts in features:
+            frequencies.update(counts.keys())
+        return ids, [cls._vector(counts, frequencies, len(features)) for counts in features], frequencies
@@ -0,0 +1,112 @@
+import hashlib
+import marshal
+import os
+import sys
+
+from movie.adapters.repository import AbstractRepository
+from movie.domain.model import Movie, EntityRegistry
+
+# A snapshot is the catalogue CSV compiled into interned entity tables and flat movie records.
+# It is written with marshal, which loads quickly and cannot run code, but whose format is tied
+# to the Python version; a snapshot from another version, format or source file is stale.
+SNAPSHOT_MAGIC = b'FLMSNAP\n'
+SNAPSHOT_FORMAT = 2
+
+
+def snapshot_filename(csv_filename: str) -> str:
+    return os.path.splitext(csv_filename)[0] + '.snapshot'
+
+
+def source_digest(csv_filename: str) -> str:
+    digest = hashlib.sha1()
+    with open(csv_filename, 'rb') as infile:
+        for block in iter(lambda: infile.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _header(csv_filename: str) -> dict:
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'python': list(sys.version_info[:2]),
+        'source': source_digest(csv_filename),
+    }
+
+
+def write_snapshot(movies, csv_filename: str, filename: str = None) -> str:
+    """ Writes movies loaded from csv_filename to a snapshot and returns the snapshot's file name. """
+    filename = filename or snapshot_filename(csv_filename)
+    tables = {'directors': dict(), 'actors': dict(), 'genres': dict()}
+
+    def intern(table, name):
+        return tables[table].setdefault(name, len(tables[table]))
+
+    records = []
+    for movie in movies:
+        director = intern('directors', movie.director.director_full_name) if movie.director is not None else -1
+        records.append((
+            movie.id, movie.title, movie.year, movie.description, movie.runtime_minutes, director,
+            tuple(intern('actors', actor.actor_full_name) for actor in movie.actors),
+            tuple(intern('genres', genre.genre_name) for genre in movie.genres),
+            movie.rating, movie.votes, movie.revenue_millions, movie.metascore,
+        ))
+    body = {table: list(names) for table, names in tables.items()}
+    body['movies'] = records
+
+    # Write beside the target and rename, so a worker booting mid-build never sees half a file.
+    partial = filename + '.partial'
+    with open(partial, 'wb') as outfile:
+        outfile.write(SNAPSHOT_MAGIC)
+        marshal.dump(_header(csv_filename), outfile)
+        marshal.dump(body, outfile)
+    os.replace(partial, filename)
+    return filename
+
+
+def load_snapshot(csv_filename: str, repo: AbstractRepository, filename: str = None) -> bool:
+    """ Loads the snapshot of csv_filename into repo. Returns False, loading nothing, if it is missing or stale. """
+    filename = filename or snapshot_filename(csv_filename)
+    if not os.path.exists(filename):
+        return False
+    with open(filename, 'rb') as infile:
+        if infile.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            return False
+        try:
+            if marshal.load(infile) != _header(csv_filename):
+                return False
+            body = marshal.load(infile)
+        except (EOFError, ValueError, TypeError):
+            return False
+
+    registry = EntityRegistry()
+    directors = [registry.director(name) for name in body['directors']]
+    actors = [registry.actor(name) for name in body['actors']]
+    genres = [registry.genre(name) for name in body['genres']]
+    for director in directors:
+        repo.add_director(director)
+    for actor in actors:
+        repo.add_actor(actor)
+    for genre in genres:
+        repo.add_genre(genre)
+
+    # The movies go to the repository in one add_movies call, under one lock and version bump.
+    movies = []
+    for (movie_id, title, year, description, runtime, director, actor_ids, genre_ids,
+         rating, votes, revenue, metascore) in body['movies']:
+        movie = Movie(title, year)
+        movie.id = movie_id
+        if description is not None:
+            movie.description = description
+        if director >= 0:
+            movie.director = directors[director]
+        movie.actors = [actors[i] for i in actor_ids]
+        movie.genres = [genres[i] for i in genre_ids]
+        if runtime > 0:
+            movie.runtime_minutes = runtime
+        movie.rating = rating
+        movie.votes = votes
+        movie.revenue_millions = revenue
+        movie.metascore = metascore
+        movies.append(movie)
+    repo.add_movies(movies)
+    return True
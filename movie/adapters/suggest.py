@@ -0,0 +1,154 @@
+import heapq
+import threading
+from bisect import bisect_left
+from typing import List, Tuple
+
+# The name sets completions are offered for.
+SUGGESTION_FIELDS = ('actor', 'director', 'genre', 'title')
+
+# Sorts after every character, so prefix + PREFIX_END bounds the keys starting with prefix.
+PREFIX_END = '\U0010ffff'
+
+
+class SuggestionIndex:
+    # Completions for partially typed names. Every word of a name is a key into one sorted array, so
+    # 'pra' completes 'Chris Pratt', and the names under a prefix are the keys between two bisections.
+    # Names are ranked by how many movies reference them; the best MAX_SUGGESTIONS of every prefix
+    # matching more than CACHED_RANGE keys are kept, and smaller ranges are ranked on demand. The array
+    # is built on the first query, which concurrent queries wait for; after that, every name added
+    # updates the array and the kept rankings in place. Adding names must not overlap with queries.
+
+    MAX_SUGGESTIONS = 20
+    CACHED_RANGE = 256
+
+    def __init__(self):
+        self._counts = dict()
+        self._labels = dict()
+        self._built = False
+        # Every word suffix of every name, sorted, and the lowercase name each one belongs to.
+        self._keys = []
+        self._names = []
+        self._top = dict()
+        self._build_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._counts)
+
+    def add(self, name: str):
+        """ Counts one more movie referencing name. """
+        if not name:
+            return
+        key = name.lower()
+        added = key not in self._counts
+        if added:
+            self._counts[key] = 0
+            self._labels[key] = name
+        self._counts[key] += 1
+        if not self._built:
+            return
+        if added:
+            for suffix in self._suffixes(key):
+                index = bisect_left(self._keys, suffix)
+                self._keys.insert(index, suffix)
+                self._names.insert(index, key)
+                self._cache_grown_ranges(suffix)
+        self._promote(key)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """ Returns up to limit (name, movie count) pairs with a word starting with prefix, most referenced first. """
+        prefix = ' '.join(prefix.lower().split())
+        limit = min(limit, self.MAX_SUGGESTIONS)
+        if not prefix or limit <= 0:
+            return []
+        if not self._built:
+            with self._build_lock:
+                if not self._built:
+                    self._build()
+        top = self._top.get(prefix)
+        if top is None:
+            start = bisect_left(self._keys, prefix)
+            end = bisect_left(self._keys, prefix + PREFIX_END, start)
+            top = self._best(start, end, self._order)
+        return [(self._labels[key], self._counts[key]) for key in top[:limit]]
+
+    def _order(self, key: str):
+        # Most referenced first; ties stay alphabetical.
+        return -self._counts[key], key
+
+    def _best(self, start: int, end: int, order) -> List[str]:
+        # A name with several words under the prefix appears once per word, hence the set.
+        return heapq.nsmallest(self.MAX_SUGGESTIONS, set(self._names[start:end]), key=order)
+
+    @staticmethod
+    def _suffixes(key: str) -> List[str]:
+        suffixes = []
+        start = 0
+        while start >= 0:
+            suffixes.append(key[start:])
+            start = key.find(' ', start)
+            start = start if start < 0 else start + 1
+        return suffixes
+
+    def _cache_grown_ranges(self, suffix: str):
+        # Keeps every prefix of more than CACHED_RANGE keys ranked, as _build leaves them.
+        for depth in range(1, len(suffix) + 1):
+            prefix = suffix[:depth]
+            if prefix in self._top:
+                continue
+            start = bisect_left(self._keys, prefix)
+            end = bisect_left(self._keys, prefix + PREFIX_END, start)
+            if end - start <= self.CACHED_RANGE:
+                # The ranges of longer prefixes are no larger.
+                return
+            self._top[prefix] = self._best(start, end, self._order)
+
+    def _promote(self, key: str):
+        # Counts only grow, so the name can only enter the kept rankings of its prefixes or move up in them.
+        order = self._order(key)
+        for suffix in self._suffixes(key):
+            for depth in range(1, len(suffix) + 1):
+                top = self._top.get(suffix[:depth])
+                if top is None:
+                    break
+                if key in top:
+                    top.remove(key)
+                elif len(top) == self.MAX_SUGGESTIONS and order >= self._order(top[-1]):
+                    continue
+                top.append(key)
+                top.sort(key=self._order)
+                del top[self.MAX_SUGGESTIONS:]
+
+    def _build(self):
+        # Alphabetical first, then a stable sort on the counts, so ties stay alphabetical.
+        ranked = sorted(self._counts)
+        ranked.sort(key=self._counts.__getitem__, reverse=True)
+        rank = {key: position for position, key in enumerate(ranked)}
+        keys, names = [], []
+        for key in ranked:
+            for suffix in self._suffixes(key):
+                keys.append(suffix)
+                names.append(key)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self._keys = [keys[i] for i in order]
+        self._names = [names[i] for i in order]
+
+        # Rank the large ranges now, one character deeper at a time, so no query has to.
+        top = dict()
+        pending = [(0, len(self._keys), '')]
+        while pending:
+            start, end, prefix = pending.pop()
+            depth = len(prefix) + 1
+            while start < end:
+                key = self._keys[start]
+                if len(key) < depth:
+                    start += 1
+                    continue
+                child = key[:depth]
+                child_end = bisect_left(self._keys, child + PREFIX_END, start, end)
+                if child_end - start > self.CACHED_RANGE:
+                    top[child] = self._best(start, child_end, rank.__getitem__)
+                    pending.append((start, child_end, child))
+                start = child_end
+        self._top = top
+        # Set last: a query that sees the index built must see all of the built state.
+        self._built = True
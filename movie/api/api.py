@@ -0,0 +1,184 @@
+import gzip
+import hashlib
+
+from flask import Blueprint, current_app, json, request, Response
+
+import movie.adapters.repository as repo
+import movie.movies.services as services
+from movie.adapters.columns import NUMERIC_FIELDS, SORT_FIELDS
+
+try:
+    import brotli
+except ImportError:
+    # Brotli is optional; without it responses are offered gzip-compressed only.
+    brotli = None
+
+# Configure Blueprint.
+api_blueprint = Blueprint('api_bp', __name__, url_prefix='/api/v1')
+
+MAX_PAGE_SIZE = 100
+
+
+@api_blueprint.route('/movies', methods=['GET'])
+def list_movies():
+    offset, limit = _page_args()
+    sort = request.args.get('sort')
+    if sort not in SORT_FIELDS:
+        sort = None
+    descending = request.args.get('order') == 'desc'
+    ranges = {}
+    for field in NUMERIC_FIELDS:
+        low = _number_arg(field + '_min')
+        high = _number_arg(field + '_max')
+        if low is not None or high is not None:
+            ranges[field] = (low, high)
+
+    def build():
+        if sort is None and not ranges:
+            total = services.count_movies(repo.repo_instance)
+            page = services.get_movies_page(offset, limit, repo.repo_instance)
+        else:
+            total, page = services.query_movies(offset, limit, sort, descending, ranges, repo.repo_instance)
+        return {'total': total, 'offset': offset, 'limit': limit,
+                'movies': [services.movie_to_dict_with_stats(movie, repo.repo_instance) for movie in page]}
+    return _json_response(build)
+
+
+@api_blueprint.route('/movies/<int:movie_id>', methods=['GET'])
+def get_movie(movie_id):
+    def build():
+        movie = services.get_movie(movie_id, repo.repo_instance)
+        if movie is None:
+            return None
+        return services.movie_to_dict_with_stats(movie, repo.repo_instance)
+    return _json_response(build)
+
+
+@api_blueprint.route('/movies/<int:movie_id>/reviews', methods=['GET'])
+def get_movie_reviews(movie_id):
+    def build():
+        movie = services.get_movie(movie_id, repo.repo_instance)
+        if movie is None:
+            return None
+        return {'movie_id': movie_id,
+                'review_stats': services.get_review_stats(movie, repo.repo_instance),
+                'reviews': [services.review_to_dict(review)
+                            for review in services.get_comments(movie, repo.repo_instance)]}
+    return _json_response(build)
+
+
+@api_blueprint.route('/movies/<int:movie_id>/similar', methods=['GET'])
+def get_similar_movies(movie_id):
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_PAGE_SIZE)
+
+    def build():
+        movie = services.get_movie(movie_id, repo.repo_instance)
+        if movie is None:
+            return None
+        return {'movie_id': movie_id,
+                'movies': [services.movie_to_dict(similar)
+                           for similar in services.get_similar_movies(movie, limit, repo.repo_instance)]}
+    # Publishing the similar movies table leaves the version alone, so the empty list served while it
+    # is being built must be neither stored nor tagged for revalidation.
+    return _json_response(build, cacheable=services.similar_movies_ready(repo.repo_instance))
+
+
+@api_blueprint.route('/actors/path', methods=['GET'])
+def get_actor_path():
+    actor = request.args.get('from', '')
+    other = request.args.get('to', '')
+
+    def build():
+        path = services.get_actor_path(actor, other, repo.repo_instance)
+        if path is None:
+            return None
+        names, movies = path
+        return {'from': actor, 'to': other, 'degrees': len(movies),
+                'worked_together': services.actors_worked_together(actor, other, repo.repo_instance),
+                'actors': names,
+                'movies': [{'id': movie.id, 'title': movie.title, 'year': movie.year} for movie in movies]}
+    return _json_response(build)
+
+
+@api_blueprint.route('/search', methods=['GET'])
+def search_movies():
+    offset, limit = _page_args()
+    option = request.args.get('option')
+    keyword = request.args.get('q')
+
+    def build():
+        movie_ids = services.search_movie_ids(option, keyword, repo.repo_instance)
+        page = services.get_movies_by_ids(movie_ids[offset:offset + limit], repo.repo_instance)
+        return {'option': option, 'query': keyword, 'total': len(movie_ids), 'offset': offset, 'limit': limit,
+                'movies': [services.movie_to_dict_with_stats(movie, repo.repo_instance) for movie in page]}
+    return _json_response(build)
+
+
+def _page_args():
+    offset = max(request.args.get('cursor', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_PAGE_SIZE)
+    return offset, limit
+
+
+def _number_arg(name):
+    value = request.args.get(name, type=float)
+    # NaN compares false with everything, so it would select nothing rather than be ignored.
+    return None if value is None or value != value else value
+
+
+def _json_response(build, cacheable=True):
+    # Every response is a function of the request URL and the repository contents, so the repository
+    # version names the representation: a client presenting its ETag gets a 304 without the payload
+    # being rebuilt. build returns None when the resource does not exist. A response that is not
+    # cacheable goes out untagged and marked no-store.
+    encoding = _accepted_encoding()
+    tag = None
+    if cacheable:
+        tag = hashlib.sha1(f"{services.get_repository_version(repo.repo_instance)}:{request.full_path}"
+                           .encode('utf-8')).hexdigest()
+        # Small bodies go out uncompressed whatever the client accepts, so either tag may be the current one.
+        candidates = [tag] if encoding == 'identity' else [f"{tag}-{encoding}", tag]
+        for candidate in candidates:
+            if request.if_none_match.contains(candidate):
+                response = Response(status=304)
+                _set_cache_headers(response, candidate)
+                return response
+
+    payload = build()
+    if payload is None:
+        return Response(json.dumps({'error': 'Not found'}), status=404, mimetype='application/json')
+    body = json.dumps(payload).encode('utf-8')
+    response = Response(mimetype='application/json')
+    if encoding != 'identity' and len(body) >= current_app.config['API_COMPRESSION_MIN_SIZE']:
+        body = _compress(body, encoding)
+        response.headers['Content-Encoding'] = encoding
+        if tag is not None:
+            tag = f"{tag}-{encoding}"
+    response.set_data(body)
+    _set_cache_headers(response, tag)
+    return response
+
+
+def _set_cache_headers(response, tag):
+    if tag is None:
+        response.headers['Cache-Control'] = 'no-store'
+    else:
+        response.set_etag(tag)
+        # Caches may keep the response but must revalidate it, which costs a 304 while nothing has changed.
+        response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+
+
+def _accepted_encoding() -> str:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return 'identity'
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
@@ -1,7 +1,18 @@
 import csv
 import datetime
+from itertools import islice
+
+
+def optional_number(text, kind):
+    # The CSV marks columns such as revenue and metascore 'N/A', or leaves them blank, when they are unknown.
+    if text is None or text.strip() in ("", "N/A"):
+        return None
+    return kind(text)
+
 
 class Genre:
+    __slots__ = ('_genre_name',)
+
     def __init__(self, genre_name):
         if genre_name == "":
             genre_name = None
@@ -29,12 +40,19 @@ class Genre:
 
 
 class Actor:
+    __slots__ = ('__actor_full_name', '_colleagues')
+
+    # Answers colleague checks, by name, for actors not linked through add_actor_colleague. The app
+    # points it at its repository, whose collaboration graph holds every cast, so loaded actors keep
+    # no colleague sets of their own.
+    colleague_check = None
+
     def __init__(self, actor_full_name: str):
         if actor_full_name == "" or type(actor_full_name) is not str:
             self.__actor_full_name = None
         else:
             self.__actor_full_name = actor_full_name.strip()
-        self._colleagues = []
+        self._colleagues = None
 
     @property
     def actor_full_name(self) -> str:
@@ -56,13 +74,19 @@ class Actor:
         return hash(self.__actor_full_name)
 
     def add_actor_colleague(self, colleague):
-        self._colleagues.append(colleague)
+        if self._colleagues is None:
+            self._colleagues = set()
+        self._colleagues.add(colleague)
 
     def check_if_this_actor_worked_with(self, colleague):
-        return colleague in self._colleagues
+        if self._colleagues is not None and colleague in self._colleagues:
+            return True
+        check = Actor.colleague_check
+        return check is not None and check(self.__actor_full_name, colleague.actor_full_name)
 
 
 class Director:
+    __slots__ = ('_director_full_name',)
 
     def __init__(self, director_full_name: str):
         if director_full_name == "" or type(director_full_name) is not str:
@@ -91,6 +115,8 @@ class Director:
 
 
 class Movie:
+    __slots__ = ('__id', '__version', '__title', '__description', '__year', '__director', '__actors',
+                 '__genres', '__runtime_minutes', '__rating', '__votes', '__revenue_millions', '__metascore')
 
     def __init__(self, title, year):
 
@@ -100,6 +126,8 @@ class Movie:
         if title == "":
             print("Title is mandatory")
             return
+        self.__id = None
+        self.__version = 0
         self.__title = title.strip()
         self.__description = None
         self.__year = year
@@ -107,6 +135,24 @@ class Movie:
         self.__actors = []
         self.__genres = []
         self.__runtime_minutes = 0
+        self.__rating = None
+        self.__votes = None
+        self.__revenue_millions = None
+        self.__metascore = None
+
+    @property
+    def id(self):
+        return self.__id
+
+    @id.setter
+    def id(self, value):
+        self.__id = value
+        self.__version += 1
+
+    @property
+    def version(self):
+        # Bumped by every setter and add/remove method, so cached views of the movie can tell it changed.
+        return self.__version
 
     @property
     def year(self):
@@ -119,6 +165,7 @@ class Movie:
     @title.setter
     def title(self, title):
         self.__title = title.strip()
+        self.__version += 1
 
     @property
     def description(self):
@@ -127,6 +174,7 @@ class Movie:
     @description.setter
     def description(self, description):
         self.__description = description.strip()
+        self.__version += 1
 
     @property
     def director(self):
@@ -135,6 +183,7 @@ class Movie:
     @director.setter
     def director(self, value):
         self.__director = value
+        self.__version += 1
 
     @property
     def actors(self):
@@ -143,6 +192,7 @@ class Movie:
     @actors.setter
     def actors(self, value):
         self.__actors = value
+        self.__version += 1
 
     @property
     def genres(self):
@@ -151,6 +201,7 @@ class Movie:
     @genres.setter
     def genres(self, value):
         self.__genres = value
+        self.__version += 1
 
     @property
     def runtime_minutes(self):
@@ -161,6 +212,43 @@ class Movie:
         if runtime_minutes <= 0:
             raise ValueError("Runtime must be a positive number")
         self.__runtime_minutes = runtime_minutes
+        self.__version += 1
+
+    @property
+    def rating(self):
+        return self.__rating
+
+    @rating.setter
+    def rating(self, value):
+        self.__rating = value
+        self.__version += 1
+
+    @property
+    def votes(self):
+        return self.__votes
+
+    @votes.setter
+    def votes(self, value):
+        self.__votes = value
+        self.__version += 1
+
+    @property
+    def revenue_millions(self):
+        return self.__revenue_millions
+
+    @revenue_millions.setter
+    def revenue_millions(self, value):
+        self.__revenue_millions = value
+        self.__version += 1
+
+    @property
+    def metascore(self):
+        return self.__metascore
+
+    @metascore.setter
+    def metascore(self, value):
+        self.__metascore = value
+        self.__version += 1
 
     def __repr__(self):
         return f"<Movie {self.__title}, {self.__year}>"
@@ -177,19 +265,63 @@ class Movie:
     def add_actor(self, value):
         if value not in self.__actors:
             self.__actors.append(value)
+            self.__version += 1
 
     def remove_actor(self, actor):
         if actor in self.__actors:
             self.__actors.remove(actor)
+            self.__version += 1
 
     def add_genre(self, genre):
         if genre not in self.__genres:
             self.__genres.append(genre)
+            self.__version += 1
 
     def remove_genre(self, genre):
         if genre in self.__genres:
             self.__genres.remove(genre)
+            self.__version += 1
+
+
+
+class EntityRegistry:
+    # Hands out one canonical Director, Actor and Genre per name, so every movie loaded
+    # through the registry shares the same instances.
+
+    def __init__(self):
+        self.__directors = dict()
+        self.__actors = dict()
+        self.__genres = dict()
+
+    @property
+    def directors(self):
+        return self.__directors.values()
 
+    @property
+    def actors(self):
+        return self.__actors.values()
+
+    @property
+    def genres(self):
+        return self.__genres.values()
+
+    def director(self, director_full_name: str) -> Director:
+        director = self.__directors.get(director_full_name)
+        if director is None:
+            director = self.__directors[director_full_name] = Director(director_full_name)
+        return director
+
+    def actor(self, actor_full_name: str) -> Actor:
+        actor = self.__actors.get(actor_full_name)
+        if actor is None:
+            actor = self.__actors[actor_full_name] = Actor(actor_full_name)
+        return actor
+
+    def genre(self, genre_name: str) -> Genre:
+        genre = self.__genres.get(genre_name)
+        if genre is None:
+            genre = self.__genres[genre_name] = Genre(genre_name)
+        return genre
 
 
 class MovieFileCSVReader:
@@ -218,6 +350,7 @@ class MovieFileCSVReader:
         return self.__genres
 
     def read_csv_file(self):
+        registry = EntityRegistry()
         with open(self.__file_name, mode='r', encoding='utf-8-sig') as csvfile:
             rows = csv.DictReader(csvfile)
             for row in rows:
@@ -225,24 +358,30 @@ class MovieFileCSVReader:
                 description = row['Description']
                 year = int(row['Year'])
                 director = row['Director']
-                D = Director(director.strip())
+                D = registry.director(director.strip())
                 genres = row['Genre'].split(',')
                 movie = Movie(title, year)
                 movie.director = D
                 movie.description = description
                 for genre in genres:
-                    G = Genre(genre.strip())
+                    G = registry.genre(genre.strip())
                     self.__genres.add(G)
                     movie.genres.append(G)
                 self.__directors.add(D)
                 actors = row['Actors'].split(',')
                 for actor in actors:
-                    A = Actor(actor.strip())
+                    A = registry.actor(actor.strip())
                     self.__actors.add(A)
                     movie.actors.append(A)
 
                 runtime = int(row['Runtime (Minutes)'])
                 movie.runtime_minutes = runtime
+                movie.rating = optional_number(row.get('Rating'), float)
+                movie.votes = optional_number(row.get('Votes'), int)
+                movie.revenue_millions = optional_number(row.get('Revenue (Millions)'), float)
+                movie.metascore = optional_number(row.get('Metascore'), int)
+                if row.get('Rank'):
+                    movie.id = int(row['Rank'])
                 self.__movies.append(movie)
 
 class Review:
@@ -250,15 +389,19 @@ class Review:
     # review text
     # rating 1-10
     # timestamp
+    __slots__ = ('__movie', '__review_text', '__rating', '__timestamp')
 
-    def __init__(self, movie, review_text, rating):
+    def __init__(self, movie, review_text, rating, timestamp=None):
         self.__movie = movie
         self.__review_text = review_text
-        if 1 <= rating <= 10:
+        if rating is not None and 1 <= rating <= 10:
             self.__rating = rating
         else:
             self.__rating = None
-        self.__timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%m')
+        # Reviews read back from storage keep the timestamp they were written with.
+        if timestamp is None:
+            timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%m')
+        self.__timestamp = timestamp
 
     @property
     def movie(self):
@@ -286,10 +429,13 @@ class Review:
             return self.__movie == other.__movie and self.__rating == other.__rating and self.__timestamp == other.__timestamp and self.__review_text == other.__review_text
 
 class User:
+    __slots__ = ('__user_name', '__password', '__watched_movies', '__reviews', '__time_spent_watching_movies_minutes')
+
     def __init__(self, username, password):
         self.__user_name = username.strip().lower()
         self.__password = password
-        self.__watched_movies = []
+        # Watched movies in the order first watched, as dict keys so that watching again is a lookup.
+        self.__watched_movies = dict()
         self.__reviews = []
         self.__time_spent_watching_movies_minutes = int()
 
@@ -303,7 +449,7 @@ class User:
 
     @property
     def watched_movies(self):
-        return self.__watched_movies
+        return list(self.__watched_movies)
 
     @property
     def reviews(self):
@@ -332,9 +478,13 @@ class User:
     # this method implements the action of a user watching a movie
     def watch_movie(self, movie):
         if movie not in self.__watched_movies:
-            self.__watched_movies.append(movie)
+            self.__watched_movies[movie] = None
             self.__time_spent_watching_movies_minutes += movie.runtime_minutes
 
+    # returns up to count of the movies this user watched last, latest first
+    def last_watched_movies(self, count):
+        return list(islice(reversed(self.__watched_movies), max(count, 0)))
+
     # this method adds a review that this user has written to the list of all reviews written by this user
     def add_review(self, review):
         if review not in self.__reviews:
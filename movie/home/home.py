@@ -1,8 +1,17 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, session
+
+import movie.adapters.repository as repo
+import movie.movies.services as services
 
 home_blueprint = Blueprint(
     'home_bp', __name__)
 
+RECOMMENDED_SHOWN = 8
+
 @home_blueprint.route('/', methods=['GET'])
 def home():
-    return render_template('home/home.html')
+    recommended = []
+    if 'username' in session:
+        recommended = [services.movie_to_dict(movie)
+                       for movie in services.get_recommended_movies(session['username'],RECOMMENDED_SHOWN,repo.repo_instance)]
+    return render_template('home/home.html', recommended=recommended)
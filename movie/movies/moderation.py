@@ -0,0 +1,199 @@
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_right
+from typing import Iterable, List
+
+from better_profanity import profanity
+from better_profanity.utils import get_complete_path_of_file, read_wordlist
+
+from movie.utilities.cache import LRUCache
+
+PENDING = 'pending'
+PUBLISHED = 'published'
+REJECTED = 'rejected'
+FAILED = 'failed'
+
+logger = logging.getLogger(__name__)
+
+# Joins the texts of a batch. Its letter matches no character of the pattern, and letters stop the
+# separators allowed inside phrases, so no match spans two texts; the line breaks around it end words.
+SEPARATOR = '\n\u01c2\n'
+
+
+class ProfanityMatcher:
+    # better_profanity's word list and look-alike characters compiled into one regular expression,
+    # so a text is screened in a single pass instead of one word-set lookup per word combination.
+    # The words are merged into a prefix tree first, so the expression never tries two words that
+    # share a prefix separately. It agrees with better_profanity on the listed words and their
+    # look-alike spellings, except that it does not join split words ('sh it'), as better_profanity
+    # does, and it reads '_' as a separator inside phrases, which better_profanity does not.
+
+    def __init__(self, words: Iterable[str] = None):
+        if words is None:
+            words = read_wordlist(get_complete_path_of_file('profanity_wordlist.txt'))
+        trie = dict()
+        for word in words:
+            node = trie
+            for token in self._word_tokens(word.lower()):
+                node = node.setdefault(token, dict())
+            node[''] = dict()
+        # Letters and digits on either side mean the match is part of a longer, innocent word.
+        self._pattern = re.compile(r"(?<![^\W_])" + self._trie_pattern(trie) + r"(?![^\W_])", re.IGNORECASE)
+
+    def contains_profanity(self, text: str) -> bool:
+        return text is not None and self._pattern.search(text) is not None
+
+    def screen(self, texts: List[str]) -> List[bool]:
+        """ Returns whether each of texts contains profanity, searching them all as one string. """
+        flagged = [False] * len(texts)
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text or '') + len(SEPARATOR)
+        joined = SEPARATOR.join(text or '' for text in texts)
+        position = 0
+        while position < len(joined):
+            match = self._pattern.search(joined, position)
+            if match is None:
+                break
+            index = bisect_right(starts, match.start()) - 1
+            flagged[index] = True
+            # One match settles a text, so carry on from the next.
+            if index + 1 == len(starts):
+                break
+            position = starts[index + 1]
+        return flagged
+
+    @staticmethod
+    def _word_tokens(word: str) -> List[str]:
+        tokens = []
+        for char in word:
+            if char in profanity.CHARS_MAPPING:
+                tokens.append("[" + "".join(re.escape(c) for c in profanity.CHARS_MAPPING[char]) + "]")
+            elif char == ' ':
+                # Phrases also match with other separators, but like better_profanity, not with none.
+                tokens.append(r"[\W_]+")
+            else:
+                tokens.append(re.escape(char))
+        return tokens
+
+    @classmethod
+    def _trie_pattern(cls, node: dict) -> str:
+        branches = [token + cls._trie_pattern(child) for token, child in node.items() if token]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A word ending here makes the rest optional.
+        return "(?:" + pattern + ")?" if '' in node else pattern
+
+
+class ReviewQueue:
+    # Review submissions are queued and a pool of worker threads screens them for profanity in
+    # batches, one search over the texts of a batch joined together, publishing the clean ones
+    # through publish(movie, text, repo). Submitting only enqueues, so a burst of comments never
+    # holds up request threads. Each submission gets a ticket whose status moves from PENDING to
+    # PUBLISHED, REJECTED or FAILED. With no workers, reviews are screened and published during submit.
+
+    def __init__(self, repo, publish, matcher: ProfanityMatcher = None, workers: int = 2,
+                 batch_size: int = 32, batch_wait: float = 0.05, max_tickets: int = 10000):
+        self._repo = repo
+        self._publish = publish
+        self._matcher = matcher or ProfanityMatcher()
+        self._workers = workers
+        self._batch_size = max(batch_size, 1)
+        self._batch_wait = batch_wait
+        self._queue = queue.Queue()
+        self._statuses = LRUCache(max_tickets)
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, movie, text: str) -> str:
+        """ Queues a review of movie for screening and returns its ticket. """
+        ticket = uuid.uuid4().hex
+        self._statuses.put(ticket, PENDING)
+        if self._workers <= 0:
+            self._process([(ticket, movie, text)])
+        else:
+            self._ensure_started()
+            self._queue.put((ticket, movie, text))
+        return ticket
+
+    def status(self, ticket: str):
+        """ Returns PENDING, PUBLISHED, REJECTED or FAILED, or None for an unknown or forgotten ticket. """
+        return self._statuses.get(ticket)
+
+    def join(self):
+        """ Blocks until every queued review has been screened. """
+        self._queue.join()
+
+    def close(self, timeout: float = 5.0):
+        """ Screens what is queued, then stops the workers. """
+        with self._lock:
+            threads, self._threads = self._threads, []
+            if self._pid != os.getpid():
+                threads = []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        # Threads do not survive a fork, so each worker process starts its own pool on first use.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._threads = [threading.Thread(target=self._work, name=f'review-screener-{i}', daemon=True)
+                             for i in range(self._workers)]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            # Take whatever else arrives within batch_wait, up to batch_size, and screen it together.
+            batch = [item]
+            deadline = time.monotonic() + self._batch_wait
+            stop = False
+            while len(batch) < self._batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._process(batch)
+            finally:
+                for _ in range(len(batch) + stop):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _process(self, batch: List[tuple]):
+        flagged = self._matcher.screen([text for _, _, text in batch])
+        for (ticket, movie, text), profane in zip(batch, flagged):
+            if profane:
+                self._statuses.put(ticket, REJECTED)
+                continue
+            try:
+                self._publish(movie, text, self._repo)
+            except Exception:
+                logger.exception('Could not publish review %s', ticket)
+                self._statuses.put(ticket, FAILED)
+                continue
+            self._statuses.put(ticket, PUBLISHED)
@@ -1,10 +1,11 @@
 from datetime import date
 
 from flask import Blueprint
-from flask import request, render_template, redirect, url_for, session
+from flask import request, render_template, redirect, url_for, session, abort, jsonify, Markup
 import movie.movies.services as services
 
 import movie.adapters.repository as repo
+from movie.adapters.columns import NUMERIC_FIELDS, SORT_FIELDS
 from better_profanity import profanity
 from flask_wtf import FlaskForm
 from wtforms import TextAreaField, HiddenField, SubmitField, IntegerField, SelectField, StringField
@@ -15,6 +16,8 @@ from movie.authentication.authentication import login_required
 # Configure Blueprint.
 movie_blueprint = Blueprint('movies_bp', __name__)
 
+SIMILAR_MOVIES_SHOWN = 6
+
 @movie_blueprint.route('/movies/',methods=['GET'])
 def print_all_movies():
     movies_per_page = 5
@@ -28,10 +31,30 @@ def print_all_movies():
         # Convert cursor from string to int.
         cursor = int(cursor)
 
-    # Retrieve movies and parse them to dict
-    movies = [services.movie_to_dict(i) for i in services.get_all_movies(repo.repo_instance)]
+    # Read the optional sort order and range filters.
+    listing_args = {}
+    sort = request.args.get('sort')
+    if sort in SORT_FIELDS:
+        listing_args['sort'] = sort
+    else:
+        sort = None
+    descending = request.args.get('order') == 'desc'
+    if descending:
+        listing_args['order'] = 'desc'
+    ranges = {}
+    for field in NUMERIC_FIELDS:
+        low = _number_arg(field + '_min', listing_args)
+        high = _number_arg(field + '_max', listing_args)
+        if low is not None or high is not None:
+            ranges[field] = (low, high)
 
-    specific_movies = movies[cursor:cursor + movies_per_page]
+    # Retrieve only the movies on this page and parse them to dict
+    if sort is None and not ranges:
+        movie_count = services.count_movies(repo.repo_instance)
+        page = services.get_movies_page(cursor,movies_per_page,repo.repo_instance)
+    else:
+        movie_count, page = services.query_movies(cursor,movies_per_page,sort,descending,ranges,repo.repo_instance)
+    cards = [_movie_card(i) for i in page]
 
     first_movie_url = None
     last_movie_url = None
@@ -40,41 +63,91 @@ def print_all_movies():
 
     if cursor > 0:
         # There are preceding movies, so generate URLs for the 'previous' and 'first' navigation buttons.
-        prev_movie_url = url_for('movies_bp.print_all_movies', cursor=cursor - movies_per_page)
-        first_movie_url = url_for('movies_bp.print_all_movies')
+        prev_movie_url = url_for('movies_bp.print_all_movies', cursor=cursor - movies_per_page, **listing_args)
+        first_movie_url = url_for('movies_bp.print_all_movies', **listing_args)
 
-    if cursor + movies_per_page < len(movies):
+    if cursor + movies_per_page < movie_count:
         # There are further articles, so generate URLs for the 'next' and 'last' navigation buttons.
-        next_movie_url = url_for('movies_bp.print_all_movies', cursor=cursor + movies_per_page)
+        next_movie_url = url_for('movies_bp.print_all_movies', cursor=cursor + movies_per_page, **listing_args)
 
-        last_cursor = movies_per_page * int(len(movies) / movies_per_page)
-        if len(movies) % movies_per_page == 0:
+        last_cursor = movies_per_page * int(movie_count / movies_per_page)
+        if movie_count % movies_per_page == 0:
             last_cursor -= movies_per_page
-        last_movie_url = url_for('movies_bp.print_all_movies', cursor=last_cursor)
+        last_movie_url = url_for('movies_bp.print_all_movies', cursor=last_cursor, **listing_args)
 
     # Generate the webpage to display the movies.
     return render_template(
         'movies/movielist.html',
-        movies=specific_movies,
+        cards=cards,
         first_movie_url=first_movie_url,
         last_movie_url=last_movie_url,
         prev_movie_url=prev_movie_url,
         next_movie_url=next_movie_url,
+        sort_fields=SORT_FIELDS,
+        filter_fields=NUMERIC_FIELDS,
+        listing_args=listing_args,
     )
 
+def _number_arg(name, listing_args):
+    # Returns the query parameter as a number, ignoring it when absent or malformed.
+    try:
+        value = float(request.args[name])
+    except (KeyError, ValueError):
+        return None
+    if value != value:
+        return None
+    listing_args[name] = request.args[name]
+    return value
+
 @movie_blueprint.route('/movie/',methods=['GET','POST'])
-def print_alone_movie():
+@movie_blueprint.route('/movie/<int:movie_id>',methods=['GET','POST'])
+def print_alone_movie(movie_id=None):
+    if movie_id is not None:
+        amovie = services.get_movie(movie_id,repo.repo_instance)
+    elif request.method == 'POST':
+        amovie = services.get_alone_movie(request.form.get('moviename'),repo.repo_instance)
+    else:
+        # Title lookups are kept so that existing ?moviename= links still resolve.
+        amovie = services.get_alone_movie(request.args.get('moviename'),repo.repo_instance)
+    if amovie is None:
+        abort(404)
+    review_ticket = None
     if request.method == 'POST':
+        # The review is screened and published in the background; the page reports it as pending.
         text = request.form.get('comment')
-        moviename = request.form.get('moviename')
-        services.add_review_to_movie(moviename,text,repo.repo_instance)
-    else:
-        moviename = request.args.get('moviename')
-    movie = services.movie_to_dict(services.get_alone_movie(moviename,repo.repo_instance))
-    comments = services.get_comments(moviename,repo.repo_instance)
+        if text is not None and text.strip():
+            review_ticket = services.submit_review(amovie,text)
+    if 'username' in session:
+        # Viewed movies feed the user's recommendations.
+        services.watch_movie(session['username'],amovie,repo.repo_instance)
+    movie = services.movie_to_dict(amovie)
+    detail = _movie_fragment('detail','movies/movie_detail.html','amovie',amovie)
+    comments = services.get_comments(amovie,repo.repo_instance)
+    similar = [services.movie_to_dict(i) for i in services.get_similar_movies(amovie,SIMILAR_MOVIES_SHOWN,repo.repo_instance)]
     # print(comments)
     commentform = CommentForm()
-    return render_template('/movies/amovie.html',amovie = movie,comments = comments, form = commentform)
+    return render_template('/movies/amovie.html',amovie = movie,detail = detail,comments = comments, form = commentform,
+                           review_ticket = review_ticket,similar = similar)
+
+@movie_blueprint.route('/review/<ticket>',methods=['GET'])
+def review_status(ticket):
+    status = services.get_review_status(ticket)
+    if status is None:
+        abort(404)
+    return jsonify({'ticket': ticket, 'status': status})
+
+def _movie_card(movie):
+    return _movie_fragment('card','movies/movie_card.html','movie',movie)
+
+def _movie_fragment(kind, template, name, movie):
+    # Renders the movie's part of a page once per movie version; adding a review drops it.
+    fragment = services.get_fragment(kind,movie)
+    if fragment is None:
+        # Read before rendering: a review published while rendering makes the fragment stale.
+        generation = services.get_fragment_generation(movie)
+        fragment = Markup(render_template(template, **{name: services.movie_to_dict_with_stats(movie,repo.repo_instance)}))
+        services.put_fragment(kind,movie,fragment,generation)
+    return fragment
 
 @movie_blueprint.route('/search/',methods=['GET','POST'])
 def print_movies_by_search():
@@ -88,27 +161,30 @@ def print_movies_by_search():
     else:
         # Convert cursor from string to int.
         cursor = int(cursor)
-    # Read keyword and search_method
-    if request.method == 'GET':
-        keyword = session.get('keyword')
-        option = session.get('option')
+    # Read the facets of a GET query; without any, fall back to the keyword search.
+    genres, actor, director, years, facet_args = _facet_query()
+    if request.method == 'GET' and facet_args:
+        facets = services.query_facets(cursor,movies_per_page,genres,actor,director,years,repo.repo_instance)
+        movie_count = facets['total']
+        page = facets['movies']
     else:
-        keyword = request.form.get('keyword')
-        option = request.form.get('option')
-        session['keyword'] = keyword
-        session['option'] = option
-        cursor = 0
-    # Retrieve movies and parse them to dict
-    if option == 'Actor':
-        movies = [services.movie_to_dict(i) for i in services.search_by_actor(keyword,repo.repo_instance)]
-    elif option == 'Director':
-        movies = [services.movie_to_dict(i) for i in services.search_by_director(keyword,repo.repo_instance)]
-    elif option == 'Genre':
-        movies = [services.movie_to_dict(i) for i in services.search_by_genre(keyword,repo.repo_instance)]
-    else:
-        movies = []
-
-    specific_movies = movies[cursor:cursor + movies_per_page]
+        # Read keyword and search_method
+        if request.method == 'GET':
+            keyword = session.get('keyword')
+            option = session.get('option')
+        else:
+            keyword = request.form.get('keyword')
+            option = request.form.get('option')
+            session['keyword'] = keyword
+            session['option'] = option
+            cursor = 0
+        # Retrieve the matching movie ids; facet counts are only shown for facet queries, which they describe.
+        movie_ids = services.search_movie_ids(option,keyword,repo.repo_instance)
+        movie_count = len(movie_ids)
+        page = services.get_movies_by_ids(movie_ids[cursor:cursor + movies_per_page],repo.repo_instance)
+        facets = {'genres': {}, 'years': {}}
+    # Render only this page's movies
+    cards = [_movie_card(i) for i in page]
 
     first_movie_url = None
     last_movie_url = None
@@ -117,30 +193,87 @@ def print_movies_by_search():
 
     if cursor > 0:
         # There are preceding movies, so generate URLs for the 'previous' and 'first' navigation buttons.
-        prev_movie_url = url_for('movies_bp.print_movies_by_search', cursor=cursor - movies_per_page)
-        first_movie_url = url_for('movies_bp.print_movies_by_search')
+        prev_movie_url = url_for('movies_bp.print_movies_by_search', cursor=cursor - movies_per_page, **facet_args)
+        first_movie_url = url_for('movies_bp.print_movies_by_search', **facet_args)
 
-    if cursor + movies_per_page < len(movies):
+    if cursor + movies_per_page < movie_count:
         # There are further articles, so generate URLs for the 'next' and 'last' navigation buttons.
-        next_movie_url = url_for('movies_bp.print_movies_by_search', cursor=cursor + movies_per_page)
+        next_movie_url = url_for('movies_bp.print_movies_by_search', cursor=cursor + movies_per_page, **facet_args)
 
-        last_cursor = movies_per_page * int(len(movies) / movies_per_page)
-        if len(movies) % movies_per_page == 0:
+        last_cursor = movies_per_page * int(movie_count / movies_per_page)
+        if movie_count % movies_per_page == 0:
             last_cursor -= movies_per_page
-        last_movie_url = url_for('movies_bp.print_movies_by_search', cursor=last_cursor)
+        last_movie_url = url_for('movies_bp.print_movies_by_search', cursor=last_cursor, **facet_args)
+
+    # Each genre link toggles that genre in the query; each year link narrows the query to that year.
+    selected = {genre.lower() for genre in genres}
+    genre_links = []
+    for genre, count in facets['genres'].items():
+        toggled = [g for g in genres if g.lower() != genre.lower()]
+        if genre.lower() not in selected:
+            toggled.append(genre)
+        genre_links.append((genre, count, genre.lower() in selected,
+                            url_for('movies_bp.print_movies_by_search', **dict(facet_args, genre=toggled))))
+    year_links = [(year, count, url_for('movies_bp.print_movies_by_search',
+                                        **dict(facet_args, year_min=year, year_max=year)))
+                  for year, count in facets['years'].items()]
 
     form = SearchForm()
     # Generate the webpage to display the movies.
     return render_template(
         'movies/movielist_search.html',
-        movies=specific_movies,
+        cards=cards,
         first_movie_url=first_movie_url,
         last_movie_url=last_movie_url,
         prev_movie_url=prev_movie_url,
         next_movie_url=next_movie_url,
-        form=form
+        form=form,
+        movie_count=movie_count,
+        facet_args=facet_args,
+        genre_links=genre_links,
+        year_links=year_links,
     )
 
+def _facet_query():
+    # Returns the genres, actor, director and year range of the query string, and the arguments
+    # that reproduce them in pagination and facet links.
+    facet_args = {}
+    genres = [genre.strip() for genre in request.args.getlist('genre') if genre.strip()]
+    if genres:
+        facet_args['genre'] = genres
+    actor = request.args.get('actor', '').strip() or None
+    if actor is not None:
+        facet_args['actor'] = actor
+    director = request.args.get('director', '').strip() or None
+    if director is not None:
+        facet_args['director'] = director
+    years = None
+    low = _year_arg('year_min', facet_args)
+    high = _year_arg('year_max', facet_args)
+    if low is not None or high is not None:
+        years = (low, high)
+    return genres, actor, director, years, facet_args
+
+def _year_arg(name, facet_args):
+    try:
+        value = int(request.args[name])
+    except (KeyError, ValueError):
+        return None
+    facet_args[name] = value
+    return value
+
+@movie_blueprint.route('/search/suggest',methods=['GET'])
+def suggest_search_keywords():
+    option = request.args.get('option')
+    query = request.args.get('q', '')
+    limit = request.args.get('k', 10, type=int)
+    suggestions = services.suggest(option,query,max(1, min(limit, 20)),repo.repo_instance)
+    return jsonify({'option': option, 'query': query, 'suggestions': suggestions})
+
+@movie_blueprint.route('/search/cache',methods=['GET'])
+def search_cache_stats():
+    return jsonify(services.get_search_cache_stats())
+
 class ProfanityFree:
     def __init__(self, message=None):
         if not message:
@@ -162,7 +295,7 @@ class CommentForm(FlaskForm):
     submit = SubmitField('Submit')
 
 class SearchForm(FlaskForm):
-    option = SelectField('Option: ', choices=["Actor", "Director" ,"Genre"])
+    option = SelectField('Option: ', choices=["Actor", "Director" ,"Genre", "Title/Description"])
     keyword = StringField('Keyword: ', [
         DataRequired()
     ])
@@ -1,20 +1,72 @@
+import threading
 from typing import List
 from movie.domain.model import *
 from movie.adapters.repository import AbstractRepository
+from movie.utilities.cache import LRUCache
 
+# Ordered movie ids of recent searches, keyed on (option, normalised keyword, catalogue size).
+# create_app replaces this with a cache sized from configuration.
+search_cache = LRUCache(128, 300)
 
-def get_all_movies(repo: AbstractRepository ) -> List[Movie]:
-    all_movies = repo._movies
-    return all_movies
+# Rendered movie cards and detail blocks, keyed on (fragment, movie id, movie version).
+# create_app replaces this with a cache sized from configuration.
+fragment_cache = LRUCache(1024)
+FRAGMENTS = ('card', 'detail')
+
+# Serialised movies, keyed on (movie id, movie version), so each movie is only serialised again
+# after it changes. create_app replaces this with an empty cache for its repository.
+MOVIE_DICT_CACHE_SIZE = 4096
+movie_dict_cache = LRUCache(MOVIE_DICT_CACHE_SIZE)
+# Movie id -> how many times its fragments have been invalidated. A fragment is only stored if no
+# invalidation happened while it was rendered, so a review published meanwhile cannot leave it stale.
+_fragment_generations = dict()
+_fragment_lock = threading.Lock()
+
+# Screens submitted reviews off the request thread before they reach the repository.
+# create_app sets this to a ReviewQueue configured from settings.
+review_queue = None
+
+# Recommendations for a user are drawn from the neighbours of this many of their latest watched movies.
+RECENTLY_WATCHED = 20
+
+
+def get_movies_page(offset: int, limit: int, repo: AbstractRepository) -> List[Movie]:
+    return repo.get_movies_page(offset, limit)
+
+def query_movies(offset: int, limit: int, sort, descending: bool, ranges: dict, repo: AbstractRepository):
+    return repo.query_movies(offset, limit, sort, descending, ranges)
+
+def query_facets(offset: int, limit: int, genres, actor, director, years, repo: AbstractRepository) -> dict:
+    return repo.query_facets(offset, limit, genres, actor, director, years)
+
+def get_repository_version(repo: AbstractRepository) -> int:
+    return repo.get_version()
+
+def count_movies(repo: AbstractRepository) -> int:
+    return repo.count_movies()
+
+def get_movie(movie_id: int, repo: AbstractRepository) -> Movie:
+    return repo.get_movie(movie_id)
 
 def get_alone_movie(moviename, repo: AbstractRepository) -> Movie:
     return repo.get_movie_by_name(moviename)
 
-def get_comments(moviename,repo: AbstractRepository):
-    return repo.get_reviews_by_movie(moviename)
+def get_comments(movie,repo: AbstractRepository):
+    return repo.get_reviews_by_movie(movie)
+
+def get_review_stats(movie,repo: AbstractRepository) -> dict:
+    return repo.get_review_stats(movie)
+
+def add_review_to_movie(movie,text,repo:AbstractRepository):
+    repo.add_review(Review(movie,text,10))
+    # The fragments show the movie's review stats, which have just changed.
+    invalidate_fragments(movie)
 
-def add_review_to_movie(moviename,text,repo:AbstractRepository):
-    repo.add_review(Review(moviename,text,10))
+def submit_review(movie,text) -> str:
+    return review_queue.submit(movie, text)
+
+def get_review_status(ticket):
+    return review_queue.status(ticket)
 
 def search_by_actor(keyword,repo:AbstractRepository):
     return repo.get_movies_by_actor(keyword)
@@ -25,9 +77,98 @@ def search_by_director(keyword,repo:AbstractRepository):
 def search_by_genre(keyword,repo:AbstractRepository):
     return repo.get_movies_by_genre(keyword)
 
+def search_by_text(keyword,repo:AbstractRepository):
+    return repo.get_movies_by_text(keyword)
+
+_searches = {'Actor': search_by_actor, 'Director': search_by_director, 'Genre': search_by_genre,
+             'Title/Description': search_by_text}
+
+def search_movie_ids(option,keyword,repo:AbstractRepository) -> List[int]:
+    search = _searches.get(option)
+    if search is None or keyword is None:
+        return []
+    keyword = keyword.strip().lower()
+    # The catalogue only ever grows, so its size tells cached results from stale ones.
+    key = (option, keyword, repo.get_catalogue_size())
+    movie_ids = search_cache.get(key)
+    if movie_ids is None:
+        movie_ids = tuple(movie.id for movie in search(keyword, repo))
+        search_cache.put(key, movie_ids)
+    return movie_ids
+
+# Search options mapped to the name set their keyword is completed from.
+_suggestion_fields = {'Actor': 'actor', 'Director': 'director', 'Genre': 'genre', 'Title/Description': 'title'}
+
+def suggest(option,prefix,limit,repo:AbstractRepository) -> List[dict]:
+    field = _suggestion_fields.get(option)
+    if field is None or prefix is None:
+        return []
+    return [{'name': name, 'movies': count} for name, count in repo.get_suggestions(field, prefix, limit)]
+
+def get_movies_by_ids(movie_ids,repo:AbstractRepository) -> List[Movie]:
+    return [repo.get_movie(movie_id) for movie_id in movie_ids]
+
+def get_similar_movies(movie,limit,repo:AbstractRepository) -> List[Movie]:
+    return repo.get_similar_movies(movie, limit)
+
+def similar_movies_ready(repo:AbstractRepository) -> bool:
+    return repo.similar_movies_ready()
+
+def watch_movie(user_name,movie,repo:AbstractRepository):
+    repo.watch_movie(user_name, movie)
+
+def get_recommended_movies(user_name,limit,repo:AbstractRepository) -> List[Movie]:
+    watched = repo.get_watched_movies(user_name, RECENTLY_WATCHED)
+    if not watched:
+        return []
+    return repo.get_recommended_movies(watched, limit)
+
+def actors_worked_together(actor,other,repo:AbstractRepository) -> bool:
+    return repo.actors_worked_together(actor, other)
+
+def get_actor_path(actor,other,repo:AbstractRepository):
+    return repo.get_actor_path(actor, other)
+
+def get_search_cache_stats() -> dict:
+    return search_cache.stats()
+
+def get_fragment(kind,movie: Movie):
+    return fragment_cache.get((kind, movie.id, movie.version))
+
+def get_fragment_generation(movie: Movie) -> int:
+    return _fragment_generations.get(movie.id, 0)
+
+def put_fragment(kind,movie: Movie,html,generation: int):
+    # generation is get_fragment_generation(movie) as read before rendering html.
+    with _fragment_lock:
+        if _fragment_generations.get(movie.id, 0) == generation:
+            fragment_cache.put((kind, movie.id, movie.version), html)
+
+def invalidate_fragments(movie: Movie):
+    with _fragment_lock:
+        _fragment_generations[movie.id] = _fragment_generations.get(movie.id, 0) + 1
+        for kind in FRAGMENTS:
+            fragment_cache.invalidate((kind, movie.id, movie.version))
+
 ## helper functions
+
 def movie_to_dict(movie: Movie) -> dict:
+    # Keyed on the version rather than the object, as the database repository builds new Movie
+    # objects for every query; a stored movie only changes through setters, which bump its version.
+    # Movies not yet stored have no id to tell them apart, so they are never cached.
+    if movie.id is None:
+        return _build_movie_dict(movie)
+    key = (movie.id, movie.version)
+    result = movie_dict_cache.get(key)
+    if result is None:
+        result = _build_movie_dict(movie)
+        movie_dict_cache.put(key, result)
+    # Hand out a copy so callers adding keys cannot alter the cached dict.
+    return dict(result)
+
+def _build_movie_dict(movie: Movie) -> dict:
     result = {}
+    result["id"] = movie.id
     result["title"] = movie.title
     result["running_time"] = movie.runtime_minutes
     result["year"] = movie.year
@@ -35,4 +176,20 @@ def movie_to_dict(movie: Movie) -> dict:
     result["director"] = movie.director.director_full_name
     result["genre"] = ", ".join([genre.genre_name for genre in movie.genres])
     result["description"] = movie.description
+    result["rating"] = movie.rating
+    result["votes"] = movie.votes
+    result["revenue"] = movie.revenue_millions
+    result["metascore"] = movie.metascore
+    return result
+
+def review_to_dict(review: Review) -> dict:
+    return {
+        "text": review.review_text,
+        "rating": review.rating,
+        "timestamp": review.timestamp,
+    }
+
+def movie_to_dict_with_stats(movie: Movie, repo: AbstractRepository) -> dict:
+    result = movie_to_dict(movie)
+    result["review_stats"] = repo.get_review_stats(movie)
     return result
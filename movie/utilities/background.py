@@ -0,0 +1,42 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTask:
+    # Runs a function once on a daemon thread, started by the first call to start in each process:
+    # threads do not survive a fork, so a worker forked after the parent started it runs its own.
+
+    def __init__(self, name: str):
+        self._name = name
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, target):
+        """ Starts target on the task's thread, unless this process has already started it. """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, args=(target,), name=self._name, daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def join(self, timeout: float = None):
+        """ Blocks until the thread started in this process, if any, has finished. """
+        if self._pid == os.getpid():
+            self._thread.join(timeout)
+
+    def _run(self, target):
+        start = time.perf_counter()
+        try:
+            target()
+        except Exception:
+            logger.exception('%s failed', self._name)
+            return
+        logger.info('%s finished in %.3fs', self._name, time.perf_counter() - start)
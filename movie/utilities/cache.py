@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    # A bounded mapping that evicts the least recently used entry once full and treats
+    # entries older than ttl seconds as missing. A maxsize of 0 disables caching and a
+    # ttl of 0 (or None) keeps entries until they are evicted.
+
+    def __init__(self, maxsize: int, ttl: float = None, clock=time.monotonic):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._ttl and self._clock() - entry[1] > self._ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        if self._maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._entries),
+            'maxsize': self._maxsize,
+            'ttl': self._ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,230 @@
+import cProfile
+import functools
+import io
+import pstats
+import sys
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Tuple
+
+from flask import Response, g, request
+
+try:
+    import pyinstrument
+except ImportError:
+    # pyinstrument is optional; without it only cProfile profiles can be requested.
+    pyinstrument = None
+
+# Upper bounds, in seconds, of the latency histogram buckets: from fast repository lookups to slow pages.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# The functions instrument_function has replaced, by (module, name). Module globals are shared by every
+# app in the process, so they are instrumented for the app created last.
+_originals = dict()
+
+
+class Histogram:
+
+    def __init__(self):
+        # One count per bucket of LATENCY_BUCKETS, plus one for values above the last bound.
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.allocated = 0
+
+    def observe(self, value: float, allocated: int = 0):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.allocated += allocated
+
+
+class Metrics:
+    # Latency histograms, call counts and net allocated memory blocks, keyed by metric name and label
+    # values, rendered in the Prometheus text format. Allocations are the change in the interpreter's
+    # allocated block count across the call; it is process-wide, so concurrent requests add noise.
+
+    HELP = {
+        'movie_request_seconds': 'Time spent handling requests, by route.',
+        'movie_repository_seconds': 'Time spent in repository methods.',
+        'movie_function_seconds': 'Time spent in instrumented hot-path functions.',
+    }
+    LABELS = {
+        'movie_request_seconds': ('route', 'method', 'status'),
+        'movie_repository_seconds': ('method',),
+        'movie_function_seconds': ('function',),
+    }
+
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, tuple], Histogram] = dict()
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, labels: tuple, seconds: float, allocated: int = 0):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[name, labels] = Histogram()
+            histogram.observe(seconds, allocated)
+
+    def timed(self, name: str, labels: tuple, function):
+        """ Returns function wrapped to record each call under name and labels. """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            blocks = sys.getallocatedblocks()
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.observe(name, labels, time.perf_counter() - start, sys.getallocatedblocks() - blocks)
+        return wrapper
+
+    def render(self) -> str:
+        with self._lock:
+            snapshot = sorted((name, labels, list(histogram.counts), histogram.count, histogram.sum,
+                               histogram.allocated) for (name, labels), histogram in self._histograms.items())
+        lines = []
+        for name, help_text in self.HELP.items():
+            series = [entry[1:] for entry in snapshot if entry[0] == name]
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, counts, count, total, _ in series:
+                label_text = self._label_text(name, labels)
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{label_text}}} {total!r}")
+                lines.append(f"{name}_count{{{label_text}}} {count}")
+            allocated = name.replace('_seconds', '_allocated_blocks')
+            # Net of the blocks freed, so it can fall: neither a counter nor a gauge.
+            lines.append(f"# HELP {allocated} Net memory blocks allocated during the calls.")
+            lines.append(f"# TYPE {allocated} untyped")
+            for labels, _, _, _, blocks in series:
+                lines.append(f"{allocated}{{{self._label_text(name, labels)}}} {blocks}")
+        return '\n'.join(lines) + '\n'
+
+    def _label_text(self, name: str, labels: tuple) -> str:
+        return ','.join(f'{label}="{_escape(value)}"' for label, value in zip(self.LABELS[name], labels))
+
+
+class InstrumentedRepository:
+    # Stands in for a repository, recording every public method call before passing it on.
+
+    def __init__(self, repository, metrics: Metrics):
+        self._repository = repository
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        attribute = getattr(self._repository, name)
+        if name.startswith('_') or not callable(attribute):
+            return attribute
+        wrapper = self._metrics.timed('movie_repository_seconds', (name,), attribute)
+        # Cache the wrapper so later calls skip __getattr__.
+        setattr(self, name, wrapper)
+        return wrapper
+
+
+def instrument_function(module, name: str, metrics: Metrics, label: str = None):
+    """
+    Replaces module.name with a wrapper recording its calls, labelled label (the qualified name by
+    default), until restore_functions is called.
+    """
+    # Always wrap the original, so an app created earlier in this process never gets wrapped again.
+    function = _originals.setdefault((module, name), getattr(module, name))
+    if label is None:
+        label = f"{module.__name__}.{name}"
+    setattr(module, name, metrics.timed('movie_function_seconds', (label,), function))
+
+
+def restore_functions():
+    """ Puts back every function instrument_function replaced. """
+    while _originals:
+        (module, name), function = _originals.popitem()
+        setattr(module, name, function)
+
+
+def enable_metrics(app, metrics: Metrics, path: str = '/metrics'):
+    """ Records the latency of every request of app and serves all metrics at path. """
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_blocks = sys.getallocatedblocks()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            metrics.observe('movie_request_seconds', (route, request.method, str(response.status_code)),
+                            time.perf_counter() - start, sys.getallocatedblocks() - g.pop('metrics_blocks', 0))
+        return response
+
+    def serve_metrics():
+        return Response(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+    app.add_url_rule(path, 'metrics', serve_metrics)
+
+
+def enable_profiling(app, header: str = 'X-Profile'):
+    """
+    Profiles any request of app sent with the header and answers it with the profile instead of the
+    page: 'pyinstrument' as the value asks for a pyinstrument report, when it is installed, and
+    anything else for the 40 costliest functions by cumulative cProfile time. One request is profiled
+    at a time; others sent with the header meanwhile are served normally.
+    """
+    # Only one profiler can be active in the interpreter.
+    profiling = threading.Lock()
+
+    @app.before_request
+    def start_profile():
+        kind = request.headers.get(header)
+        if not kind or not profiling.acquire(blocking=False):
+            return
+        if kind.lower() == 'pyinstrument' and pyinstrument is not None:
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        g.profiler = profiler
+
+    @app.after_request
+    def report_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+                output = io.StringIO()
+                pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(40)
+                report = output.getvalue()
+            else:
+                profiler.stop()
+                report = profiler.output_text(unicode=True)
+        finally:
+            profiling.release()
+        profiled = Response(report, mimetype='text/plain')
+        profiled.headers['X-Profiled-Status'] = str(response.status_code)
+        return profiled
+
+    @app.teardown_request
+    def stop_profile(exception=None):
+        # Reached with the profiler still running only when the request failed before its response.
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+            else:
+                profiler.stop()
+            profiling.release()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,43 @@
+import os
+import time
+from typing import Iterable
+
+from jinja2 import FileSystemBytecodeCache
+
+
+def use_bytecode_cache(app, cache_dir: str):
+    """ Keeps compiled templates under cache_dir, so that workers after the first load them without compiling. """
+    os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+
+def precompile_templates(app) -> int:
+    """ Compiles every template of app into its Jinja environment, returning how many there are. """
+    names = app.jinja_env.list_templates(extensions=('html',))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def warm_up(app, urls: Iterable[str]) -> float:
+    """
+    Precompiles the templates, then requests each url through a test client so that lazily built
+    state (indexes, caches, rendered fragments) exists before real traffic arrives.
+    Logs and returns the seconds it took.
+    """
+    start = time.perf_counter()
+    templates = precompile_templates(app)
+    failed = []
+    with app.test_client() as client:
+        for url in urls:
+            try:
+                if client.get(url).status_code >= 400:
+                    failed.append(url)
+            except Exception:
+                app.logger.exception('Warm-up request for %s failed', url)
+                failed.append(url)
+    elapsed = time.perf_counter() - start
+    app.logger.info('Warmed up %d templates and %d routes in %.3fs', templates, len(urls), elapsed)
+    if failed:
+        app.logger.warning('Warm-up routes did not succeed: %s', ', '.join(failed))
+    return elapsed
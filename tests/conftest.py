@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from movie import create_app
+from movie.adapters.database_repository import DatabaseRepository, populate as populate_database
+from movie.adapters.memory_repository import MemoryRepository, populate as populate_memory
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'movie', 'adapters', 'data')
+
+
+@pytest.fixture
+def memory_repo():
+    repository = MemoryRepository()
+    populate_memory(DATA_PATH, repository, use_snapshot=False)
+    return repository
+
+
+@pytest.fixture
+def database_repo():
+    repository = DatabaseRepository('sqlite://')
+    populate_database(DATA_PATH, repository)
+    # As create_app does once the catalogue is loaded.
+    repository.refresh_collaborations()
+    return repository
+
+
+@pytest.fixture
+def client():
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': DATA_PATH,
+        'WTF_CSRF_ENABLED': False,
+        'SIMILAR_MOVIES_AT_STARTUP': False,
+        'REVIEW_WORKERS': 0,
+    })
+    return app.test_client()
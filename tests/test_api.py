@@ -0,0 +1,100 @@
+import gzip
+import threading
+
+from flask import json
+
+import movie.adapters.repository as repo
+from movie.domain.model import Review
+from tests.test_database_repository import new_movie
+
+
+def test_movie(client):
+    response = client.get('/api/v1/movies/1')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert json.loads(response.data)['title'] == repo.repo_instance.get_movie(1).title
+    assert client.get('/api/v1/movies/5000').status_code == 404
+
+
+def test_if_none_match_returns_304_while_nothing_changed(client):
+    response = client.get('/api/v1/movies/1')
+    etag = response.headers['ETag']
+    repeated = client.get('/api/v1/movies/1', headers={'If-None-Match': etag})
+    assert repeated.status_code == 304
+    assert repeated.data == b''
+    assert repeated.headers['ETag'] == etag
+    # The tag names the URL as well as the repository contents.
+    assert client.get('/api/v1/movies/2', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_etag_changes_when_a_review_is_added(client):
+    etag = client.get('/api/v1/movies/1/reviews').headers['ETag']
+    repo.repo_instance.add_review(Review(repo.repo_instance.get_movie(1), 'A review', 8))
+    response = client.get('/api/v1/movies/1/reviews', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert json.loads(response.data)['review_stats']['count'] == 1
+
+
+def test_etag_changes_when_a_movie_is_added(client):
+    etag = client.get('/api/v1/movies?limit=1').headers['ETag']
+    repo.repo_instance.add_movie(new_movie('An Added Movie'))
+    response = client.get('/api/v1/movies?limit=1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert json.loads(response.data)['total'] == 1001
+
+
+def test_large_responses_are_gzipped(client):
+    response = client.get('/api/v1/movies?limit=50', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'].endswith('-gzip"')
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert len(json.loads(gzip.decompress(response.data))['movies']) == 50
+    repeated = client.get('/api/v1/movies?limit=50', headers={'Accept-Encoding': 'gzip',
+                                                               'If-None-Match': response.headers['ETag']})
+    assert repeated.status_code == 304
+
+
+def test_small_or_unaccepted_responses_are_not_compressed(client):
+    small = client.get('/api/v1/movies/1/reviews', headers={'Accept-Encoding': 'gzip'})
+    assert len(small.data) < client.application.config['API_COMPRESSION_MIN_SIZE']
+    assert 'Content-Encoding' not in small.headers
+    # Uncompressed, the tag has no encoding suffix, and still revalidates for a client accepting gzip.
+    assert client.get('/api/v1/movies/1/reviews', headers={'Accept-Encoding': 'gzip',
+                                                           'If-None-Match': small.headers['ETag']}).status_code == 304
+    plain = client.get('/api/v1/movies?limit=50')
+    assert 'Content-Encoding' not in plain.headers
+    assert len(json.loads(plain.data)['movies']) == 50
+
+
+def test_search(client):
+    response = client.get('/api/v1/search?option=Actor&q=vin+diesel&limit=2')
+    payload = json.loads(response.data)
+    assert payload['total'] == len(repo.repo_instance.get_movies_by_actor('vin diesel'))
+    assert len(payload['movies']) == 2
+
+
+def test_similar_movies_are_not_cached_until_they_are_built(client):
+    repository = repo.repo_instance
+    release = threading.Event()
+    build = repository.refresh_similar_movies
+
+    def held_build():
+        release.wait(60)
+        build()
+
+    repository.refresh_similar_movies = held_build
+    pending = client.get('/api/v1/movies/1/similar?limit=5')
+    assert json.loads(pending.data)['movies'] == []
+    assert 'ETag' not in pending.headers
+    assert pending.headers['Cache-Control'] == 'no-store'
+
+    release.set()
+    repository._similar_build.join(60)
+    # The build leaves the version alone; with no tag to present, the client fetches the built list.
+    built = client.get('/api/v1/movies/1/similar?limit=5')
+    assert built.status_code == 200
+    assert len(json.loads(built.data)['movies']) == 5
+    assert built.headers['Cache-Control'] == 'no-cache'
+    revalidated = client.get('/api/v1/movies/1/similar?limit=5', headers={'If-None-Match': built.headers['ETag']})
+    assert revalidated.status_code == 304
@@ -0,0 +1,366 @@
+"""The database repository, on an in-memory SQLite database, against the memory repository loaded
+from the same CSV: every AbstractRepository method must give the same answers."""
+import sqlite3
+import threading
+
+import pytest
+
+from movie.adapters.fulltext import tokenize
+from movie.adapters.database_repository import DatabaseRepository
+from movie.adapters.repository import RepositoryException
+from movie.domain.model import Movie, Director, Actor, Genre, Review, User
+
+
+def summary(movies):
+    return [(movie.id, movie.title, movie.year, movie.description, movie.runtime_minutes, movie.rating, movie.votes,
+             movie.revenue_millions, movie.metascore,
+             movie.director.director_full_name if movie.director is not None else None,
+             [actor.actor_full_name for actor in movie.actors], [genre.genre_name for genre in movie.genres])
+            for movie in movies]
+
+
+def new_movie(title, year=2021, director='Ava Director', actors=('Chris Pratt', 'Nova Newcomer'),
+              genres=('Drama', 'Noir')):
+    movie = Movie(title, year)
+    movie.description = f"{title}, a test movie."
+    movie.runtime_minutes = 100
+    movie.rating = 7.5
+    movie.director = Director(director)
+    movie.actors.extend(Actor(name) for name in actors)
+    movie.genres.extend(Genre(name) for name in genres)
+    return movie
+
+
+@pytest.fixture
+def repos(memory_repo, database_repo):
+    return memory_repo, database_repo
+
+
+def test_catalogue(repos):
+    memory, database = repos
+    assert database.count_movies() == memory.count_movies() == 1000
+    assert summary(database.get_movies_page(0, 1000)) == summary(memory.get_movies_page(0, 1000))
+    assert summary(database.get_movies_page(995, 20)) == summary(memory.get_movies_page(995, 20))
+    assert summary([database.get_movie(137)]) == summary([memory.get_movie(137)])
+    assert database.get_movie(5000) is None and memory.get_movie(5000) is None
+
+
+def test_get_movie_by_name(repos):
+    memory, database = repos
+    assert summary([database.get_movie_by_name('Prometheus')]) == summary([memory.get_movie_by_name('Prometheus')])
+    assert database.get_movie_by_name('No Such Movie') is None and memory.get_movie_by_name('No Such Movie') is None
+
+
+def test_get_genres(repos):
+    memory, database = repos
+    assert {genre.genre_name for genre in database.get_genres()} == {genre.genre_name for genre in memory.get_genres()}
+
+
+@pytest.mark.parametrize('method, keyword', [
+    ('get_movies_by_actor', 'chris'), ('get_movies_by_actor', 'Vin Diesel'), ('get_movies_by_actor', 'zzz'),
+    ('get_movies_by_director', 'scott'), ('get_movies_by_director', 'Christopher Nolan'),
+    ('get_movies_by_genre', 'sci-fi'), ('get_movies_by_genre', 'Drama'),
+])
+def test_search(repos, method, keyword):
+    memory, database = repos
+    assert summary(getattr(database, method)(keyword)) == summary(getattr(memory, method)(keyword))
+
+
+@pytest.mark.parametrize('offset, limit, sort, descending, ranges', [
+    (0, 20, None, False, None),
+    (40, 20, 'rating', True, None),
+    (0, 50, 'revenue', False, None),
+    (0, 1000, 'metascore', True, {'year': (2010, 2012)}),
+    (10, 30, 'title', False, {'rating': (7.0, None), 'runtime': (None, 120)}),
+    (0, 20, 'year', False, {'votes': (100000, 500000), 'metascore': (60, 80)}),
+])
+def test_query_movies(repos, offset, limit, sort, descending, ranges):
+    memory, database = repos
+    memory_total, memory_movies = memory.query_movies(offset, limit, sort, descending, ranges)
+    database_total, database_movies = database.query_movies(offset, limit, sort, descending, ranges)
+    assert database_total == memory_total
+    assert summary(database_movies) == summary(memory_movies)
+
+
+@pytest.mark.parametrize('offset, limit, genres, actor, director, years', [
+    (0, 20, None, None, None, None),
+    (0, 20, ['Action', 'sci-fi'], None, None, None),
+    (5, 10, ['Drama'], 'chris', None, (2010, None)),
+    (0, 50, None, None, 'scott', (None, 2014)),
+    (0, 20, ['Western'], 'nobody at all', None, None),
+])
+def test_query_facets(repos, offset, limit, genres, actor, director, years):
+    memory, database = repos
+    expected = memory.query_facets(offset, limit, genres, actor, director, years)
+    found = database.query_facets(offset, limit, genres, actor, director, years)
+    assert found['total'] == expected['total']
+    assert summary(found['movies']) == summary(expected['movies'])
+    assert found['genres'] == expected['genres']
+    assert found['years'] == expected['years']
+
+
+@pytest.mark.parametrize('field, prefix', [
+    ('actor', 'ch'), ('actor', 'Pratt'), ('director', 'r'), ('genre', 'd'), ('title', 'the'), ('title', ''),
+])
+def test_get_suggestions(repos, field, prefix):
+    memory, database = repos
+    assert database.get_suggestions(field, prefix, 10) == memory.get_suggestions(field, prefix, 10)
+
+
+def test_similar_and_recommended_movies(repos):
+    memory, database = repos
+    memory.refresh_similar_movies()
+    database.refresh_similar_movies()
+    for movie_id in (1, 14, 500):
+        assert summary(database.get_similar_movies(database.get_movie(movie_id), 6)) == \
+            summary(memory.get_similar_movies(memory.get_movie(movie_id), 6))
+    watched = [1, 2, 3]
+    assert summary(database.get_recommended_movies([database.get_movie(i) for i in watched], 8)) == \
+        summary(memory.get_recommended_movies([memory.get_movie(i) for i in watched], 8))
+
+
+def test_similar_movies_take_in_added_movies(repos):
+    for repository in repos:
+        repository.refresh_similar_movies()
+        original = repository.get_movie(1)
+        remake = new_movie('Remake', director=original.director.director_full_name,
+                           actors=[actor.actor_full_name for actor in original.actors],
+                           genres=[genre.genre_name for genre in original.genres])
+        remake.description = original.description
+        repository.add_movie(remake)
+        assert repository.get_similar_movies(repository.get_movie(1), 1)[0].title == 'Remake'
+        assert repository.get_similar_movies(repository.get_movie(remake.id), 1)[0].id == 1
+    memory, database = repos
+    for movie_id in (1, 14, 1001):
+        assert summary(database.get_similar_movies(database.get_movie(movie_id), 6)) == \
+            summary(memory.get_similar_movies(memory.get_movie(movie_id), 6))
+
+
+def test_actor_collaborations(repos):
+    memory, database = repos
+    for actor, other in [('Chris Pratt', 'Vin Diesel'), ('chris pratt', 'meryl streep'), ('Chris Pratt', 'Nobody')]:
+        assert database.actors_worked_together(actor, other) == memory.actors_worked_together(actor, other)
+        expected, found = memory.get_actor_path(actor, other), database.get_actor_path(actor, other)
+        if expected is None:
+            assert found is None
+        else:
+            assert found[0] == expected[0]
+            assert summary(found[1]) == summary(expected[1])
+
+
+def test_add_movie(repos):
+    memory, database = repos
+    for repository in repos:
+        repository.add_movie(new_movie('Test Movie One'))
+        repository.add_movies([new_movie('Test Movie Two'), new_movie('Test Movie Three', director='Bo Other')])
+    assert database.count_movies() == memory.count_movies() == 1003
+    assert summary(database.get_movies_page(999, 10)) == summary(memory.get_movies_page(999, 10))
+    assert [movie.id for movie in database.get_movies_page(1000, 3)] == [1001, 1002, 1003]
+    assert summary(database.get_movies_by_actor('newcomer')) == summary(memory.get_movies_by_actor('newcomer'))
+    assert summary(database.get_movies_by_genre('noir')) == summary(memory.get_movies_by_genre('noir'))
+    assert database.get_suggestions('director', 'bo', 5) == memory.get_suggestions('director', 'bo', 5)
+    assert database.actors_worked_together('Chris Pratt', 'Nova Newcomer')
+    assert memory.actors_worked_together('Chris Pratt', 'Nova Newcomer')
+
+
+@pytest.mark.parametrize('repository_fixture', ['memory_repo', 'database_repo'])
+def test_add_movies_with_a_duplicate_id_adds_nothing(request, repository_fixture):
+    repository = request.getfixturevalue(repository_fixture)
+    duplicate = new_movie('Duplicate')
+    duplicate.id = 7
+    version = repository.get_version()
+    with pytest.raises(RepositoryException):
+        repository.add_movies([new_movie('Fresh'), duplicate])
+    assert repository.count_movies() == 1000
+    assert repository.get_version() == version
+    assert repository.get_movie_by_name('Fresh') is None
+    assert repository.get_movie(7).title != 'Duplicate'
+
+
+def test_add_entities(repos):
+    memory, database = repos
+    for repository in repos:
+        repository.add_actor(Actor('Solo Actor'))
+        repository.add_director(Director('Solo Director'))
+        repository.add_genre(Genre('Noir'))
+        repository.add_genre(Genre('Noir'))
+    assert {genre.genre_name for genre in database.get_genres()} == {genre.genre_name for genre in memory.get_genres()}
+    assert 'Noir' in {genre.genre_name for genre in database.get_genres()}
+
+
+def test_reviews(repos):
+    memory, database = repos
+    for repository in repos:
+        movie = repository.get_movie(3)
+        repository.add_review(Review(movie, 'Loved it.', 9))
+        repository.add_review(Review(movie, 'Not for me.', 4))
+        repository.add_review(Review(movie.title, 'By title.', 8))
+        repository.add_review(Review('Unlisted Movie', 'A movie not in the catalogue.', 6))
+    for movie_key in (3, 'Split', 'Unlisted Movie', 9):
+        reviews, stats = [], []
+        for repository in repos:
+            movie = repository.get_movie(movie_key) if isinstance(movie_key, int) else movie_key
+            reviews.append([(review.review_text, review.rating) for review in repository.get_reviews_by_movie(movie)])
+            stats.append(repository.get_review_stats(movie))
+        assert reviews[0] == reviews[1]
+        assert stats[0] == stats[1]
+    assert database.get_review_stats(database.get_movie(3)) == {'count': 3, 'sum': 21, 'mean': 7.0}
+    assert database.get_review_stats(database.get_movie(9)) == {'count': 0, 'sum': 0, 'mean': None}
+
+
+def test_get_version(repos):
+    for repository in repos:
+        version = repository.get_version()
+        repository.get_movies_page(0, 10)
+        repository.get_review_stats(repository.get_movie(1))
+        assert repository.get_version() == version
+        repository.add_review(Review(repository.get_movie(1), 'Changes the version.', 7))
+        after_review = repository.get_version()
+        assert after_review != version
+        repository.add_movie(new_movie('Versioned'))
+        assert repository.get_version() not in (version, after_review)
+
+
+def test_version_of_a_database_created_without_it(tmp_path, database_repo):
+    uri = f"sqlite:///{tmp_path / 'movies.db'}"
+    repository = DatabaseRepository(uri)
+    repository.add_movies(database_repo.get_movies_page(0, 10))
+    repository.add_review(Review(repository.get_movie(1), 'Before the version row.', 7))
+    with repository._pool.connection() as conn:
+        conn.cursor().execute("DROP TABLE repository_version")
+    reopened = DatabaseRepository(uri)
+    assert reopened.get_version() == 11
+    reopened.add_review(Review(reopened.get_movie(2), 'After it.', 6))
+    assert reopened.get_version() == 12
+    assert DatabaseRepository(uri).get_version() == 12
+
+
+def test_text_search_of_a_database_created_without_its_index(tmp_path, database_repo):
+    uri = f"sqlite:///{tmp_path / 'movies.db'}"
+    repository = DatabaseRepository(uri)
+    repository.add_movies(database_repo.get_movies_page(0, 50))
+    with repository._pool.connection() as conn:
+        conn.execute("DROP TRIGGER movies_fts_insert")
+        conn.execute("DROP TABLE movies_fts")
+    reopened = DatabaseRepository(uri)
+    assert [movie.id for movie in reopened.get_movies_by_text('guardians galaxy')] == [1]
+    reopened.add_movie(new_movie('Galaxy Test'))
+    assert [movie.title for movie in reopened.get_movies_by_text('galaxy')] == ['Guardians of the Galaxy', 'Galaxy Test']
+
+
+def test_workers_adding_movies_at_once_get_distinct_ids(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'movies.db'}"
+    workers = [DatabaseRepository(uri) for _ in range(4)]
+
+    def add(worker, number):
+        for index in range(10):
+            worker.add_movies([new_movie(f"Worker {number} Movie {index}", actors=(f"Actor {index}",))])
+
+    threads = [threading.Thread(target=add, args=(worker, number)) for number, worker in enumerate(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    movies = workers[0].get_movies_page(0, 100)
+    assert len(movies) == 40
+    assert sorted(movie.id for movie in movies) == list(range(1, 41))
+    assert sorted(movie.title for movie in workers[0].get_movies_by_actor('actor 3')) == \
+        sorted(f"Worker {number} Movie 3" for number in range(4))
+
+
+def test_pool_discards_a_lost_connection(database_repo):
+    pool = database_repo._pool
+    with pool.connection() as conn:
+        lent = conn
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as conn:
+            assert conn is lent
+            raise sqlite3.OperationalError('disk I/O error')
+    with pool.connection() as conn:
+        assert conn is not lent
+        assert conn.execute("SELECT COUNT(*) FROM movies").fetchone()[0] == 1000
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            kept = conn
+            raise ValueError('not a connection error')
+    with pool.connection() as conn:
+        assert conn is kept
+
+
+def test_users(repos):
+    for repository in repos:
+        repository.add_user(User('Alice', 'hash one'))
+        user = repository.get_user('  ALICE ')
+        assert (user.user_name, user.password) == ('alice', 'hash one')
+        assert repository.get_user('bob') is None
+        assert repository.get_user(None) is None
+        with pytest.raises(RepositoryException):
+            repository.add_user(User('alice', 'hash two'))
+        assert repository.get_user('alice').password == 'hash one'
+
+
+@pytest.mark.parametrize('query', ['space war', 'love', 'the dark kni', 'lov* story', 'alien planet earth', 'xyzzy', ''])
+def test_get_movies_by_text_matches_any_word(repos, query):
+    # The ranking differs, BM25 in memory and matched word counts in the database, but not the matches.
+    memory, database = repos
+    expected = {movie.id for movie in memory.get_movies_by_text(query)}
+    found = database.get_movies_by_text(query)
+    assert {movie.id for movie in found} == expected
+    assert len(found) == len(expected)
+
+
+def test_get_movies_by_text_ranks_more_matched_words_first(database_repo):
+    movies = database_repo.get_movies_by_text('space earth')
+    assert len(movies) > 2
+    matched = []
+    for movie in movies:
+        words = set(tokenize(f"{movie.title} {movie.description}"))
+        # The last query word also matches the words it is a prefix of, such as 'earthbound'.
+        matched.append(('space' in words) + any(word.startswith('earth') for word in words))
+    assert matched[0] == 2
+    assert matched == sorted(matched, reverse=True)
+
+
+def test_broad_text_search_reads_movies_in_chunks(repos, monkeypatch):
+    memory, database = repos
+    monkeypatch.setattr('movie.adapters.database_repository.IN_CHUNK_SIZE', 7)
+    expected = {movie.id for movie in memory.get_movies_by_text('life world man love war')}
+    found = database.get_movies_by_text('life world man love war')
+    assert len(found) > 7
+    assert {movie.id for movie in found} == expected
+    movie_ids = [movie.id for movie in found]
+    assert [movie.id for movie in database._movies_by_ids(movie_ids)] == movie_ids
+
+
+def test_watched_movies(repos):
+    for repository in repos:
+        repository.add_user(User('Viewer', 'Password1'))
+        for movie_id in (1, 2, 1, 3):
+            repository.watch_movie(' viewer', repository.get_movie(movie_id))
+        repository.watch_movie('nobody', repository.get_movie(4))
+        # Watching again keeps the first time.
+        assert [movie.id for movie in repository.get_watched_movies('Viewer', 2)] == [3, 2]
+        assert [movie.id for movie in repository.get_watched_movies('viewer', 10)] == [3, 2, 1]
+        assert repository.get_watched_movies('nobody', 10) == []
+
+
+def test_similar_movies_are_built_in_the_background(repos):
+    for repository in repos:
+        movie = repository.get_movie(1)
+        release = threading.Event()
+        build = repository.refresh_similar_movies
+
+        def held_build():
+            release.wait(60)
+            build()
+
+        repository.refresh_similar_movies = held_build
+        # Nothing waits for the table; until it is built there are no similar movies.
+        assert not repository.similar_movies_ready()
+        assert repository.get_similar_movies(movie, 5) == []
+        assert repository.get_recommended_movies([movie], 5) == []
+        release.set()
+        repository._similar_build.join(60)
+        assert repository.similar_movies_ready()
+        assert len(repository.get_similar_movies(movie, 5)) == 5
+        assert len(repository.get_recommended_movies([movie], 5)) == 5
@@ -0,0 +1,114 @@
+import random
+import threading
+
+import pytest
+
+import movie.adapters.repository as repo
+from movie.adapters import database_repository, graph
+from movie.adapters.database_repository import DatabaseRepository
+from movie.adapters.graph import CollaborationGraph
+from movie.adapters.memory_repository import MemoryRepository
+from movie.domain.model import Actor
+from tests.test_database_repository import new_movie
+
+
+def random_casts(movies, actors, seed=0):
+    rng = random.Random(seed)
+    return [(movie_id, [f"Actor {rng.randrange(actors)}" for _ in range(5)]) for movie_id in range(1, movies + 1)]
+
+
+def test_added_casts_match_a_graph_built_at_once(monkeypatch):
+    # A small threshold, so that the additions are merged in the background several times over.
+    monkeypatch.setattr(graph, 'MERGE_MIN_EDGES', 500)
+    casts = random_casts(4000, 1500)
+    built = CollaborationGraph()
+    built.build(casts)
+    added = CollaborationGraph()
+    failures = []
+    done = threading.Event()
+
+    def query():
+        rng = random.Random(1)
+        while not done.is_set():
+            try:
+                added.shortest_path(f"Actor {rng.randrange(1500)}", f"Actor {rng.randrange(1500)}")
+            except Exception as error:
+                failures.append(error)
+
+    reader = threading.Thread(target=query)
+    reader.start()
+    for movie_id, cast in casts:
+        added.add(movie_id, cast)
+    done.set()
+    reader.join()
+    assert failures == []
+
+    rng = random.Random(2)
+    pairs = [(f"Actor {rng.randrange(1500)}", f"Actor {rng.randrange(1500)}") for _ in range(500)]
+    # Answered from the rows and the buffer alike, then from the rows alone.
+    for _ in range(2):
+        for actor, other in pairs:
+            assert added._shared_movie(actor, other) == built._shared_movie(actor, other)
+            assert sorted(added.colleagues(actor)) == sorted(built.colleagues(actor))
+            assert added.shortest_path(actor, other) == built.shortest_path(actor, other)
+        added.merge()
+        assert added.pending_count == 0
+    assert added.edge_count == built.edge_count
+
+
+def test_queries_never_rebuild_the_graph(memory_repo, monkeypatch):
+    memory_repo.refresh_collaborations()
+
+    def rebuild(*args):
+        raise AssertionError('rebuilt the collaboration graph')
+    monkeypatch.setattr(CollaborationGraph, '_compact', staticmethod(rebuild))
+    assert memory_repo.actors_worked_together('Chris Pratt', 'Vin Diesel')
+    memory_repo.add_movie(new_movie('Newcomer Movie'))
+    assert memory_repo.actors_worked_together('Chris Pratt', 'Nova Newcomer')
+    names, movies = memory_repo.get_actor_path('Nova Newcomer', 'Vin Diesel')
+    assert names == ['Nova Newcomer', 'Chris Pratt', 'Vin Diesel']
+    assert len(movies) == 2
+
+
+def test_a_repository_filled_by_hand_builds_its_graph_in_the_background():
+    repository = MemoryRepository()
+    repository.add_movies([new_movie('First Movie'), new_movie('Second Movie', actors=('Nova Newcomer', 'Bo Other'))])
+    repository.actors_worked_together('Chris Pratt', 'Nova Newcomer')
+    repository._collaborations_build.join(60)
+    assert repository.actors_worked_together('Chris Pratt', 'Nova Newcomer')
+    assert repository.get_actor_path('Chris Pratt', 'Bo Other')[0] == ['Chris Pratt', 'Nova Newcomer', 'Bo Other']
+
+
+def test_a_database_worker_adds_the_casts_another_stored(tmp_path, monkeypatch):
+    uri = f"sqlite:///{tmp_path / 'movies.db'}"
+    worker, other = DatabaseRepository(uri), DatabaseRepository(uri)
+    other.add_movie(new_movie('First Movie', actors=('Chris Pratt', 'Vin Diesel')))
+    worker.refresh_collaborations()
+    statements = []
+    execute = worker._execute
+
+    def recorded(cursor, sql, params=()):
+        statements.append(sql)
+        return execute(cursor, sql, params)
+    monkeypatch.setattr(worker, '_execute', recorded)
+    monkeypatch.setattr(CollaborationGraph, 'build', lambda *args: pytest.fail('rebuilt the collaboration graph'))
+    assert worker.actors_worked_together('Chris Pratt', 'Vin Diesel')
+    assert not any('COUNT' in sql for sql in statements)
+
+    other.add_movie(new_movie('Second Movie', actors=('Vin Diesel', 'Nova Newcomer')))
+    # Seen once the catalogue size is next read.
+    monkeypatch.setattr(database_repository, 'CATALOGUE_CHECK_SECONDS', 0)
+    names, movies = worker.get_actor_path('Chris Pratt', 'Nova Newcomer')
+    assert names == ['Chris Pratt', 'Vin Diesel', 'Nova Newcomer']
+    assert [movie.title for movie in movies] == ['First Movie', 'Second Movie']
+    assert not any('COUNT' in sql for sql in statements)
+
+
+def test_actors_answer_colleague_checks_from_the_graph(client):
+    actors = list(repo.repo_instance.get_movie(1).actors)
+    assert all(actor._colleagues is None for actor in actors)
+    assert actors[0].check_if_this_actor_worked_with(actors[1])
+    assert not actors[0].check_if_this_actor_worked_with(Actor('Nobody At All'))
+    stranger = Actor('Nobody At All')
+    stranger.add_actor_colleague(actors[0])
+    assert stranger.check_if_this_actor_worked_with(actors[0])
@@ -0,0 +1,67 @@
+import csv
+import os
+
+import pytest
+
+from movie.adapters.database_repository import DatabaseRepository
+from movie.adapters.ingest import ingest
+from movie.adapters.memory_repository import MemoryRepository
+from movie.adapters.repository import RepositoryException
+
+from tests.conftest import DATA_PATH
+
+
+@pytest.fixture
+def catalogue_rows():
+    with open(os.path.join(DATA_PATH, 'Data1000Movies.csv'), encoding='utf-8-sig', newline='') as infile:
+        return list(csv.reader(infile))
+
+
+def write_rows(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as outfile:
+        csv.writer(outfile).writerows(rows)
+    return str(path)
+
+
+@pytest.fixture(params=['memory', 'database'])
+def repository(request):
+    return MemoryRepository() if request.param == 'memory' else DatabaseRepository('sqlite://')
+
+
+def test_malformed_rows_are_skipped_and_counted(repository, catalogue_rows, tmp_path):
+    rows = catalogue_rows[:101]
+    rows[10] = rows[10][:4]
+    rows[20][rows[0].index('Year')] = 'unknown'
+    rows[30][rows[0].index('Title')] = ' '
+    report = ingest(write_rows(tmp_path / 'movies.csv', rows), repository, chunk_size=25)
+    assert (report.files, report.rows, report.malformed, report.loaded) == (1, 100, 3, 97)
+    assert repository.count_movies() == 97
+
+
+def test_repeated_rank_skips_only_that_row(repository, catalogue_rows, tmp_path):
+    rows = catalogue_rows[:101]
+    rows[50][0] = '3'
+    report = ingest(write_rows(tmp_path / 'movies.csv', rows), repository, chunk_size=40)
+    assert (report.malformed, report.loaded) == (1, 99)
+    assert repository.count_movies() == 99
+    assert repository.get_movie(3).title == catalogue_rows[3][1]
+
+
+def test_ranks_already_stored_are_skipped(repository, catalogue_rows, tmp_path):
+    ingest(write_rows(tmp_path / 'first.csv', catalogue_rows[:51]), repository)
+    report = ingest(write_rows(tmp_path / 'second.csv', [catalogue_rows[0]] + catalogue_rows[41:81]), repository,
+                    chunk_size=15)
+    assert (report.malformed, report.loaded) == (10, 30)
+    assert [movie.id for movie in repository.get_movies_page(0, 100)] == list(range(1, 81))
+
+
+def test_several_files_are_numbered_in_order(repository, catalogue_rows, tmp_path):
+    write_rows(tmp_path / 'a.csv', catalogue_rows[:11])
+    write_rows(tmp_path / 'b.csv', [catalogue_rows[0]] + catalogue_rows[1:6])
+    report = ingest(str(tmp_path), repository)
+    assert (report.files, report.rows, report.malformed, report.loaded) == (2, 15, 0, 15)
+    assert [movie.id for movie in repository.get_movies_page(0, 20)] == list(range(1, 16))
+
+
+def test_repository_exception_keeps_its_message():
+    assert str(RepositoryException('Duplicate movie id 3')) == 'Duplicate movie id 3'
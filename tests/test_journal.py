@@ -0,0 +1,126 @@
+import os
+import shutil
+
+from movie.adapters.journal import Journal
+from movie.adapters.memory_repository import MemoryRepository, populate
+from movie.domain.model import Review, User
+from tests.conftest import DATA_PATH
+
+
+def records(count, start=0):
+    return [{'user': f'user{number}', 'password': f'Password{number}'} for number in range(start, start + count)]
+
+
+def reopen(filename):
+    journal = Journal(filename)
+    return journal, list(journal.replay())
+
+
+def write(journal, new_records):
+    for record in new_records:
+        journal.sync(journal.append(record))
+
+
+def test_records_are_replayed_in_order(tmp_path):
+    filename = str(tmp_path / 'users.journal')
+    journal, replayed = reopen(filename)
+    assert replayed == []
+    write(journal, records(3))
+    journal.close()
+
+    journal, replayed = reopen(filename)
+    assert replayed == records(3)
+    assert journal.records_since_compaction == 3
+    # Reopened for appending after the replayed records.
+    write(journal, records(2, 3))
+    journal.close()
+    assert reopen(filename)[1] == records(5)
+
+
+def test_a_torn_last_line_is_truncated(tmp_path):
+    filename = str(tmp_path / 'users.journal')
+    journal, _ = reopen(filename)
+    write(journal, records(2))
+    journal.close()
+    with open(filename, 'ab') as outfile:
+        outfile.write(b'{"user":"torn","passw')
+    length = os.path.getsize(filename)
+
+    journal, replayed = reopen(filename)
+    assert replayed == records(2)
+    assert os.path.getsize(filename) < length
+    write(journal, records(1, 2))
+    journal.close()
+    assert reopen(filename)[1] == records(3)
+
+
+def test_one_fsync_covers_every_record_written_before_it(tmp_path, monkeypatch):
+    journal, _ = reopen(str(tmp_path / 'users.journal'))
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, 'fsync', lambda fileno: fsyncs.append(fileno) or real_fsync(fileno))
+    sequences = [journal.append(record) for record in records(3)]
+    journal.sync(sequences[-1])
+    for sequence in sequences:
+        journal.sync(sequence)
+    assert len(fsyncs) == 1
+    journal.sync(journal.append(records(1, 3)[0]))
+    assert len(fsyncs) == 2
+    journal.close()
+
+
+def test_compaction_moves_the_records_into_the_snapshot(tmp_path):
+    filename = str(tmp_path / 'users.journal')
+    journal, _ = reopen(filename)
+    write(journal, records(3))
+    journal.compact(records(3))
+    assert os.path.exists(filename + '.snapshot')
+    assert journal.records_since_compaction == 0
+    write(journal, records(1, 3))
+    journal.close()
+    with open(filename, 'rb') as infile:
+        # The generation header and the one record written since.
+        assert len(infile.readlines()) == 2
+
+    journal, replayed = reopen(filename)
+    assert replayed == records(4)
+    assert journal.records_since_compaction == 1
+    journal.close()
+
+
+def test_a_journal_left_by_a_crash_during_compaction_is_not_replayed_twice(tmp_path):
+    filename = str(tmp_path / 'users.journal')
+    journal, _ = reopen(filename)
+    write(journal, records(3))
+    # The crash: the snapshot was written, but the old journal was never replaced.
+    shutil.copy(filename, str(tmp_path / 'old.journal'))
+    journal.compact(records(3))
+    journal.close()
+    shutil.copy(str(tmp_path / 'old.journal'), filename)
+
+    journal, replayed = reopen(filename)
+    assert replayed == records(3)
+    write(journal, records(1, 3))
+    journal.close()
+    assert reopen(filename)[1] == records(4)
+
+
+def test_repository_restores_users_and_reviews(tmp_path):
+    filename = str(tmp_path / 'repository.journal')
+    repository = MemoryRepository()
+    populate(DATA_PATH, repository, use_snapshot=False)
+    assert repository.open_journal(filename, compact_every=3) == 0
+    movie = repository.get_movie(1)
+    repository.add_user(User('Journaled', 'Password1'))
+    for rating in (4, 6, 8):
+        repository.add_review(Review(movie, 'Journaled review', rating))
+    # The fourth record reached compact_every.
+    assert os.path.exists(filename + '.snapshot')
+    repository.add_review(Review(movie, 'After compaction', 10))
+
+    restored = MemoryRepository()
+    populate(DATA_PATH, restored, use_snapshot=False)
+    assert restored.open_journal(filename) == 5
+    assert restored.get_user('journaled').password == 'Password1'
+    assert [review.rating for review in restored.get_reviews_by_movie(restored.get_movie(1))] == [4, 6, 8, 10]
+    assert restored.get_review_stats(restored.get_movie(1))['count'] == 4
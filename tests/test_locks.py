@@ -0,0 +1,148 @@
+"""ReadWriteLock and the memory repository under several threads: the guarantees benchmarks/stress_threads.py
+exercises at scale, checked in a few seconds."""
+import random
+import threading
+from collections import Counter
+
+from movie.domain.model import Review
+from movie.utilities.locks import ReadWriteLock
+from tests.test_database_repository import new_movie
+
+TIMEOUT = 5
+
+
+def start(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_readers_hold_the_lock_together():
+    lock = ReadWriteLock()
+    readers = 4
+    # Every reader waits inside the lock for all of them; a lock admitting one at a time would time out.
+    inside = threading.Barrier(readers, timeout=TIMEOUT)
+    passed = []
+
+    def read():
+        with lock.read():
+            inside.wait()
+            passed.append(True)
+
+    for thread in [start(read) for _ in range(readers)]:
+        thread.join(TIMEOUT)
+    assert len(passed) == readers
+
+
+def test_a_writer_excludes_readers_and_other_writers():
+    lock = ReadWriteLock()
+    entered = {'read': threading.Event(), 'write': threading.Event()}
+
+    def read():
+        with lock.read():
+            entered['read'].set()
+
+    def write():
+        with lock.write():
+            entered['write'].set()
+
+    with lock.write():
+        threads = [start(read), start(write)]
+        assert not entered['read'].wait(0.2)
+        assert not entered['write'].is_set()
+    for thread in threads:
+        thread.join(TIMEOUT)
+    assert entered['read'].is_set() and entered['write'].is_set()
+
+
+def test_a_waiting_writer_holds_back_new_readers():
+    lock = ReadWriteLock()
+    order = []
+    release_reader = threading.Event()
+
+    def first_reader():
+        with lock.read():
+            order.append('first reader')
+            release_reader.wait(TIMEOUT)
+
+    def writer():
+        with lock.write():
+            order.append('writer')
+
+    def late_reader():
+        with lock.read():
+            order.append('late reader')
+
+    threads = [start(first_reader)]
+    while not order:
+        pass
+    threads.append(start(writer))
+    # Wait for the writer to be queued behind the first reader before the late reader arrives.
+    while not lock._writers_waiting:
+        pass
+    threads.append(start(late_reader))
+    assert 'late reader' not in order
+    release_reader.set()
+    for thread in threads:
+        thread.join(TIMEOUT)
+    assert order == ['first reader', 'writer', 'late reader']
+
+
+def test_review_counts_stay_consistent_while_movies_are_added(memory_repo):
+    movies = memory_repo.get_movies_page(0, 50)
+    posters, reviews_each = 4, 200
+    posted = Counter()
+    posted_lock = threading.Lock()
+    errors = []
+    done = threading.Event()
+
+    def post(seed):
+        rng = random.Random(seed)
+        mine = Counter()
+        try:
+            for _ in range(reviews_each):
+                movie = rng.choice(movies)
+                memory_repo.add_review(Review(movie, 'Threaded review', rng.randint(1, 10)))
+                mine[movie.id] += 1
+        except Exception as error:
+            errors.append(error)
+        with posted_lock:
+            posted.update(mine)
+
+    def add_movies():
+        try:
+            for number in range(100):
+                memory_repo.add_movie(new_movie(f'Threaded Movie {number}', actors=(f'Threaded Actor {number}',)))
+        except Exception as error:
+            errors.append(error)
+
+    def read():
+        # Every movie a search finds must be complete in every other index.
+        try:
+            while not done.is_set():
+                for movie in memory_repo.get_movies_by_actor('threaded actor'):
+                    assert memory_repo.get_movie(movie.id) is movie
+                    assert movie in memory_repo.get_movies_by_director('ava director')
+                for movie in movies[:5]:
+                    # Reviews are only ever added, so the count read first cannot exceed the reviews read after.
+                    stats = memory_repo.get_review_stats(movie)
+                    assert stats['count'] <= len(memory_repo.get_reviews_by_movie(movie))
+                    assert stats['mean'] is None or 1 <= stats['mean'] <= 10
+        except Exception as error:
+            errors.append(error)
+
+    readers = [start(read) for _ in range(2)]
+    writers = [start(post, seed) for seed in range(posters)] + [start(add_movies)]
+    for thread in writers:
+        thread.join(TIMEOUT * 4)
+    done.set()
+    for thread in readers:
+        thread.join(TIMEOUT)
+
+    assert not errors
+    assert memory_repo.count_movies() == 1100
+    assert len(memory_repo.get_movies_by_actor('threaded actor')) == 100
+    assert sum(posted.values()) == posters * reviews_each
+    for movie in movies:
+        stats = memory_repo.get_review_stats(movie)
+        assert stats['count'] == posted[movie.id] == len(memory_repo.get_reviews_by_movie(movie))
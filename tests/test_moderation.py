@@ -0,0 +1,123 @@
+import atexit
+import random
+import threading
+
+import pytest
+from better_profanity import profanity
+from better_profanity.utils import get_complete_path_of_file, read_wordlist
+
+import movie.adapters.repository as repo
+import movie.movies.services as services
+from movie import create_app
+from movie.movies.moderation import FAILED, PUBLISHED, REJECTED, ProfanityMatcher, ReviewQueue
+from tests.conftest import DATA_PATH
+
+WORDS = sorted(read_wordlist(get_complete_path_of_file('profanity_wordlist.txt')))
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    profanity.load_censor_words()
+    return ProfanityMatcher()
+
+
+def variants_of(word):
+    # Alone, capitalised, in a sentence, at either end of one, and for phrases, written without spaces.
+    return [word, word.upper(), word.title(), f"what a {word} movie", f"{word}!", f"x{word}", word.replace(' ', '')]
+
+
+@pytest.mark.parametrize('texts', [
+    [variant for word in WORDS for variant in variants_of(word)],
+    # The look-alike spellings better_profanity generates from its words, such as 'sh1t' and 'a$$'.
+    random.Random(0).sample(sorted(profanity.CENSOR_WORDSET), 3000),
+    ['a perfectly fine movie', 'assassin', 'scunthorpe', 'class act', 'hit the shelf', 'cocktail', '', 'Therapist'],
+])
+def test_screen_agrees_with_better_profanity(matcher, texts):
+    expected = [profanity.contains_profanity(text) for text in texts]
+    assert matcher.screen(texts) == expected
+    assert [matcher.contains_profanity(text) for text in texts] == expected
+
+
+def test_phrases_written_without_spaces(matcher):
+    assert matcher.screen(['2girls1cup', '2 girls 1 cup', '2-girls 1 cup']) == [False, True, True]
+
+
+def test_no_match_spans_two_texts_of_a_batch(matcher):
+    assert matcher.screen(['a fine movie about a bull', 'shit', None, 'blue', 'waffle']) == \
+        [False, True, False, False, False]
+
+
+class RecordingMatcher(ProfanityMatcher):
+
+    def __init__(self):
+        super().__init__(['badword'])
+        self.batches = []
+
+    def screen(self, texts):
+        self.batches.append(list(texts))
+        return super().screen(texts)
+
+
+def published_to(published):
+    def publish(movie, text, repo):
+        if text == 'explodes':
+            raise RuntimeError(text)
+        published.append((movie, text))
+    return publish
+
+
+def test_without_workers_reviews_are_screened_during_submit():
+    published = []
+    review_queue = ReviewQueue(None, published_to(published), RecordingMatcher(), workers=0)
+    assert review_queue.status(review_queue.submit('movie', 'lovely')) == PUBLISHED
+    assert review_queue.status(review_queue.submit('movie', 'a badword here')) == REJECTED
+    assert review_queue.status(review_queue.submit('movie', 'explodes')) == FAILED
+    assert review_queue.status('unknown') is None
+    assert published == [('movie', 'lovely')]
+    assert not review_queue._threads
+
+
+def test_workers_screen_submissions_in_batches():
+    published = []
+    matcher = RecordingMatcher()
+    review_queue = ReviewQueue(None, published_to(published), matcher, workers=1, batch_size=4, batch_wait=1.0)
+    texts = ['one', 'two badword', 'three', 'four', 'five']
+    tickets = [review_queue.submit('movie', text) for text in texts]
+    review_queue.join()
+    # Four gathered within batch_wait, then the one left over once it ran out.
+    assert matcher.batches == [texts[:4], texts[4:]]
+    assert [review_queue.status(ticket) for ticket in tickets] == [PUBLISHED, REJECTED, PUBLISHED, PUBLISHED, PUBLISHED]
+    assert [text for _, text in published] == ['one', 'three', 'four', 'five']
+    review_queue.close()
+
+
+def test_close_screens_what_is_queued_then_stops_the_workers():
+    published = []
+    release = threading.Event()
+
+    def publish(movie, text, repo):
+        release.wait(5)
+        published.append(text)
+
+    review_queue = ReviewQueue(None, publish, RecordingMatcher(), workers=2, batch_size=1, batch_wait=0)
+    tickets = [review_queue.submit('movie', f'review {number}') for number in range(6)]
+    threads = list(review_queue._threads)
+    release.set()
+    review_queue.close()
+    assert not any(thread.is_alive() for thread in threads)
+    assert sorted(published) == [f'review {number}' for number in range(6)]
+    assert all(review_queue.status(ticket) == PUBLISHED for ticket in tickets)
+
+
+def test_each_app_leaves_one_exit_handler(monkeypatch):
+    handlers = []
+    monkeypatch.setattr(atexit, 'register', handlers.append)
+    # Like atexit.unregister, ignores handlers that were registered before the test.
+    monkeypatch.setattr(atexit, 'unregister', lambda handler: handler in handlers and handlers.remove(handler))
+    config = {'TESTING': True, 'TEST_DATA_PATH': DATA_PATH, 'SIMILAR_MOVIES_AT_STARTUP': False}
+    create_app(config)
+    first_queue = services.review_queue
+    first_queue.submit(repo.repo_instance.get_movie(1), 'Started the workers')
+    create_app(config)
+    assert handlers == [services.review_queue.close]
+    assert not first_queue._threads
@@ -0,0 +1,13 @@
+def test_keyword_search_shows_no_catalogue_facet_counts(client):
+    response = client.post('/search/', data={'option': 'Actor', 'keyword': 'Vin Diesel'})
+    assert response.status_code == 200
+    assert b'Genres: ' not in response.data
+    assert b'Years: ' not in response.data
+    assert b'movies</p>' in response.data
+
+
+def test_facet_search_shows_facet_counts(client):
+    response = client.get('/search/?genre=Sci-Fi')
+    assert response.status_code == 200
+    assert b'Genres: ' in response.data
+    assert b'Years: ' in response.data
@@ -0,0 +1,47 @@
+from movie.domain.model import Director, Movie, User
+from movie.movies import services
+
+
+def test_movie_to_dict_does_not_share_unstored_movies():
+    first, second = Movie('First Unstored', 2020), Movie('Second Unstored', 2021)
+    first.director, second.director = Director('First Director'), Director('Second Director')
+    assert first.id is None and second.id is None
+    assert services.movie_to_dict(first)['title'] == 'First Unstored'
+    assert services.movie_to_dict(second)['title'] == 'Second Unstored'
+
+
+def test_movie_to_dict_follows_the_version(memory_repo):
+    movie = memory_repo.get_movie(1)
+    assert services.movie_to_dict(movie)['rating'] == movie.rating
+    movie.rating = 1.5
+    assert services.movie_to_dict(movie)['rating'] == 1.5
+
+
+def test_recommendations_follow_the_viewing_history_of_either_repository(memory_repo, database_repo):
+    recommended = []
+    for repository in (memory_repo, database_repo):
+        repository.refresh_similar_movies()
+        repository.add_user(User('Viewer', 'Password1'))
+        assert services.get_recommended_movies('viewer', 5, repository) == []
+        for movie_id in (1, 14):
+            services.watch_movie('viewer', repository.get_movie(movie_id), repository)
+        movies = services.get_recommended_movies('viewer', 5, repository)
+        assert len(movies) == 5 and not {1, 14} & {movie.id for movie in movies}
+        recommended.append([movie.id for movie in movies])
+    assert recommended[0] == recommended[1]
+
+
+def test_cached_searches_do_not_query_the_database(database_repo, monkeypatch):
+    movie_ids = services.search_movie_ids('Director', 'Ridley Scott', database_repo)
+    assert movie_ids
+
+    def no_queries(*args):
+        raise AssertionError('queried the database')
+    monkeypatch.setattr(database_repo, '_execute', no_queries)
+    assert services.search_movie_ids('Director', 'Ridley Scott', database_repo) == movie_ids
+    monkeypatch.undo()
+
+    movie = Movie('Another Ridley Scott Movie', 2021)
+    movie.director = Director('Ridley Scott')
+    database_repo.add_movie(movie)
+    assert services.search_movie_ids('Director', 'Ridley Scott', database_repo) == movie_ids + (movie.id,)
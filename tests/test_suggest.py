@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from movie.adapters.fulltext import FullTextIndex
+from movie.adapters.suggest import SuggestionIndex
+from tests.test_database_repository import new_movie
+
+
+def rebuilt(index):
+    fresh = SuggestionIndex()
+    for key, count in index._counts.items():
+        for _ in range(count):
+            fresh.add(index._labels[key])
+    return fresh
+
+
+def test_names_added_after_the_first_query_match_a_rebuilt_index(monkeypatch):
+    # A small CACHED_RANGE, so that added names enter, move up in and create kept rankings.
+    monkeypatch.setattr(SuggestionIndex, 'CACHED_RANGE', 8)
+    words = ['al', 'alan', 'alba', 'ben', 'bert', 'bo', 'carl', 'ca', 'chris', 'cy', 'd', 'dan']
+    rng = random.Random(0)
+    names = [' '.join(rng.choice(words) for _ in range(rng.randint(1, 3))) for _ in range(300)]
+    index = SuggestionIndex()
+    for name in names[:50]:
+        index.add(name)
+    index.suggest('a')
+    for step in range(2000):
+        index.add(rng.choice(names))
+        if step % 250 == 0:
+            fresh = rebuilt(index)
+            for prefix in ['a', 'al', 'b', 'c', 'ca', 'chris', 'd', 'dan a', 'x']:
+                assert index.suggest(prefix, 20) == fresh.suggest(prefix, 20)
+            fresh.suggest('a')
+            assert set(index._top) == set(fresh._top)
+
+
+def test_adding_a_movie_does_not_rebuild_the_suggestions(memory_repo, monkeypatch):
+    assert memory_repo.get_suggestions('actor', 'chris', 3)
+    assert memory_repo.get_suggestions('title', 'the', 3)
+    monkeypatch.setattr(SuggestionIndex, '_build', lambda self: pytest.fail('the suggestions were rebuilt'))
+    memory_repo.add_movie(new_movie('Suggested Movie', actors=('Chris Zzyzx',)))
+    assert ('Chris Zzyzx', 1) in memory_repo.get_suggestions('actor', 'zzy', 5)
+    assert memory_repo.get_suggestions('title', 'suggested m', 5) == [('Suggested Movie', 1)]
+
+
+def test_words_added_after_the_first_query_are_prefix_matched():
+    index = FullTextIndex()
+    index.add(0, 'Alpha', 'first movie')
+    assert index.search('alp') == [0]
+    index.add(1, 'Alphabet', 'second movie')
+    index.add(2, 'Beta', 'alphanumeric movie')
+    assert sorted(index.search('alph')) == [0, 1, 2]
+    assert index._terms == sorted(index._postings)
@@ -4,5 +4,6 @@ from movie import create_app
 app = create_app()
 
 if __name__ == "__main__":
-    app.run(host='localhost', port=5000, threaded=False)
+    # The repository is safe for concurrent requests, so one process serves them from a thread pool.
+    app.run(host='localhost', port=5000, threaded=True)
 